@@ -26,9 +26,117 @@ Examples:
 """
 
 import os
+import re
 import sys
+import errno
+import json
+import logging
 import argparse
 import subprocess
+import threading
+import warnings
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+
+logger = logging.getLogger('hydra')
+
+# Memoized S4 output scans: {path: (st_mtime_ns, st_size, count, kg1_ids)}
+_KG1_CACHE = {}
+
+# Which S4 output lines reach the terminal (every line is always logged)
+_S4_VERBOSITY_PATTERNS = {
+    'full': None,
+    'progress': re.compile(r'(Epoch (?:0|\d*00)/|error|Error|✗|Warning)'.encode()),
+    'errors': re.compile(r'(error|Error|✗|Traceback)'.encode()),
+}
+
+# Number of withheld S4 output lines replayed when training fails
+_S4_TAIL_LINES = 50
+
+_S4_SCRIPT = Path(__file__).resolve().parent / 'encoding_and_integration' / 'run_s4_standalone.py'
+
+
+@dataclass(frozen=True)
+class PipelineContext:
+    """Paths used by the pipeline, resolved once per data directory"""
+    data_dir: Path
+    message_pool_dir: Path
+    s4_output: Path
+    s4_log: Path
+    ent_ids_1: Path
+    ent_ids_1_backup: Path
+    sup_pairs: Path
+    s4_script: Path
+    
+    @classmethod
+    def of(cls, data_dir):
+        """
+        Get the context for a data directory
+        
+        Args:
+            data_dir: Data directory path, or an existing PipelineContext
+            
+        Returns:
+            PipelineContext
+        """
+        if isinstance(data_dir, cls):
+            return data_dir
+        return _context_for(os.fspath(data_dir))
+    
+    def iteration_status_file(self, iteration):
+        """Path of the resume manifest of one pipeline iteration"""
+        return self.message_pool_dir / f'iter_{iteration}_status.json'
+
+
+@lru_cache(maxsize=None)
+def _context_for(data_dir):
+    """Build (and memoize) the PipelineContext of a data directory path"""
+    data_dir = Path(data_dir)
+    message_pool_dir = data_dir / 'message_pool'
+    return PipelineContext(
+        data_dir=data_dir,
+        message_pool_dir=message_pool_dir,
+        s4_output=message_pool_dir / 'integration_top_pair.txt',
+        s4_log=message_pool_dir / 's4_training.log',
+        ent_ids_1=data_dir / 'ent_ids_1',
+        ent_ids_1_backup=data_dir / 'ent_ids_1.backup',
+        sup_pairs=data_dir / 'sup_pairs',
+        s4_script=_S4_SCRIPT
+    )
+
+
+def _stat_or_none(path):
+    """
+    Stat a path, returning None if it does not exist
+    
+    Args:
+        path: File path
+        
+    Returns:
+        os.stat_result or None
+    """
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+def invalidate_kg1_cache(data_dir=None):
+    """
+    Drop memoized S4 output scans (all of them, or only those under data_dir)
+    
+    Args:
+        data_dir: Data directory path or PipelineContext (optional)
+    """
+    if data_dir is None:
+        _KG1_CACHE.clear()
+        return
+    _KG1_CACHE.pop(PipelineContext.of(data_dir).s4_output, None)
 
 
 def check_s4_output(data_dir):
@@ -36,49 +144,198 @@ def check_s4_output(data_dir):
     Check if S4 output file exists
     
     Args:
-        data_dir: Data directory path
+        data_dir: Data directory path or PipelineContext
         
     Returns:
         bool: Whether S4 output file exists
     """
-    s4_output_file = os.path.join(data_dir, 'message_pool', 'integration_top_pair.txt')
-    return os.path.exists(s4_output_file) and os.path.getsize(s4_output_file) > 0
+    st = _stat_or_none(PipelineContext.of(data_dir).s4_output)
+    return st is not None and st.st_size > 0
 
 
 def count_unique_kg1_entities(data_dir):
     """
     Count unique KG1 entities in integration_top_pair.txt
     
+    Results are memoized on (mtime, size), so repeated calls on an unchanged
+    file do not re-parse it.
+    
     Args:
-        data_dir: Data directory path
+        data_dir: Data directory path or PipelineContext
         
     Returns:
         int: Number of unique KG1 entities, returns 0 if file does not exist
     """
-    s4_output_file = os.path.join(data_dir, 'message_pool', 'integration_top_pair.txt')
+    s4_output_file = PipelineContext.of(data_dir).s4_output
     
-    if not os.path.exists(s4_output_file):
+    st = _stat_or_none(s4_output_file)
+    if st is None:
+        _KG1_CACHE.pop(s4_output_file, None)
         return 0
     
-    kg1_entities = set()
+    cached = _KG1_CACHE.get(s4_output_file)
+    if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    
     try:
+        kg1_ids = _load_unique_kg1_ids(s4_output_file)
+    except Exception as e:
+        print(f"Warning: Error reading S4 output file: {e}")
+        return 0
+    
+    count = int(kg1_ids.size)
+    _KG1_CACHE[s4_output_file] = (st.st_mtime_ns, st.st_size, count, kg1_ids)
+    return count
+
+
+def _load_unique_kg1_ids(s4_output_file):
+    """
+    Parse the KG1 column of integration_top_pair.txt into a sorted array of unique IDs
+    
+    Only rows with at least two tab-separated fields are counted.
+    
+    Args:
+        s4_output_file: Path to integration_top_pair.txt
+        
+    Returns:
+        np.ndarray: Unique KG1 entity IDs (int64)
+    """
+    try:
+        kg1_col = _read_kg1_column(s4_output_file)
+    except ValueError:
+        # Malformed rows: skip what cannot be parsed
+        kg1_col = _read_kg1_column_lenient(s4_output_file)
+    return _unique_int64(kg1_col)
+
+
+def _read_kg1_column(s4_output_file):
+    """
+    Strictly parse the first tab-separated column as int64
+    
+    Rows without a second field are dropped. Uses the pandas C parser when
+    pandas is available, np.loadtxt otherwise.
+    
+    Raises:
+        ValueError: If a row cannot be parsed
+    """
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+    
+    if pd is not None:
+        try:
+            # names= makes rows with fewer or more fields than two parse as well
+            df = pd.read_csv(s4_output_file, sep='\t', header=None, names=[0, 1], usecols=[0, 1],
+                             engine='c', dtype={0: np.int64, 1: str})
+        except pd.errors.EmptyDataError:
+            # An empty file is a valid (zero-entity) S4 output
+            return np.empty(0, dtype=np.int64)
+        return df[0].to_numpy()[df[1].notna().to_numpy()]
+    
+    with warnings.catch_warnings():
+        # An empty file is a valid (zero-entity) S4 output
+        warnings.simplefilter('ignore', UserWarning)
+        cols = np.loadtxt(s4_output_file, delimiter='\t', usecols=(0, 1),
+                          dtype=str, comments=None, ndmin=2)
+    return cols[cols[:, 1] != '', 0].astype(np.int64)
+
+
+def _read_kg1_column_lenient(s4_output_file):
+    """
+    Parse the first column, skipping rows that cannot be parsed
+    
+    Blank lines, rows with fewer than two tab-separated fields and rows whose
+    KG1 ID is not an integer are ignored.
+    """
+    try:
+        import pandas as pd
+    except ImportError:
+        kg1_ids = []
         with open(s4_output_file, 'r', encoding='utf-8') as f:
             for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                parts = line.split('\t')
+                parts = line.strip().split('\t')
                 if len(parts) >= 2:
                     try:
-                        kg1_id = int(parts[0])
-                        kg1_entities.add(kg1_id)
+                        kg1_ids.append(int(parts[0]))
                     except ValueError:
                         continue
-    except Exception as e:
-        print(f"Warning: Error reading S4 output file: {e}")
-        return 0
+        return np.asarray(kg1_ids, dtype=np.int64)
+    
+    try:
+        df = pd.read_csv(s4_output_file, sep='\t', header=None, names=[0, 1], usecols=[0, 1],
+                         dtype=str, skip_blank_lines=True)
+    except pd.errors.EmptyDataError:
+        return np.empty(0, dtype=np.int64)
+    df = df[df[1].notna()]
+    kg1_col = pd.to_numeric(df[0].str.strip(), errors='coerce').dropna()
+    return kg1_col.to_numpy(dtype=np.int64)
+
+
+def _unique_int64(values):
+    """
+    Sorted unique values of an int64 array
+    
+    Deduplicates in O(n) with pandas' int64 hash table when available and only
+    sorts the unique values; falls back to np.unique (sort-based) otherwise.
+    """
+    values = np.ascontiguousarray(values, dtype=np.int64)
+    try:
+        from pandas._libs.hashtable import Int64HashTable
+    except ImportError:
+        return np.unique(values)
+    table = Int64HashTable(max(values.size, 1))
+    return np.sort(table.unique(values))
+
+
+def _count_lines(file_path, limit=None, chunk_size=1 << 20):
+    """
+    Count non-empty lines, reading the file in binary chunks
+    
+    Whitespace-only lines are not counted, matching the line-by-line check
+    this replaced.
+    
+    Args:
+        file_path: File path
+        limit: Stop reading once the count reaches this value (optional)
+        chunk_size: Read size in bytes
+        
+    Returns:
+        int: Number of non-empty lines (a lower bound once limit is reached)
+    """
+    count = 0
+    tail = b''
+    with open(file_path, 'rb') as f:
+        while True:
+            buf = f.read(chunk_size)
+            if not buf:
+                break
+            lines = (tail + buf).split(b'\n')
+            # The last piece may continue in the next chunk
+            tail = lines.pop()
+            count += sum(1 for line in lines if line.strip())
+            if limit is not None and count >= limit:
+                return count
+    # Final line without a trailing newline
+    if tail.strip():
+        count += 1
+    return count
+
+
+def count_sup_pairs(data_dir):
+    """
+    Count the pairs in sup_pairs
     
-    return len(kg1_entities)
+    Args:
+        data_dir: Data directory path or PipelineContext
+        
+    Returns:
+        int: Number of non-empty lines, 0 if the file does not exist
+    """
+    try:
+        return _count_lines(PipelineContext.of(data_dir).sup_pairs)
+    except FileNotFoundError:
+        return 0
 
 
 def ensure_ent_ids_1_restored(data_dir):
@@ -86,43 +343,118 @@ def ensure_ent_ids_1_restored(data_dir):
     Ensure ent_ids_1 file is restored (if it was temporarily replaced)
     
     Args:
-        data_dir: Data directory path
+        data_dir: Data directory path or PipelineContext
         
     Returns:
         bool: Whether the file is in correct state
     """
-    ent_ids_1_path = os.path.join(data_dir, "ent_ids_1")
-    backup_path = os.path.join(data_dir, "ent_ids_1.backup")
+    ctx = PipelineContext.of(data_dir)
+    ent_ids_1_path = ctx.ent_ids_1
+    backup_path = ctx.ent_ids_1_backup
     
     # If backup file exists, ent_ids_1 may have been replaced and needs to be restored
-    if os.path.exists(backup_path):
+    # (the rename itself is the existence check, so no separate stat is needed)
+    try:
+        # Backup lives next to ent_ids_1, so this is a single atomic rename
+        os.replace(backup_path, ent_ids_1_path)
+        restored = True
+    except FileNotFoundError:
+        restored = False
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
         import shutil
-        print(f"  Warning: Found backup file, restoring ent_ids_1 from backup...")
         shutil.move(backup_path, ent_ids_1_path)
+        restored = True
+    if restored:
+        print(f"  Warning: Found backup file, restoring ent_ids_1 from backup...")
         print(f"  Restored ent_ids_1 from backup")
     
     # Check if ent_ids_1 file is normal (should have reasonable number of lines, e.g., >1000)
-    if os.path.exists(ent_ids_1_path):
-        with open(ent_ids_1_path, 'r', encoding='utf-8') as f:
-            line_count = sum(1 for line in f if line.strip())
-            if line_count < 1000:
-                print(f"  Warning: ent_ids_1 has only {line_count} lines, which seems too small")
-                print(f"  This might cause IndexError in S4 training")
-                return False
-        return True
-    else:
+    try:
+        line_count = _count_lines(ent_ids_1_path, limit=1000)
+    except FileNotFoundError:
         print(f"  Error: ent_ids_1 file not found: {ent_ids_1_path}")
         return False
+    if line_count < 1000:
+        print(f"  Warning: ent_ids_1 has only {line_count} lines, which seems too small")
+        print(f"  This might cause IndexError in S4 training")
+        return False
+    return True
 
 
-def run_s4_training(data_dir, cuda=0, epochs=500):
+def _write_all(fd, data):
+    """Write a whole buffer to a file descriptor, retrying on partial writes"""
+    view = memoryview(data)
+    while view:
+        written = os.writev(fd, [view])
+        view = view[written:]
+
+
+def _tee(src, sinks, chunk_size=1 << 16, pattern=None, dropped=None):
+    """
+    Copy a child process output stream to a terminal and log sinks until EOF
+    
+    Args:
+        src: Binary pipe to read from (Popen.stdout)
+        sinks: (terminal, *logs) binary file objects; logs receive every chunk
+        chunk_size: Maximum read size in bytes
+        pattern: Compiled bytes regex; if given, only matching lines reach the terminal
+        dropped: deque collecting the lines withheld from the terminal (optional)
+    """
+    term_fd, *log_fds = [sink.fileno() for sink in sinks]
+    pending = b''
+    while True:
+        chunk = src.read1(chunk_size)
+        if not chunk:
+            break
+        for fd in log_fds:
+            _write_all(fd, chunk)
+        if pattern is None:
+            _write_all(term_fd, chunk)
+            continue
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        shown = _filter_lines(lines, pattern, dropped)
+        if shown:
+            _write_all(term_fd, shown)
+    if pending and pattern is not None:
+        shown = _filter_lines([pending], pattern, dropped)
+        if shown:
+            _write_all(term_fd, shown)
+    src.close()
+
+
+def _filter_lines(lines, pattern, dropped):
+    """Join the lines matching pattern, remembering the others in dropped"""
+    shown = []
+    for line in lines:
+        if pattern.search(line):
+            shown.append(line + b'\n')
+        elif dropped is not None:
+            dropped.append(line + b'\n')
+    return b''.join(shown)
+
+
+def _print_dropped_tail(dropped, log_file):
+    """Replay the S4 output lines withheld from the terminal after a failure"""
+    if not dropped:
+        return
+    print(f"  Last {len(dropped)} lines of S4 output (full log: {log_file}):")
+    sys.stdout.flush()
+    _write_all(sys.stdout.fileno(), b''.join(dropped))
+
+
+def run_s4_training(data_dir, cuda=0, epochs=500, log_verbosity='full'):
     """
     Run S4 training (Simple-HHEA)
     
     Args:
-        data_dir: Data directory path
+        data_dir: Data directory path or PipelineContext
         cuda: CUDA device ID
         epochs: Number of training epochs
+        log_verbosity: S4 output shown on the terminal: 'full', 'progress' (epoch
+            milestones, warnings and errors) or 'errors'; the log file always gets everything
         
     Returns:
         bool: Whether successful
@@ -132,32 +464,57 @@ def run_s4_training(data_dir, cuda=0, epochs=500):
     print("=" * 80 + "\n")
     
     # Ensure ent_ids_1 file is correctly restored (if it was temporarily replaced)
+    ctx = PipelineContext.of(data_dir)
     print("Checking ent_ids_1 file before S4 training...")
-    if not ensure_ent_ids_1_restored(data_dir):
+    if not ensure_ent_ids_1_restored(ctx):
         print("  Error: ent_ids_1 file is not in correct state. Please check the file manually.")
         return False
     
     # Check if run_s4_standalone.py exists
-    s4_script = os.path.join(os.path.dirname(__file__), 'encoding_and_integration', 'run_s4_standalone.py')
+    s4_script = ctx.s4_script
     
-    if os.path.exists(s4_script):
+    if s4_script.exists():
+        log_file = ctx.s4_log
+        os.makedirs(ctx.message_pool_dir, exist_ok=True)
+        
+        cmd = [
+            sys.executable,
+            str(s4_script),
+            '--data_dir', str(ctx.data_dir),
+            '--cuda', str(cuda),
+            '--epochs', str(epochs)
+        ]
+        print(f"Running command: {' '.join(cmd)}")
+        print(f"  S4 output is also logged to: {log_file}")
+        sys.stdout.flush()
+        
+        pattern = _S4_VERBOSITY_PATTERNS[log_verbosity]
+        dropped = deque(maxlen=_S4_TAIL_LINES)
         try:
-            cmd = [
-                sys.executable,
-                s4_script,
-                '--data_dir', data_dir,
-                '--cuda', str(cuda),
-                '--epochs', str(epochs)
-            ]
-            print(f"Running command: {' '.join(cmd)}")
-            result = subprocess.run(cmd, check=True, capture_output=False)
-            return result.returncode == 0
-        except subprocess.CalledProcessError as e:
+            with open(log_file, 'ab') as log_f:
+                proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=1 << 16)
+                tee_thread = threading.Thread(
+                    target=_tee, args=(proc.stdout, (sys.stdout.buffer, log_f)),
+                    kwargs={'pattern': pattern, 'dropped': dropped}, daemon=True
+                )
+                tee_thread.start()
+                returncode = proc.wait()
+                tee_thread.join()
+        except OSError as e:
             print(f"Error running S4 training: {e}")
             return False
+        
+        if returncode == 0:
+            # S4 rewrote integration_top_pair.txt; do not trust memoized scans
+            invalidate_kg1_cache(ctx)
+            return True
+        if pattern is not None:
+            _print_dropped_tail(dropped, log_file)
+        print(f"Error running S4 training: command returned non-zero exit status {returncode}")
+        return False
     else:
         print(f"Warning: {s4_script} not found. Please run S4 training manually.")
-        print(f"Expected output: {os.path.join(data_dir, 'message_pool', 'integration_top_pair.txt')}")
+        print(f"Expected output: {ctx.s4_output}")
         return False
 
 
@@ -178,15 +535,16 @@ def run_s4_to_retrieval(data_dir, iteration=1):
     
     try:
         from scale_adaptive_entity_projection.entity_projection import s4_to_retrieval
-        success = s4_to_retrieval(data_dir, iteration=iteration)
+        # Later iterations rebuild the FAISS index if the retrieval document changed
+        success = s4_to_retrieval(data_dir, iteration=iteration, force_update=iteration > 1)
         return success
     except ImportError as e:
         print(f"Error importing s4_to_retrieval: {e}")
         return False
     except Exception as e:
-        print(f"Error running s4_to_retrieval: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"Error running s4_to_retrieval: {type(e).__name__}: {e}")
+        # Full traceback only with --verbose
+        logger.debug("s4_to_retrieval failed", exc_info=True)
         return False
 
 
@@ -212,13 +570,79 @@ def run_multi_scale_fusion(data_dir):
         print(f"Error importing multi_scale_fusion: {e}")
         return False
     except Exception as e:
-        print(f"Error running multi_scale_fusion: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"Error running multi_scale_fusion: {type(e).__name__}: {e}")
+        # Full traceback only with --verbose
+        logger.debug("multi_scale_fusion failed", exc_info=True)
         return False
 
 
-def run_full_pipeline(data_dir, skip_s4=False, only_s4=False, cuda=0, epochs=500, max_iterations=3, min_kg1_entities=50):
+def _input_mtimes(ctx):
+    """Modification times (ns, or None if missing) of the files a resumed iteration depends on"""
+    mtimes = {}
+    for path in (ctx.s4_output, ctx.sup_pairs):
+        st = _stat_or_none(path)
+        mtimes[path.name] = st.st_mtime_ns if st is not None else None
+    return mtimes
+
+
+def write_iteration_status(ctx, iteration, status):
+    """
+    Persist the resume manifest of one iteration
+    
+    Args:
+        ctx: PipelineContext
+        iteration: Iteration number
+        status: Stage flags ({'s4': bool, 'retrieval': bool, 'fusion': bool}) plus
+            'kg1_count'
+    """
+    status_file = ctx.iteration_status_file(iteration)
+    os.makedirs(ctx.message_pool_dir, exist_ok=True)
+    tmp_file = status_file.with_suffix('.json.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(dict(status, iteration=iteration, mtimes=_input_mtimes(ctx)), f, indent=2)
+    os.replace(tmp_file, status_file)
+
+
+def clear_iteration_status(ctx):
+    """Remove all resume manifests of a data directory"""
+    for status_file in ctx.message_pool_dir.glob('iter_*_status.json'):
+        status_file.unlink()
+
+
+def load_resume_point(ctx):
+    """
+    Find the latest iteration manifest that still matches the files on disk
+    
+    Args:
+        ctx: PipelineContext
+        
+    Returns:
+        tuple: (iteration, status), or (0, None) if there is nothing to resume from
+    """
+    latest = None
+    for status_file in ctx.message_pool_dir.glob('iter_*_status.json'):
+        match = re.fullmatch(r'iter_(\d+)_status\.json', status_file.name)
+        if match and (latest is None or int(match.group(1)) > latest[0]):
+            latest = (int(match.group(1)), status_file)
+    if latest is None:
+        return 0, None
+    
+    iteration, status_file = latest
+    try:
+        with open(status_file, 'r', encoding='utf-8') as f:
+            status = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Cannot read {status_file}: {e}")
+        return 0, None
+    
+    if status.get('mtimes') != _input_mtimes(ctx):
+        print(f"Warning: Inputs changed since {status_file.name} was written, not resuming")
+        return 0, None
+    return iteration, status
+
+
+def run_full_pipeline(data_dir, skip_s4=False, only_s4=False, cuda=0, epochs=500, max_iterations=3, min_kg1_entities=50,
+                      convergence_tol=0.02, log_verbosity='full', resume=False):
     """
     Run complete HyDRA pipeline (supports iterative loops)
     
@@ -230,6 +654,11 @@ def run_full_pipeline(data_dir, skip_s4=False, only_s4=False, cuda=0, epochs=500
         epochs: Number of training epochs (for S4 training)
         max_iterations: Maximum number of iterations (default: 3)
         min_kg1_entities: Minimum KG1 entity count threshold (default: 50)
+        convergence_tol: From the second iteration on, stop once fusion adds fewer new
+            sup_pairs than this fraction of the existing ones (default: 0.02, 0 disables)
+        log_verbosity: S4 terminal output filter: 'full', 'progress' or 'errors'
+        resume: Skip the stages already completed by a previous run, as recorded
+            in message_pool/iter_<k>_status.json
         
     Returns:
         bool: Whether successful
@@ -242,6 +671,8 @@ def run_full_pipeline(data_dir, skip_s4=False, only_s4=False, cuda=0, epochs=500
     print(f"Only S4: {only_s4}")
     print(f"Max iterations: {max_iterations}")
     print(f"Min KG1 entities threshold: {min_kg1_entities}")
+    print(f"Convergence tolerance: {convergence_tol}")
+    print(f"Resume: {resume}")
     print("=" * 80 + "\n")
     
     # Check data directory
@@ -249,23 +680,25 @@ def run_full_pipeline(data_dir, skip_s4=False, only_s4=False, cuda=0, epochs=500
         print(f"Error: Data directory not found: {data_dir}")
         return False
     
+    ctx = PipelineContext.of(data_dir)
+    
     # If only running S4, do not loop
     if only_s4:
         success_steps = []
         
         if not skip_s4:
-            if check_s4_output(data_dir):
+            if check_s4_output(ctx):
                 print("✓ S4 output file already exists, skipping S4 training")
-                print(f"  File: {os.path.join(data_dir, 'message_pool', 'integration_top_pair.txt')}")
+                print(f"  File: {ctx.s4_output}")
                 success_steps.append("S4 (already exists)")
             else:
-                if run_s4_training(data_dir, cuda=cuda, epochs=epochs):
+                if run_s4_training(ctx, cuda=cuda, epochs=epochs, log_verbosity=log_verbosity):
                     success_steps.append("S4 Training")
                 else:
                     print("✗ S4 training failed")
                     return False
         else:
-            if not check_s4_output(data_dir):
+            if not check_s4_output(ctx):
                 print("✗ Error: S4 output file not found and --skip_s4 is set")
                 return False
             else:
@@ -278,8 +711,23 @@ def run_full_pipeline(data_dir, skip_s4=False, only_s4=False, cuda=0, epochs=500
         return True
     
     # Iterative loop
+    data_dir = str(ctx.data_dir)
     iteration = 0
     all_success_steps = []
+    resumed = {}
+    
+    if resume:
+        iteration, status = load_resume_point(ctx)
+        if status is None:
+            print("No resumable iteration found, starting from iteration 1")
+        elif all(status.get(stage) for stage in ('s4', 'retrieval', 'fusion')):
+            print(f"Resuming after completed iteration {iteration}")
+        else:
+            print(f"Resuming iteration {iteration}")
+            resumed = status
+            iteration -= 1
+    else:
+        clear_iteration_status(ctx)
     
     while iteration < max_iterations:
         iteration += 1
@@ -288,15 +736,21 @@ def run_full_pipeline(data_dir, skip_s4=False, only_s4=False, cuda=0, epochs=500
         print("=" * 80 + "\n")
         
         success_steps = []
+        status = {'s4': False, 'retrieval': False, 'fusion': False}
+        # Stages a resumed run already completed (only applies to the first iteration run)
+        done, resumed = resumed, {}
         
         # Step 1: S4 Training
-        if not skip_s4:
-            if check_s4_output(data_dir) and iteration > 1:
+        if done.get('s4'):
+            print("✓ S4 already completed for this iteration (resumed)")
+            success_steps.append("S4 (resumed)")
+        elif not skip_s4:
+            if check_s4_output(ctx) and iteration > 1:
                 print("✓ S4 output file already exists from previous iteration")
-                print(f"  File: {os.path.join(data_dir, 'message_pool', 'integration_top_pair.txt')}")
+                print(f"  File: {ctx.s4_output}")
                 success_steps.append("S4 (already exists)")
             else:
-                if run_s4_training(data_dir, cuda=cuda, epochs=epochs):
+                if run_s4_training(ctx, cuda=cuda, epochs=epochs, log_verbosity=log_verbosity):
                     success_steps.append("S4 Training")
                 else:
                     print("✗ S4 training failed")
@@ -305,7 +759,7 @@ def run_full_pipeline(data_dir, skip_s4=False, only_s4=False, cuda=0, epochs=500
                     # If not the first iteration, continue with existing results
                     print("  Continuing with existing files...")
         else:
-            if not check_s4_output(data_dir):
+            if not check_s4_output(ctx):
                 print("✗ Error: S4 output file not found and --skip_s4 is set")
                 if iteration == 1:
                     return False
@@ -315,8 +769,10 @@ def run_full_pipeline(data_dir, skip_s4=False, only_s4=False, cuda=0, epochs=500
                 success_steps.append("S4 (skipped)")
         
         # Check KG1 entity count in S4 output (before preparing next step)
-        kg1_count = count_unique_kg1_entities(data_dir)
+        kg1_count = count_unique_kg1_entities(ctx)
         print(f"\nUnique KG1 entities in S4 output: {kg1_count}")
+        status.update(s4=bool(success_steps), kg1_count=kg1_count)
+        write_iteration_status(ctx, iteration, status)
         
         # Stopping condition 1: KG1 entity count is less than threshold
         if kg1_count < min_kg1_entities:
@@ -327,7 +783,10 @@ def run_full_pipeline(data_dir, skip_s4=False, only_s4=False, cuda=0, epochs=500
             break
         
         # Step 2: S4 to Retrieval
-        if run_s4_to_retrieval(data_dir, iteration=iteration):
+        if done.get('retrieval'):
+            print("✓ S4 to Retrieval already completed for this iteration (resumed)")
+            success_steps.append("S4 to Retrieval (resumed)")
+        elif run_s4_to_retrieval(data_dir, iteration=iteration):
             success_steps.append("S4 to Retrieval")
         else:
             print("✗ S4 to Retrieval failed")
@@ -336,7 +795,11 @@ def run_full_pipeline(data_dir, skip_s4=False, only_s4=False, cuda=0, epochs=500
             # Continue to next iteration
             continue
         
+        status['retrieval'] = True
+        write_iteration_status(ctx, iteration, status)
+        
         # Step 3: Multi-Scale Fusion
+        sup_pairs_before = count_sup_pairs(ctx)
         if run_multi_scale_fusion(data_dir):
             success_steps.append("Multi-Scale Fusion")
         else:
@@ -346,8 +809,23 @@ def run_full_pipeline(data_dir, skip_s4=False, only_s4=False, cuda=0, epochs=500
             # Continue to next iteration
             continue
         
+        status['fusion'] = True
+        write_iteration_status(ctx, iteration, status)
+        
         all_success_steps.extend(success_steps)
         
+        # Stopping condition 2: diminishing returns (fusion added few new sup_pairs);
+        # never after the first iteration, which only seeds the loop
+        if convergence_tol > 0 and iteration >= 2:
+            added = count_sup_pairs(ctx) - sup_pairs_before
+            # A shrinking sup_pairs file (e.g. replaced by hand) is not convergence
+            if 0 <= added < convergence_tol * max(sup_pairs_before, 1):
+                print(f"\n{'=' * 80}")
+                print(f"Converged: fusion added only {added} new pairs to {sup_pairs_before} existing sup_pairs "
+                      f"(< {convergence_tol:.1%})")
+                print(f"{'=' * 80}\n")
+                break
+        
         # Check if maximum iterations reached
         if iteration >= max_iterations:
             print(f"\n{'=' * 80}")
@@ -360,7 +838,7 @@ def run_full_pipeline(data_dir, skip_s4=False, only_s4=False, cuda=0, epochs=500
     print("HyDRA Pipeline Summary")
     print("=" * 80)
     print(f"Total iterations: {iteration}/{max_iterations}")
-    print(f"Final KG1 entities count: {count_unique_kg1_entities(data_dir)}")
+    print(f"Final KG1 entities count: {count_unique_kg1_entities(ctx)}")
     print(f"Completed steps: {', '.join(all_success_steps)}")
     print("=" * 80 + "\n")
     
@@ -380,6 +858,7 @@ Complete pipeline includes (supports iterative loops):
 
 Stopping conditions:
   - If unique KG1 entity count in S4 output < min_kg1_entities (default 50), stop loop
+  - From iteration 2 on, if fusion adds fewer new pairs than convergence_tol (default 0.02) times the existing sup_pairs, stop loop
   - If iteration count >= max_iterations (default 3), stop loop
 
 Example usage:
@@ -397,6 +876,12 @@ Example usage:
 
   # Specify CUDA device and training epochs
   python HyDRA_main.py --data_dir data/icews_wiki --cuda 0 --epochs 500
+
+  # Resume an interrupted run without repeating completed stages
+  python HyDRA_main.py --data_dir data/icews_wiki --resume
+
+  # Only show S4 epoch milestones, warnings and errors on the terminal
+  python HyDRA_main.py --data_dir data/icews_wiki --log_verbosity progress
         """
     )
     
@@ -447,7 +932,40 @@ Example usage:
         help="Minimum KG1 entity count threshold (default: 50, loop stops if below this value)"
     )
     
+    parser.add_argument(
+        "--convergence_tol",
+        type=float,
+        default=0.02,
+        help="From iteration 2 on, stop when fusion adds fewer new pairs than this fraction of the "
+             "existing sup_pairs (default: 0.02, 0 disables)"
+    )
+    
+    parser.add_argument(
+        "--log_verbosity",
+        type=str,
+        choices=sorted(_S4_VERBOSITY_PATTERNS),
+        default="full",
+        help="S4 output shown on the terminal: full, progress (epoch milestones, warnings, errors) "
+             "or errors (default: full); the S4 log file always gets everything"
+    )
+    
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume from the last recorded iteration, skipping stages it already completed "
+             "(message_pool/iter_<k>_status.json)"
+    )
+    
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Verbose logging (including full tracebacks of failed pipeline steps)"
+    )
+    
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    logger.setLevel(logging.DEBUG if args.verbose else logging.INFO)
     
     # Check for parameter conflicts
     if args.skip_s4 and args.only_s4:
@@ -462,7 +980,10 @@ Example usage:
         cuda=args.cuda,
         epochs=args.epochs,
         max_iterations=args.max_iterations,
-        min_kg1_entities=args.min_kg1_entities
+        min_kg1_entities=args.min_kg1_entities,
+        convergence_tol=args.convergence_tol,
+        log_verbosity=args.log_verbosity,
+        resume=args.resume
     )
     
     if success:
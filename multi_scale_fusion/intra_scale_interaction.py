@@ -8,17 +8,51 @@ Features:
 3. Generate conflict reports to guide multi-scale fusion decisions
 """
 
-from collections import defaultdict
-from typing import Dict, List, Set, Tuple
+from typing import Dict, List, Set, Tuple, Union
 import os
 import sys
 
+import numpy as np
+
+# Optional JIT for the batch conflict kernel (falls back to NumPy)
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # Add project path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
+# Scale names, in the column order used by the packed (N, 3) arrays and scale tuples
+_SCALES: Tuple[str, ...] = tuple(sys.intern(scale) for scale in ('L1', 'L2', 'L3'))
+
+# Per-scale candidate lists in _SCALES order: ([L1 kg2_ids], [L2 kg2_ids], [L3 kg2_ids])
+ScaleCandidates = Tuple[List[int], List[int], List[int]]
+
+# Placeholder for scales without candidates in packed (N, 3) arrays
+NO_CANDIDATE = -1
+
+
+def as_scale_tuple(candidate_info: Union[Dict[str, List[int]], ScaleCandidates]) -> ScaleCandidates:
+    """
+    Convert candidate information to fixed (L1, L2, L3) tuple form
+    
+    Args:
+        candidate_info: {'L1': [kg2_ids], 'L2': [kg2_ids], 'L3': [kg2_ids]}, or an
+            existing ScaleCandidates tuple (returned as is)
+        
+    Returns:
+        tuple: ([L1 kg2_ids], [L2 kg2_ids], [L3 kg2_ids]), missing scales as []
+    """
+    if isinstance(candidate_info, tuple):
+        return candidate_info
+    get = candidate_info.get
+    return (get(_SCALES[0], []), get(_SCALES[1], []), get(_SCALES[2], []))
+
 
-def analyze_intra_scale_interaction(candidate_info: Dict[str, List[int]], 
+def analyze_intra_scale_interaction(candidate_info: Union[Dict[str, List[int]], ScaleCandidates], 
                                     ent_names_2: Dict[int, str]) -> Dict[str, Dict]:
     """
     Analyze intra-scale interaction
@@ -29,7 +63,7 @@ def analyze_intra_scale_interaction(candidate_info: Dict[str, List[int]],
     3. Confidence distribution within the scale
     
     Args:
-        candidate_info: {'L1': [kg2_ids], 'L2': [kg2_ids], 'L3': [kg2_ids]}
+        candidate_info: {'L1': [kg2_ids], 'L2': [kg2_ids], 'L3': [kg2_ids]} (or ScaleCandidates)
         ent_names_2: KG2 entity name dictionary
         
     Returns:
@@ -46,9 +80,7 @@ def analyze_intra_scale_interaction(candidate_info: Dict[str, List[int]],
     """
     scale_analysis = {}
     
-    for scale in ['L1', 'L2', 'L3']:
-        candidates = candidate_info.get(scale, [])
-        
+    for scale, candidates in zip(_SCALES, as_scale_tuple(candidate_info)):
         analysis = {
             'candidate_count': len(candidates),
             'candidates': candidates,
@@ -72,7 +104,7 @@ def analyze_intra_scale_interaction(candidate_info: Dict[str, List[int]],
     return scale_analysis
 
 
-def detect_cross_scale_conflicts(candidate_info: Dict[str, List[int]],
+def detect_cross_scale_conflicts(candidate_info: Union[Dict[str, List[int]], ScaleCandidates],
                                  scale_analysis: Dict[str, Dict]) -> Dict:
     """
     Detect cross-scale conflicts
@@ -80,7 +112,7 @@ def detect_cross_scale_conflicts(candidate_info: Dict[str, List[int]],
     Detect whether the TOP-1 candidate entities recommended by different scales are consistent
     
     Args:
-        candidate_info: {'L1': [kg2_ids], 'L2': [kg2_ids], 'L3': [kg2_ids]}
+        candidate_info: {'L1': [kg2_ids], 'L2': [kg2_ids], 'L3': [kg2_ids]} (or ScaleCandidates)
         scale_analysis: Intra-scale interaction analysis results
         
     Returns:
@@ -95,11 +127,11 @@ def detect_cross_scale_conflicts(candidate_info: Dict[str, List[int]],
         }
     """
     # Get TOP-1 candidate from each scale
-    top_candidates = {}
-    for scale in ['L1', 'L2', 'L3']:
-        candidates = candidate_info.get(scale, [])
-        if candidates:
-            top_candidates[scale] = candidates[0]
+    top_candidates = {
+        scale: candidates[0]
+        for scale, candidates in zip(_SCALES, as_scale_tuple(candidate_info))
+        if candidates
+    }
     
     if len(top_candidates) <= 1:
         # Only 0 or 1 scale has candidates, no conflict
@@ -128,23 +160,188 @@ def detect_cross_scale_conflicts(candidate_info: Dict[str, List[int]],
         }
     
     # Detect conflicts
-    # Find inconsistent scales
-    conflicting_scales = []
-    consensus_candidate = None
+    # Majority voting over at most 3 TOP-1 candidates (ties go to the first scale)
+    a, b, c = top_values + [None] * (3 - len(top_values))
+    consensus_candidate = a if a == b or a == c else (b if b == c else a)
     
-    # Count occurrences of each candidate
-    candidate_counts = defaultdict(int)
-    for kg2_id in top_values:
-        candidate_counts[kg2_id] += 1
+    # Find scales inconsistent with consensus
+    conflicting_scales = [scale for scale, kg2_id in top_candidates.items() if kg2_id != consensus_candidate]
     
-    # Find candidate with most occurrences (majority voting)
-    if candidate_counts:
-        consensus_candidate = max(candidate_counts.items(), key=lambda x: x[1])[0]
+    conflict_details = f"Conflict detected: {len(conflicting_scales)} scale(s) disagree. "
+    conflict_details += f"Consensus candidate: {consensus_candidate}, "
+    conflict_details += f"Conflicting scales: {conflicting_scales}"
     
-    # Find scales inconsistent with consensus
-    for scale, kg2_id in top_candidates.items():
-        if kg2_id != consensus_candidate:
-            conflicting_scales.append(scale)
+    return {
+        'has_conflict': True,
+        'conflict_type': 'cross_scale',
+        'conflicting_scales': conflicting_scales,
+        'top_candidates': top_candidates,
+        'consensus_candidate': consensus_candidate,
+        'conflict_details': conflict_details
+    }
+
+
+def pack_top_candidates(candidate_infos: List[Union[Dict[str, List[int]], ScaleCandidates]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pack per-entity candidate information into column-per-scale arrays
+    
+    Args:
+        candidate_infos: [{'L1': [kg2_ids], 'L2': [kg2_ids], 'L3': [kg2_ids]} (or ScaleCandidates), ...]
+        
+    Returns:
+        tuple: (top1, counts), both of shape (N, 3) with columns L1, L2, L3
+        - top1: TOP-1 candidate per scale (NO_CANDIDATE if the scale is empty)
+        - counts: Number of candidates per scale
+    """
+    n = len(candidate_infos)
+    top1 = np.full((n, 3), NO_CANDIDATE, dtype=np.int64)
+    counts = np.zeros((n, 3), dtype=np.int64)
+    
+    for i, candidate_info in enumerate(candidate_infos):
+        for j, candidates in enumerate(as_scale_tuple(candidate_info)):
+            if candidates:
+                top1[i, j] = candidates[0]
+                counts[i, j] = len(candidates)
+    
+    return top1, counts
+
+
+if NUMBA_AVAILABLE:
+    # Not cache=True: this module is imported both as intra_scale_interaction (by
+    # multi_scale_fusion.py) and as multi_scale_fusion.intra_scale_interaction, and
+    # numba's on-disk cache cannot be shared between the two module names
+    @njit(parallel=True, boundscheck=False)
+    def _conflict_kernel(top1, counts, out_has, out_consensus, out_mask, out_scale_count):
+        """
+        Per-row majority vote over the 3 scales (ties go to the first scale)
+        
+        Writes has_conflict (0/1), consensus candidate, a 3-bit mask of
+        conflicting scales (bit j = scale j) and the number of non-empty scales.
+        """
+        for i in prange(top1.shape[0]):
+            n_present = 0
+            best = NO_CANDIDATE
+            best_votes = 0
+            for j in range(3):
+                if counts[i, j] <= 0:
+                    continue
+                n_present += 1
+                votes = 0
+                for k in range(3):
+                    if counts[i, k] > 0 and top1[i, k] == top1[i, j]:
+                        votes += 1
+                if votes > best_votes:
+                    best_votes = votes
+                    best = top1[i, j]
+            mask = 0
+            for j in range(3):
+                if counts[i, j] > 0 and top1[i, j] != best:
+                    mask |= 1 << j
+            out_has[i] = 1 if mask else 0
+            out_consensus[i] = best
+            out_mask[i] = mask
+            out_scale_count[i] = n_present
+
+
+def batch_detect_cross_scale_conflicts(top1: np.ndarray, counts: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Detect cross-scale conflicts for many entities at once
+    
+    Vectorized counterpart of detect_cross_scale_conflicts: majority voting over
+    the TOP-1 candidates of the non-empty scales, ties going to the first scale.
+    
+    Args:
+        top1: (N, 3) TOP-1 candidate per scale (from pack_top_candidates)
+        counts: (N, 3) candidate count per scale (from pack_top_candidates)
+        
+    Returns:
+        dict: Arrays of length N
+        {
+            'has_conflict': bool[N],
+            'consensus_candidate': int64[N],  # NO_CANDIDATE if all scales are empty
+            'conflict_mask': bool[N, 3],      # scales disagreeing with the consensus
+            'scale_count': int64[N]           # number of non-empty scales
+        }
+    """
+    if NUMBA_AVAILABLE:
+        n = top1.shape[0]
+        out_has = np.empty(n, dtype=np.uint8)
+        out_consensus = np.empty(n, dtype=np.int64)
+        out_mask = np.empty(n, dtype=np.uint8)
+        out_scale_count = np.empty(n, dtype=np.int64)
+        _conflict_kernel(np.ascontiguousarray(top1, dtype=np.int64),
+                         np.ascontiguousarray(counts, dtype=np.int64),
+                         out_has, out_consensus, out_mask, out_scale_count)
+        return {
+            'has_conflict': out_has.astype(bool),
+            'consensus_candidate': out_consensus,
+            'conflict_mask': (out_mask[:, None] >> np.arange(3, dtype=np.uint8)) & 1 == 1,
+            'scale_count': out_scale_count
+        }
+    
+    present = counts > 0
+    
+    # votes[i, j]: number of non-empty scales whose TOP-1 equals scale j's TOP-1
+    agree = (top1[:, :, None] == top1[:, None, :]) & present[:, :, None] & present[:, None, :]
+    votes = agree.sum(axis=2)
+    
+    # argmax returns the first maximum, matching the scalar tie-breaking
+    winner = votes.argmax(axis=1)
+    consensus = top1[np.arange(top1.shape[0]), winner]
+    consensus = np.where(present.any(axis=1), consensus, NO_CANDIDATE)
+    
+    conflict_mask = present & (top1 != consensus[:, None])
+    
+    return {
+        'has_conflict': conflict_mask.any(axis=1),
+        'consensus_candidate': consensus,
+        'conflict_mask': conflict_mask,
+        'scale_count': present.sum(axis=1)
+    }
+
+
+def unpack_cross_scale_conflicts(batch_result: Dict[str, np.ndarray], top1: np.ndarray, index: int) -> Dict:
+    """
+    Build the detect_cross_scale_conflicts result for one row of a batch result
+    
+    Args:
+        batch_result: Return value of batch_detect_cross_scale_conflicts
+        top1: (N, 3) TOP-1 candidate array passed to the batch detection
+        index: Row index
+        
+    Returns:
+        dict: Same structure as detect_cross_scale_conflicts
+    """
+    top_candidates = {
+        scale: int(top1[index, j])
+        for j, scale in enumerate(_SCALES)
+        if top1[index, j] != NO_CANDIDATE
+    }
+    consensus = int(batch_result['consensus_candidate'][index])
+    consensus_candidate = consensus if consensus != NO_CANDIDATE else None
+    
+    if batch_result['scale_count'][index] <= 1:
+        return {
+            'has_conflict': False,
+            'conflict_type': 'none',
+            'conflicting_scales': [],
+            'top_candidates': top_candidates,
+            'consensus_candidate': consensus_candidate,
+            'conflict_details': 'No conflict: insufficient scales for comparison'
+        }
+    
+    if not batch_result['has_conflict'][index]:
+        return {
+            'has_conflict': False,
+            'conflict_type': 'none',
+            'conflicting_scales': [],
+            'top_candidates': top_candidates,
+            'consensus_candidate': consensus_candidate,
+            'conflict_details': 'No conflict: all scales agree on top candidate'
+        }
+    
+    mask = batch_result['conflict_mask'][index]
+    conflicting_scales = [scale for j, scale in enumerate(_SCALES) if mask[j]]
     
     conflict_details = f"Conflict detected: {len(conflicting_scales)} scale(s) disagree. "
     conflict_details += f"Consensus candidate: {consensus_candidate}, "
@@ -160,7 +357,7 @@ def detect_cross_scale_conflicts(candidate_info: Dict[str, List[int]],
     }
 
 
-def detect_intra_scale_conflicts(candidate_info: Dict[str, List[int]],
+def detect_intra_scale_conflicts(candidate_info: Union[Dict[str, List[int]], ScaleCandidates],
                                  scale_analysis: Dict[str, Dict]) -> Dict:
     """
     Detect intra-scale conflicts
@@ -169,7 +366,7 @@ def detect_intra_scale_conflicts(candidate_info: Dict[str, List[int]],
     (e.g., many candidate entities, and the top few candidates all have high confidence)
     
     Args:
-        candidate_info: {'L1': [kg2_ids], 'L2': [kg2_ids], 'L3': [kg2_ids]}
+        candidate_info: {'L1': [kg2_ids], 'L2': [kg2_ids], 'L3': [kg2_ids]} (or ScaleCandidates)
         scale_analysis: Intra-scale interaction analysis results
         
     Returns:
@@ -179,21 +376,23 @@ def detect_intra_scale_conflicts(candidate_info: Dict[str, List[int]],
             'conflict_details': {scale: str}
         }
     """
-    conflicted_scales = []
-    conflict_details = {}
+    # If candidate count is high (>3), intra-scale conflict may exist
+    # Or if candidate count is moderate (2-3), but needs further judgment
+    conflicted = [
+        (scale, candidates)
+        for scale, candidates in zip(_SCALES, as_scale_tuple(candidate_info))
+        if len(candidates) > 3
+    ]
     
-    for scale in ['L1', 'L2', 'L3']:
-        candidates = candidate_info.get(scale, [])
-        
-        # If candidate count is high (>3), intra-scale conflict may exist
-        # Or if candidate count is moderate (2-3), but needs further judgment
-        if len(candidates) > 3:
-            conflicted_scales.append(scale)
-            conflict_details[scale] = f"Multiple candidates ({len(candidates)}) in {scale} scale, may need further verification"
+    if not conflicted:
+        return {'conflicted_scales': [], 'conflict_details': {}}
     
     return {
-        'conflicted_scales': conflicted_scales,
-        'conflict_details': conflict_details
+        'conflicted_scales': [scale for scale, _ in conflicted],
+        'conflict_details': {
+            scale: f"Multiple candidates ({len(candidates)}) in {scale} scale, may need further verification"
+            for scale, candidates in conflicted
+        }
     }
 
 
@@ -211,34 +410,36 @@ def generate_conflict_summary(cross_scale_conflicts: Dict,
     Returns:
         str: Conflict summary text
     """
-    summary_parts = []
-    
     # Cross-scale conflict information
     if cross_scale_conflicts['has_conflict']:
-        summary_parts.append("⚠️ Cross-Scale Conflict Detected:")
-        summary_parts.append(f"  - {cross_scale_conflicts['conflict_details']}")
-        summary_parts.append(f"  - Consensus candidate: {cross_scale_conflicts['consensus_candidate']}")
-        summary_parts.append(f"  - Please carefully evaluate consistency across scales")
+        cross_section = (
+            "⚠️ Cross-Scale Conflict Detected:\n"
+            f"  - {cross_scale_conflicts['conflict_details']}\n"
+            f"  - Consensus candidate: {cross_scale_conflicts['consensus_candidate']}\n"
+            "  - Please carefully evaluate consistency across scales"
+        )
     else:
-        summary_parts.append("✓ No cross-scale conflicts: All scales agree on top candidate")
+        cross_section = "✓ No cross-scale conflicts: All scales agree on top candidate"
     
     # Intra-scale conflict information
-    if intra_scale_conflicts['conflicted_scales']:
-        summary_parts.append("\n⚠️ Intra-Scale Conflicts Detected:")
-        for scale in intra_scale_conflicts['conflicted_scales']:
-            summary_parts.append(f"  - {intra_scale_conflicts['conflict_details'][scale]}")
-    
-    # Scale analysis summary
-    summary_parts.append("\nScale Analysis Summary:")
-    for scale in ['L1', 'L2', 'L3']:
-        analysis = scale_analysis.get(scale, {})
-        if analysis.get('candidate_count', 0) > 0:
-            signal = analysis.get('confidence_signal', 'unknown')
-            count = analysis.get('candidate_count', 0)
-            top = analysis.get('top_candidate', 'N/A')
-            summary_parts.append(f"  - {scale} scale: {count} candidate(s), confidence: {signal}, top: {top}")
-    
-    return "\n".join(summary_parts)
+    conflicted_scales = intra_scale_conflicts['conflicted_scales']
+    if conflicted_scales:
+        intra_details = intra_scale_conflicts['conflict_details']
+        intra_section = ["\n⚠️ Intra-Scale Conflicts Detected:"]
+        intra_section += [f"  - {intra_details[scale]}" for scale in conflicted_scales]
+    else:
+        intra_section = []
+    
+    # Scale analysis summary (only scales with candidates)
+    analyses = [(scale, scale_analysis.get(scale, {})) for scale in _SCALES]
+    scale_lines = [
+        f"  - {scale} scale: {analysis['candidate_count']} candidate(s), "
+        f"confidence: {analysis.get('confidence_signal', 'unknown')}, top: {analysis.get('top_candidate', 'N/A')}"
+        for scale, analysis in analyses
+        if analysis.get('candidate_count', 0) > 0
+    ]
+    
+    return "\n".join((cross_section, *intra_section, "\nScale Analysis Summary:", *scale_lines))
 
 
 if __name__ == "__main__":
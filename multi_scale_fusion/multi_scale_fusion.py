@@ -12,13 +12,28 @@ Reference: Logic from LLM_executor.py
 """
 
 import os
+import re
 import sys
-import queue
-import threading
+import json
+import random
+import asyncio
+import pickle
+import hashlib
+import sqlite3
+import time
 from collections import defaultdict
+from functools import lru_cache, wraps
+import numpy as np
 from tqdm import tqdm
 import httpx
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI, RateLimitError
+
+# Optional HTTP/2 support for the shared LLM connection pool (requires h2)
+try:
+    import h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 # Add project path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -30,7 +45,11 @@ try:
         analyze_intra_scale_interaction,
         detect_cross_scale_conflicts,
         detect_intra_scale_conflicts,
-        generate_conflict_summary
+        generate_conflict_summary,
+        pack_top_candidates,
+        batch_detect_cross_scale_conflicts,
+        unpack_cross_scale_conflicts,
+        as_scale_tuple
     )
 except ImportError:
     # If relative import fails, try importing from current directory
@@ -42,15 +61,13 @@ except ImportError:
         analyze_intra_scale_interaction,
         detect_cross_scale_conflicts,
         detect_intra_scale_conflicts,
-        generate_conflict_summary
+        generate_conflict_summary,
+        pack_top_candidates,
+        batch_detect_cross_scale_conflicts,
+        unpack_cross_scale_conflicts,
+        as_scale_tuple
     )
 
-# Try importing ThreadPoolExecutor
-try:
-    from ThreadPoolExecutor import ThreadPoolExecutor
-except ImportError:
-    from concurrent.futures import ThreadPoolExecutor
-
 # Try importing tokens_cal (if exists)
 try:
     import tokens_cal
@@ -62,6 +79,129 @@ except ImportError:
             pass
 
 
+# LLM used for multi-scale fusion judgments
+LLM_MODEL = "gpt-3.5-turbo-1106"
+
+# Seconds between Batch API status checks
+BATCH_POLL_INTERVAL = 30
+
+# Default request budget for per-entity LLM calls (requests per minute)
+LLM_REQUESTS_PER_MINUTE = 500
+
+# Attempts per LLM call when the API answers 429, with exponential backoff (capped)
+LLM_MAX_ATTEMPTS = 6
+LLM_MAX_BACKOFF = 30
+
+# Connection pool of the shared LLM HTTP client
+HTTP_MAX_CONNECTIONS = 500
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 200
+HTTP_TIMEOUT = 60
+
+# Buffer size for the result files, so large outputs need only a few write() calls
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Checkpoint records are flushed one by one but fsynced only every this many
+# records / seconds (and on close), so the event loop does not block on the disk
+CHECKPOINT_FSYNC_RECORDS = 100
+CHECKPOINT_FSYNC_SECONDS = 5.0
+
+# Embedding model used to pre-rank candidates before they are sent to the LLM
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Entity names per embeddings request (the API accepts at most 2048 inputs)
+EMBEDDING_BATCH_SIZE = 2048
+
+
+# LLM Agent Profile
+LLM_AGENT_PROFILE = '''
+Goal: As a knowledge graph alignment expert, determine if the first entity represents the SAME REAL-WORLD OBJECT as one of the candidate entities from multiple scales (L1, L2, L3).
+
+Core Task: Semantic Consistency Judgment
+- You need to judge whether two entities refer to the SAME REAL-WORLD OBJECT based on their semantic meaning
+- Consider entity names, descriptions, and any available context
+- Focus on semantic equivalence, not just ID matching
+- Two entities are aligned if they represent the same real-world entity, even if their names or IDs differ
+
+Constraint: 
+- If there is a semantically matching entity (same real-world object), return ONLY the ID of the matching candidate entity
+- If none of them matches (not the same real-world object), return ONLY "No"
+- Do NOT include any explanation, only return the entity ID or "No"
+    '''
+
+# Judgment instructions (identical for every entity)
+FINAL_INSTRUCTIONS = '''
+
+Semantic Consistency Judgment:
+Do any of the candidate entities represent the SAME REAL-WORLD OBJECT as Entity 1?
+
+Please judge based on SEMANTIC MEANING:
+1. Compare entity names - are they referring to the same real-world entity?
+2. Compare relationships - do they have similar semantic relationships?
+3. Consider the consistency across different scales (L1, L2, L3)
+4. Pay attention to any conflicts reported in the conflict summary
+5. Prefer candidates with higher consensus across scales
+
+IMPORTANT: 
+- Focus on SEMANTIC EQUIVALENCE (same real-world object), not just ID matching
+- Two entities are aligned if they represent the same real-world entity semantically
+- If there is a semantically matching entity, return ONLY the entity ID (e.g., "26471")
+- If none of them match (not the same real-world object), return ONLY "No"
+- Do NOT include any explanation, only return the entity ID or "No"'''
+
+# Static text goes first, in the system message, so every request shares the
+# longest possible prefix and provider-side prompt caching can reuse it
+FUSION_SYSTEM_PROMPT = LLM_AGENT_PROFILE + FINAL_INSTRUCTIONS
+
+
+def file_cache(loader):
+    """
+    Cache the result of a single-file loader as a pickle under <file dir>/.cache
+    
+    The pickle stores the size and mtime of the source file and is reused only
+    while both are unchanged; a missing source or unusable cache falls back to
+    calling the loader.
+    
+    Args:
+        loader: Function taking a file path
+        
+    Returns:
+        function: Cached loader with the same signature
+    """
+    @wraps(loader)
+    def cached_loader(file_path):
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return loader(file_path)
+        source_key = [st.st_size, st.st_mtime_ns]
+        
+        cache_dir = os.path.join(os.path.dirname(file_path), ".cache")
+        cache_file = os.path.join(cache_dir, f"{os.path.basename(file_path)}.{loader.__name__}.pkl")
+        try:
+            with open(cache_file, 'rb') as f:
+                cached_key, result = pickle.load(f)
+            if cached_key == source_key:
+                return result
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable cache {cache_file}: {e}")
+        
+        result = loader(file_path)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'wb') as f:
+                pickle.dump((source_key, result), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            print(f"Warning: Could not write cache {cache_file}: {e}")
+        return result
+    
+    return cached_loader
+
+
+@file_cache
 def load_entity_names(file_path):
     """Load entity ID to name mapping"""
     entity_names = {}
@@ -71,14 +211,13 @@ def load_entity_names(file_path):
     
     with open(file_path, 'r', encoding='utf-8') as f:
         for line in f:
-            parts = line.strip().split('\t')
-            if len(parts) >= 2:
-                try:
-                    entity_id = int(parts[0])
-                    entity_name = parts[1]
-                    entity_names[entity_id] = entity_name
-                except ValueError:
-                    continue
+            entity_id, sep, rest = line.partition('\t')
+            if not sep:
+                continue
+            try:
+                entity_names[int(entity_id)] = rest.partition('\t')[0].rstrip()
+            except ValueError:
+                continue
     return entity_names
 
 
@@ -101,27 +240,18 @@ def load_multi_scale_pairs(data_dir):
         'L3': os.path.join(multi_scale_dir, "L3_hypergraph.txt")
     }
     
-    multi_scale_pairs = defaultdict(lambda: {'L1': [], 'L2': [], 'L3': []})
+    multi_scale_pairs = {}
     
     for scale, file_path in scale_files.items():
         if not os.path.exists(file_path):
             print(f"Warning: {scale} scale file not found: {file_path}")
             continue
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                parts = line.split('\t')
-                if len(parts) >= 2:
-                    try:
-                        kg1_id = int(parts[0])
-                        kg2_id = int(parts[1])
-                        multi_scale_pairs[kg1_id][scale].append(kg2_id)
-                    except ValueError:
-                        continue
+        # Merge scales in order, keeping KG1 entities in order of first appearance
+        for kg1_id, kg2_ids in group_scale_pairs(file_path).items():
+            if kg1_id not in multi_scale_pairs:
+                multi_scale_pairs[kg1_id] = {'L1': [], 'L2': [], 'L3': []}
+            multi_scale_pairs[kg1_id][scale] = kg2_ids
     
     print(f"Loaded multi-scale pairs for {len(multi_scale_pairs)} KG1 entities")
     for kg1_id, scales in list(multi_scale_pairs.items())[:5]:
@@ -130,22 +260,81 @@ def load_multi_scale_pairs(data_dir):
     return multi_scale_pairs
 
 
+def group_scale_pairs(file_path):
+    """
+    Group the KG2 candidates of one scale file by KG1 entity
+    
+    Args:
+        file_path: Hypergraph pair file (kg1_id\tkg2_id per line)
+        
+    Returns:
+        dict: {kg1_entity_id: [kg2_ids]}, both in file order
+    """
+    # Well-formed files are parsed and grouped in pandas/NumPy
+    try:
+        import pandas as pd
+        df = pd.read_csv(file_path, sep='\t', usecols=[0, 1], names=['k1', 'k2'], header=None,
+                         engine='c', dtype=np.int64)
+        # Stable group-by on first-appearance codes (lists of Python ints, not NumPy scalars)
+        codes, kg1_ids = pd.factorize(df['k1'].to_numpy())
+        order = np.argsort(codes, kind='stable')
+        bounds = np.cumsum(np.bincount(codes, minlength=len(kg1_ids)))[:-1]
+        groups = np.split(df['k2'].to_numpy()[order], bounds)
+        return dict(zip(kg1_ids.tolist(), (group.tolist() for group in groups)))
+    except Exception:
+        # No pandas, or empty, ragged or non-numeric rows: use the lenient line parser
+        pass
+    
+    grouped = {}
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            kg1_id, sep, rest = line.partition('\t')
+            if not sep:
+                continue
+            try:
+                kg1_id = int(kg1_id)
+                kg2_id = int(rest.partition('\t')[0])
+            except ValueError:
+                continue
+            if kg1_id in grouped:
+                grouped[kg1_id].append(kg2_id)
+            else:
+                grouped[kg1_id] = [kg2_id]
+    return grouped
+
+
 def load_triples(file_path):
     """Load triples data"""
     triples = []
     if not os.path.exists(file_path):
         return triples
+    
+    # Well-formed files are parsed in one pass by the pandas C parser
+    try:
+        import pandas as pd
+        df = pd.read_csv(file_path, sep='\t', usecols=[0, 1, 2], header=None,
+                         engine='c', dtype=np.int64)
+        return list(map(tuple, df.to_numpy().tolist()))
+    except Exception:
+        # No pandas, or empty, ragged or non-numeric rows: use the lenient line parser
+        pass
+    
     with open(file_path, 'r', encoding='utf-8') as f:
         for line in f:
-            parts = line.strip().split('\t')
-            if len(parts) >= 3:
-                try:
-                    triples.append((int(parts[0]), int(parts[1]), int(parts[2])))
-                except ValueError:
-                    continue
+            h, sep, rest = line.partition('\t')
+            if not sep:
+                continue
+            r, sep, rest = rest.partition('\t')
+            if not sep:
+                continue
+            try:
+                triples.append((int(h), int(r), int(rest.partition('\t')[0])))
+            except ValueError:
+                continue
     return triples
 
 
+@file_cache
 def load_relation_names(file_path):
     """Load relation names"""
     rel_names = {}
@@ -153,25 +342,49 @@ def load_relation_names(file_path):
         return rel_names
     with open(file_path, 'r', encoding='utf-8') as f:
         for line in f:
-            parts = line.strip().split('\t')
-            if len(parts) >= 2:
-                try:
-                    rel_id = int(parts[0])
-                    rel_name = parts[1]
-                    rel_names[rel_id] = rel_name
-                except ValueError:
-                    continue
+            rel_id, sep, rest = line.partition('\t')
+            if not sep:
+                continue
+            try:
+                rel_names[int(rel_id)] = rest.partition('\t')[0].rstrip()
+            except ValueError:
+                continue
     return rel_names
 
 
-def get_entity_context(entity_id, entity_names, triples=None, rel_names=None, n=3):
+def build_entity_relation_index(triples):
+    """
+    Index triples by entity
+    
+    Args:
+        triples: Triples list [(h, r, t), ...]
+        
+    Returns:
+        dict: {entity_id: [(role, r, other_entity), ...]} in triple order, where role
+        is 'h' if the entity is the head of the triple and 't' if it is the tail
+    """
+    ent2rels = defaultdict(list)
+    for h, r, t in triples:
+        ent2rels[h].append(('h', r, t))
+        if t != h:
+            ent2rels[t].append(('t', r, h))
+    return dict(ent2rels)
+
+
+@file_cache
+def load_entity_relation_index(file_path):
+    """Load triples and index them by entity (see build_entity_relation_index)"""
+    return build_entity_relation_index(load_triples(file_path))
+
+
+def get_entity_context(entity_id, entity_names, ent2rels=None, rel_names=None, n=3):
     """
     Get entity context information (including relation information for semantic judgment)
     
     Args:
         entity_id: Entity ID
         entity_names: Entity name dictionary
-        triples: Triples list (optional)
+        ent2rels: Entity relation index from build_entity_relation_index (optional)
         rel_names: Relation name dictionary (optional)
         n: Return top n relations
         
@@ -181,19 +394,15 @@ def get_entity_context(entity_id, entity_names, triples=None, rel_names=None, n=
     context = f"Entity Name: {entity_names.get(entity_id, f'Unknown (ID: {entity_id})')}"
     
     # Add relation information (if available)
-    if triples and rel_names:
+    if ent2rels and rel_names:
         relations = []
-        for h, r, t in triples:
-            if h == entity_id:
-                rel_str = rel_names.get(r, f"relation_{r}")
-                tail_str = entity_names.get(t, f"entity_{t}")
-                relations.append(f"- Has relation '{rel_str}' with {tail_str}")
-            elif t == entity_id:
-                rel_str = rel_names.get(r, f"relation_{r}")
-                head_str = entity_names.get(h, f"entity_{h}")
-                relations.append(f"- Is '{rel_str}' of {head_str}")
-            if len(relations) >= n:
-                break
+        for role, r, other in ent2rels.get(entity_id, ())[:n]:
+            rel_str = rel_names.get(r, f"relation_{r}")
+            other_str = entity_names.get(other, f"entity_{other}")
+            if role == 'h':
+                relations.append(f"- Has relation '{rel_str}' with {other_str}")
+            else:
+                relations.append(f"- Is '{rel_str}' of {other_str}")
         
         if relations:
             context += "\nRelationships:\n" + "\n".join(relations[:n])
@@ -203,13 +412,118 @@ def get_entity_context(entity_id, entity_names, triples=None, rel_names=None, n=
     return context
 
 
-def multi_scale_fusion(data_dir, output_file=None):
+def candidate_id_pattern(candidates):
+    """
+    Compile a regex matching any candidate ID as a whole number
+    
+    Args:
+        candidates: Iterable of KG2 candidate IDs (non-empty)
+        
+    Returns:
+        re.Pattern: Pattern whose group 1 is the matched ID
+    """
+    # Longest first, so a longer ID is never cut short by one of its prefixes
+    ids = sorted({str(candidate) for candidate in candidates}, key=len, reverse=True)
+    return re.compile(r"\b(" + "|".join(ids) + r")\b")
+
+
+def load_or_compute_entity_embeddings(ent_names, cache_path, client=None):
+    """
+    Load entity name embeddings from cache, or compute them with EMBEDDING_MODEL
+    
+    Args:
+        ent_names: Entity name dictionary {entity_id: name}
+        cache_path: Embedding matrix cache (.npy); entity IDs are stored next to it (.ids.npy)
+        client: OpenAI client used when the cache is missing or stale (optional)
+    
+    Returns:
+        tuple: ({entity_id: row}, L2-normalized float32 matrix), or None if no
+        embeddings are cached and no client is configured
+    """
+    ids = np.fromiter(sorted(ent_names), dtype=np.int64, count=len(ent_names))
+    ids_path = os.path.splitext(cache_path)[0] + ".ids.npy"
+    
+    embs = None
+    if os.path.exists(cache_path) and os.path.exists(ids_path):
+        try:
+            cached_ids = np.load(ids_path)
+            if np.array_equal(cached_ids, ids):
+                embs = np.load(cache_path)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read embedding cache {cache_path}: {e}")
+    
+    if embs is None:
+        if client is None or len(ids) == 0:
+            return None
+        print(f"Computing {EMBEDDING_MODEL} embeddings for {len(ids)} entities...")
+        # Empty names are rejected by the API, fall back to the entity ID
+        texts = [ent_names[int(entity_id)] or str(entity_id) for entity_id in ids]
+        rows = []
+        for start in tqdm(range(0, len(texts), EMBEDDING_BATCH_SIZE), desc="Embedding entities"):
+            response = client.embeddings.create(model=EMBEDDING_MODEL,
+                                                input=texts[start:start + EMBEDDING_BATCH_SIZE])
+            rows.extend(item.embedding for item in response.data)
+        embs = np.asarray(rows, dtype=np.float32)
+        # Normalize once so a dot product is the cosine similarity
+        norms = np.linalg.norm(embs, axis=1, keepdims=True)
+        embs /= np.maximum(norms, 1e-12)
+        try:
+            np.save(cache_path, embs)
+            np.save(ids_path, ids)
+        except OSError as e:
+            print(f"Warning: Could not write embedding cache {cache_path}: {e}")
+    
+    index = {int(entity_id): row for row, entity_id in enumerate(ids)}
+    return index, embs
+
+
+def top_k_candidates(kg1_entity, candidates, embeddings_1, embeddings_2, k):
+    """
+    Keep the k candidates whose names are most similar to the KG1 entity name
+    
+    Args:
+        kg1_entity: KG1 entity ID
+        candidates: Iterable of KG2 candidate IDs
+        embeddings_1: KG1 result of load_or_compute_entity_embeddings
+        embeddings_2: KG2 result of load_or_compute_entity_embeddings
+        k: Number of candidates to keep
+    
+    Returns:
+        set: Kept candidate IDs (all candidates if there are at most k, or the
+        KG1 entity has no embedding); candidates without an embedding rank last
+    """
+    candidates = list(candidates)
+    index_1, embs_1 = embeddings_1
+    index_2, embs_2 = embeddings_2
+    if len(candidates) <= k or kg1_entity not in index_1:
+        return set(candidates)
+    
+    rows = [index_2.get(kg2_entity, -1) for kg2_entity in candidates]
+    sim = embs_2[rows] @ embs_1[index_1[kg1_entity]]
+    sim[np.asarray(rows) < 0] = -np.inf
+    keep = np.argsort(-sim, kind='stable')[:k]
+    return {candidates[i] for i in keep}
+
+
+def multi_scale_fusion(data_dir, output_file=None, max_concurrency=200, batch_mode=False, resume=True,
+                       use_cache=True, top_k=0, requests_per_minute=LLM_REQUESTS_PER_MINUTE):
     """
     Multi-scale interactive enhancement fusion
     
     Args:
         data_dir: Data directory path
         output_file: Output file path (default: message_pool/multi_scale_fusion_results.txt)
+        max_concurrency: Maximum number of in-flight LLM requests (default: 200)
+        batch_mode: Submit all prompts as one OpenAI Batch API job instead of
+            calling the API per entity (cheaper, but completes within 24h rather than immediately)
+        resume: Skip entities already judged in the checkpoint (<output_file stem>.jsonl),
+            as long as the multi-scale hypergraph files have not changed since
+        use_cache: Reuse LLM answers for identical prompts from data_dir/.llm_cache.sqlite3
+        top_k: Only show the LLM the top_k candidates most similar to the KG1 entity by
+            name embedding (default 0: every candidate). Needs cached entity embeddings
+            or OPENAI_API_KEY to compute them; otherwise every candidate is shown
+        requests_per_minute: Rate limit for per-entity LLM calls (None or 0: no limit);
+            requests rejected with 429 are retried with exponential backoff
     """
     print("\n" + "=" * 80)
     print("Multi-Scale Fusion: Multi-Scale Interactive Enhancement")
@@ -232,18 +546,28 @@ def multi_scale_fusion(data_dir, output_file=None):
     rel_ids_1_path = os.path.join(data_dir, 'rel_ids_1')
     rel_ids_2_path = os.path.join(data_dir, 'rel_ids_2')
     
-    triples_1 = load_triples(triples_1_path)
-    triples_2 = load_triples(triples_2_path)
+    # Relations are indexed by entity once, instead of scanning all triples per context
+    ent2rels_1 = load_entity_relation_index(triples_1_path)
+    ent2rels_2 = load_entity_relation_index(triples_2_path)
     rel_names_1 = load_relation_names(rel_ids_1_path)
     rel_names_2 = load_relation_names(rel_ids_2_path)
     
     print(f"Loaded {len(ent_names_1)} KG1 entities")
     print(f"Loaded {len(ent_names_2)} KG2 entities")
-    print(f"Loaded {len(triples_1)} KG1 triples")
-    print(f"Loaded {len(triples_2)} KG2 triples")
+    print(f"Loaded triples of {len(ent2rels_1)} KG1 entities")
+    print(f"Loaded triples of {len(ent2rels_2)} KG2 entities")
     print(f"Loaded {len(rel_names_1)} KG1 relations")
     print(f"Loaded {len(rel_names_2)} KG2 relations")
     
+    # Candidates recur across scales and KG1 entities, so format each context at most once
+    @lru_cache(maxsize=200_000)
+    def kg1_entity_context(entity_id):
+        return get_entity_context(entity_id, ent_names_1, ent2rels_1, rel_names_1, n=5)
+    
+    @lru_cache(maxsize=200_000)
+    def kg2_entity_context(entity_id):
+        return get_entity_context(entity_id, ent_names_2, ent2rels_2, rel_names_2, n=5)
+    
     # Load multi-scale entity pairs
     multi_scale_pairs = load_multi_scale_pairs(data_dir)
     
@@ -251,173 +575,284 @@ def multi_scale_fusion(data_dir, output_file=None):
         print("Error: No multi-scale pairs found. Please run s4_to_retrieval.py first.")
         return []
     
-    # Setup OpenAI client
-    # Note: API credentials should be configured via environment variables or config file
-    # Example: client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    client = None  # TODO: Configure OpenAI client with proper credentials
+    # Setup OpenAI client (async, so one event loop can keep many requests in flight)
+    # Note: API credentials are read from the OPENAI_API_KEY / OPENAI_API_BASE environment variables
+    client = create_llm_client()
+    if client is None:
+        print("Warning: OPENAI_API_KEY is not set, LLM requests cannot be sent")
     
-    # LLM Agent Profile
-    LLM_Agent_Profile = '''
-Goal: As a knowledge graph alignment expert, determine if the first entity represents the SAME REAL-WORLD OBJECT as one of the candidate entities from multiple scales (L1, L2, L3).
-
-Core Task: Semantic Consistency Judgment
-- You need to judge whether two entities refer to the SAME REAL-WORLD OBJECT based on their semantic meaning
-- Consider entity names, descriptions, and any available context
-- Focus on semantic equivalence, not just ID matching
-- Two entities are aligned if they represent the same real-world entity, even if their names or IDs differ
-
-Constraint: 
-- If there is a semantically matching entity (same real-world object), return ONLY the ID of the matching candidate entity
-- If none of them matches (not the same real-world object), return ONLY "No"
-- Do NOT include any explanation, only return the entity ID or "No"
-    '''
+    embeddings_1 = embeddings_2 = None
+    if top_k:
+        # Embedding client for the top-k candidate pre-filter (synchronous, used once before fusion)
+        embedding_client = create_embedding_client()
+        embeddings_1 = load_or_compute_entity_embeddings(
+            ent_names_1, os.path.join(data_dir, ".entity_embeddings_1.npy"), embedding_client)
+        embeddings_2 = load_or_compute_entity_embeddings(
+            ent_names_2, os.path.join(data_dir, ".entity_embeddings_2.npy"), embedding_client)
+        if embeddings_1 is None or embeddings_2 is None:
+            print("Warning: Entity embeddings unavailable, sending all candidates to the LLM")
+            embeddings_1 = embeddings_2 = None
     
     aligned_pairs = []
-    lock = threading.Lock()
-    executor = ThreadPoolExecutor(max_workers=30)
-    result_queue = queue.Queue()
     
-    def fusion_task(kg1_entity, candidate_info):
+    def build_prompt(kg1_entity, candidate_info, batch_index=None):
+        """
+        Build the multi-scale fusion prompt for a single KG1 entity
+        
+        Args:
+            kg1_entity: KG1 entity ID
+            candidate_info: {'L1': [kg2_ids], 'L2': [kg2_ids], 'L3': [kg2_ids]} or ([L1], [L2], [L3]) tuple
+            batch_index: Row of this entity in the batched cross-scale conflict results (optional)
+            
+        Returns:
+            tuple: (messages, all_candidates, scale_lists), or None if the entity has no candidates
+        """
+        # Per-scale candidate lists as an (L1, L2, L3) tuple, shared by all detection steps
+        scale_lists = as_scale_tuple(candidate_info)
+        
+        # Collect all candidate entities (deduplicated)
+        all_candidates = set().union(*scale_lists)
+        
+        if not all_candidates:
+            return None
+        
+        # Only the candidates closest to the KG1 entity by name embedding are shown to
+        # (and accepted from) the LLM, so conflicts are analyzed on that same set
+        if embeddings_1 is not None:
+            kept = top_k_candidates(kg1_entity, all_candidates, embeddings_1, embeddings_2, top_k)
+            if len(kept) < len(all_candidates):
+                all_candidates = kept
+                scale_lists = tuple([c for c in candidates if c in kept] for candidates in scale_lists)
+                # The bulk cross-scale results were computed on the unfiltered lists
+                batch_index = None
+        
+        # ===== Intra-scale interaction and conflict detection =====
+        # 1. Analyze intra-scale interaction
+        scale_analysis = analyze_intra_scale_interaction(scale_lists, ent_names_2)
+        
+        # 2. Detect cross-scale conflicts (precomputed in bulk when available)
+        if batch_index is not None:
+            cross_scale_conflicts = unpack_cross_scale_conflicts(cross_scale_batch, top1, batch_index)
+        else:
+            cross_scale_conflicts = detect_cross_scale_conflicts(scale_lists, scale_analysis)
+        
+        # 3. Detect intra-scale conflicts
+        intra_scale_conflicts = detect_intra_scale_conflicts(scale_lists, scale_analysis)
+        
+        # 4. Generate conflict summary
+        conflict_summary = generate_conflict_summary(
+            cross_scale_conflicts, 
+            intra_scale_conflicts, 
+            scale_analysis
+        )
+        # ===== End conflict detection =====
+        
+        # Build KG1 entity context (including relation information for semantic judgment)
+        context1 = kg1_entity_context(kg1_entity)
+        
+        # Build candidate entity contexts (grouped by scale, considering intra-scale ranking, including relation information)
+        candidates_contexts = []
+        for scale, candidates in zip(('L1', 'L2', 'L3'), scale_lists):
+            scale_conf = scale_analysis.get(scale, {}).get('confidence_signal', 'unknown')
+            for rank, kg2_entity in enumerate(candidates, 1):
+                # Get candidate entity context (including relation information)
+                context2 = kg2_entity_context(kg2_entity)
+                # Add ranking information
+                rank_info = f" (Rank {rank} in {scale}, confidence: {scale_conf})" if rank == 1 else f" (Rank {rank} in {scale})"
+                candidates_contexts.append({
+                    'entity_id': kg2_entity,
+                    'scale': scale,
+                    'rank': rank,
+                    'context': context2 + rank_info
+                })
+        
+        # Build Prompt: static system message, then the per-entity block
+        # (KG1 entity, candidates, conflict information), joined once instead of grown with +=
+        parts = [f"Entity 1 (KG1, ID: {kg1_entity}):\n{context1}\n\nCandidate entities from multiple scales:"]
+        parts.extend(
+            f"\n\nCandidate {i} (KG2, ID: {candidate['entity_id']}, from {candidate['scale']} scale):\n{candidate['context']}"
+            for i, candidate in enumerate(candidates_contexts, 1)
+        )
+        parts.append(f"\n\n{conflict_summary}")
+        prompt = "".join(parts)
+        
+        messages = [
+            {'role': 'system', 'content': FUSION_SYSTEM_PROMPT},
+            {'role': 'user', 'content': prompt}
+        ]
+        
+        return messages, all_candidates, scale_lists
+    
+    def record_answer(kg1_entity, answer, all_candidates, scale_lists):
+        """Parse an LLM answer, record the aligned pair (if any) and checkpoint it"""
+        print(f"Processing entity {kg1_entity} with {len(all_candidates)} candidates from {sum(1 for candidates in scale_lists if candidates)} scales")
+        print(f"Answer: {answer}")
+        
+        # Parse answer
+        matched = None
+        if answer.lower() != "no":
+            # Extract the first candidate ID mentioned as a whole number (so "12" no longer matches "123")
+            match = candidate_id_pattern(all_candidates).search(answer)
+            if match:
+                matched = int(match.group(1))
+                # Tasks share one event loop thread, so no lock is needed
+                aligned_pairs.append((kg1_entity, matched))
+        
+        checkpoint_f.write({'kg1': kg1_entity, 'kg2': matched, 'answer': answer})
+    
+    async def fusion_task(kg1_entity, candidate_info, semaphore, limiter=None, batch_index=None):
         """
         Perform multi-scale fusion judgment for a single KG1 entity
         
         Args:
             kg1_entity: KG1 entity ID
-            candidate_info: {'L1': [kg2_ids], 'L2': [kg2_ids], 'L3': [kg2_ids]}
+            candidate_info: {'L1': [kg2_ids], 'L2': [kg2_ids], 'L3': [kg2_ids]} or ([L1], [L2], [L3]) tuple
+            semaphore: asyncio.Semaphore bounding the number of concurrent LLM requests
+            limiter: AsyncRateLimiter bounding the request rate (optional)
+            batch_index: Row of this entity in the batched cross-scale conflict results (optional)
         """
         try:
-            # Collect all candidate entities (deduplicated)
-            all_candidates = set()
-            scale_to_candidates = {}
-            
-            for scale in ['L1', 'L2', 'L3']:
-                candidates = candidate_info.get(scale, [])
-                scale_to_candidates[scale] = candidates
-                all_candidates.update(candidates)
-            
-            if not all_candidates:
+            built = build_prompt(kg1_entity, candidate_info, batch_index)
+            if built is None:
                 return
+            messages, all_candidates, scale_lists = built
             
-            # ===== Intra-scale interaction and conflict detection =====
-            # 1. Analyze intra-scale interaction
-            scale_analysis = analyze_intra_scale_interaction(candidate_info, ent_names_2)
-            
-            # 2. Detect cross-scale conflicts
-            cross_scale_conflicts = detect_cross_scale_conflicts(candidate_info, scale_analysis)
-            
-            # 3. Detect intra-scale conflicts
-            intra_scale_conflicts = detect_intra_scale_conflicts(candidate_info, scale_analysis)
-            
-            # 4. Generate conflict summary
-            conflict_summary = generate_conflict_summary(
-                cross_scale_conflicts, 
-                intra_scale_conflicts, 
-                scale_analysis
-            )
-            # ===== End conflict detection =====
-            
-            # Build KG1 entity context (including relation information for semantic judgment)
-            context1 = get_entity_context(kg1_entity, ent_names_1, triples_1, rel_names_1, n=5)
-            
-            # Build candidate entity contexts (grouped by scale, considering intra-scale ranking, including relation information)
-            candidates_contexts = []
-            for scale in ['L1', 'L2', 'L3']:
-                candidates = scale_to_candidates.get(scale, [])
-                scale_conf = scale_analysis.get(scale, {}).get('confidence_signal', 'unknown')
-                for rank, kg2_entity in enumerate(candidates, 1):
-                    # Get candidate entity context (including relation information)
-                    context2 = get_entity_context(kg2_entity, ent_names_2, triples_2, rel_names_2, n=5)
-                    # Add ranking information
-                    rank_info = f" (Rank {rank} in {scale}, confidence: {scale_conf})" if rank == 1 else f" (Rank {rank} in {scale})"
-                    candidates_contexts.append({
-                        'entity_id': kg2_entity,
-                        'scale': scale,
-                        'rank': rank,
-                        'context': context2 + rank_info
-                    })
-            
-            # Build Prompt (including conflict information)
-            prompt = LLM_Agent_Profile + f"""
-
-Entity 1 (KG1, ID: {kg1_entity}):
-{context1}
-
-{conflict_summary}
-
-Candidate entities from multiple scales:"""
-            
-            for i, candidate in enumerate(candidates_contexts, 1):
-                prompt += f"\n\nCandidate {i} (KG2, ID: {candidate['entity_id']}, from {candidate['scale']} scale):\n{candidate['context']}"
-            
-            prompt += """\n\nSemantic Consistency Judgment:
-Do any of these candidate entities represent the SAME REAL-WORLD OBJECT as Entity 1?
-
-Please judge based on SEMANTIC MEANING:
-1. Compare entity names - are they referring to the same real-world entity?
-2. Compare relationships - do they have similar semantic relationships?
-3. Consider the consistency across different scales (L1, L2, L3)
-4. Pay attention to any conflicts detected above
-5. Prefer candidates with higher consensus across scales
-
-IMPORTANT: 
-- Focus on SEMANTIC EQUIVALENCE (same real-world object), not just ID matching
-- Two entities are aligned if they represent the same real-world entity semantically
-- If there is a semantically matching entity, return ONLY the entity ID (e.g., "26471")
-- If none of them match (not the same real-world object), return ONLY "No"
-- Do NOT include any explanation, only return the entity ID or "No":"""
-            
-            # Call LLM
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo-1106",
-                messages=[{'role': 'user', 'content': prompt}]
-            )
-            
-            answer = response.choices[0].message.content.strip()
-            
-            # Update token count
-            try:
-                tokens_cal.update_add_var(response.usage.total_tokens)
-            except:
-                pass
+            # Identical prompts (reruns, shared candidate sets) are answered from the cache
+            cache_key = LLMResponseCache.key(LLM_MODEL, messages)
+            answer = response_cache.get(cache_key) if response_cache is not None else None
             
-            print(f"Processing entity {kg1_entity} with {len(all_candidates)} candidates from {len([s for s in ['L1','L2','L3'] if scale_to_candidates.get(s)])} scales")
-            print(f"Answer: {answer}")
+            if answer is None:
+                # Call LLM
+                async def request():
+                    async with semaphore:
+                        if limiter is not None:
+                            await limiter.acquire()
+                        return await client.chat.completions.create(
+                            model=LLM_MODEL,
+                            messages=messages
+                        )
+                
+                response = await call_with_backoff(request)
+                
+                answer = response.choices[0].message.content.strip()
+                if response_cache is not None:
+                    response_cache.set(cache_key, answer)
+                
+                # Update token count
+                try:
+                    tokens_cal.update_add_var(response.usage.total_tokens)
+                except:
+                    pass
             
-            # Parse answer
-            if answer.lower() != "no":
-                # Try to extract entity ID
-                for kg2_id in all_candidates:
-                    if str(kg2_id) in answer:
-                        with lock:
-                            result_queue.put((kg1_entity, kg2_id))
-                            aligned_pairs.append((kg1_entity, kg2_id))
-                        break
+            record_answer(kg1_entity, answer, all_candidates, scale_lists)
         
         except Exception as e:
             print(f"Error processing entity {kg1_entity}: {str(e)}")
             import traceback
             traceback.print_exc()
     
-    # Process each KG1 entity
-    print(f"\nStarting multi-scale fusion for {len(multi_scale_pairs)} entities...")
-    for kg1_entity, candidate_info in tqdm(multi_scale_pairs.items(), desc="Submitting tasks"):
-        executor.submit(fusion_task, kg1_entity, candidate_info)
+    async def run_batch():
+        """Submit every prompt as one OpenAI Batch API job and record the answers"""
+        prompts = {}
+        for i, kg1_entity, candidate_info in pending:
+            try:
+                built = build_prompt(kg1_entity, candidate_info, i)
+            except Exception as e:
+                print(f"Error processing entity {kg1_entity}: {str(e)}")
+                continue
+            if built is not None:
+                prompts[kg1_entity] = built
+        
+        # Only prompts without a cached answer go into the batch
+        answers = {}
+        uncached = {}
+        for kg1_entity, (messages, _, _) in prompts.items():
+            cache_key = LLMResponseCache.key(LLM_MODEL, messages)
+            answer = response_cache.get(cache_key) if response_cache is not None else None
+            if answer is not None:
+                answers[str(kg1_entity)] = answer
+            else:
+                uncached[str(kg1_entity)] = (cache_key, messages)
+        
+        batch_file = os.path.join(message_pool_dir, "multi_scale_fusion_batch.jsonl")
+        if uncached and client is None:
+            # Unjudged entities stay out of the checkpoint, so a later run with a client picks them up
+            print(f"Error: Batch mode needs a configured OpenAI client, skipping {len(uncached)} uncached prompts "
+                  f"({len(answers)} answered from the cache)")
+            batch_answers = {}
+        else:
+            batch_answers = await submit_batch(
+                client, {custom_id: messages for custom_id, (_, messages) in uncached.items()}, batch_file
+            )
+        for custom_id, answer in batch_answers.items():
+            if response_cache is not None:
+                response_cache.set(uncached[custom_id][0], answer)
+            answers[custom_id] = answer
+        
+        for kg1_entity, (messages, all_candidates, scale_lists) in prompts.items():
+            answer = answers.get(str(kg1_entity))
+            if answer is not None:
+                record_answer(kg1_entity, answer, all_candidates, scale_lists)
     
-    # Wait for all tasks to complete
-    executor.shutdown(wait=True)
+    # Detect cross-scale conflicts for all entities in one vectorized pass
+    # (candidate dicts are converted to (L1, L2, L3) tuples once, up front)
+    entity_items = [(kg1_entity, as_scale_tuple(candidate_info))
+                    for kg1_entity, candidate_info in multi_scale_pairs.items()]
+    top1, counts = pack_top_candidates([candidate_info for _, candidate_info in entity_items])
+    cross_scale_batch = batch_detect_cross_scale_conflicts(top1, counts)
     
-    # Write results to file
+    # Judgments are checkpointed one per line as they arrive, so an interrupted
+    # run only re-queries the entities it had not finished
+    checkpoint_file = os.path.splitext(output_file)[0] + ".jsonl"
+    fingerprint = multi_scale_inputs_fingerprint(data_dir)
+    completed = load_fusion_checkpoint(checkpoint_file, fingerprint) if resume else {}
+    aligned_pairs.extend((kg1_entity, kg2_id) for kg1_entity, kg2_id in completed.items() if kg2_id is not None)
+    pending = [(i, kg1_entity, candidate_info)
+               for i, (kg1_entity, candidate_info) in enumerate(entity_items)
+               if kg1_entity not in completed]
+    if completed:
+        print(f"Resuming from checkpoint {checkpoint_file}: {len(completed)} entities already judged, "
+              f"{len(pending)} remaining")
     os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else '.', exist_ok=True)
+    checkpoint_f = open_fusion_checkpoint(checkpoint_file, fingerprint, append=bool(completed))
+    response_cache = LLMResponseCache(os.path.join(data_dir, ".llm_cache.sqlite3")) if use_cache else None
     
-    with open(output_file, 'w', encoding='utf-8') as output_f:
-        while not result_queue.empty():
-            kg1_entity, kg2_id = result_queue.get()
-            output_f.write(f"{kg1_entity}\t{kg2_id}\n")
-            output_f.flush()
+    async def run_fusion_tasks():
+        """Run fusion_task for every KG1 entity, at most max_concurrency LLM calls at a time"""
+        # Created inside the running loop (asyncio primitives bind to it on older Pythons)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        limiter = AsyncRateLimiter(requests_per_minute) if requests_per_minute else None
+        tasks = [
+            fusion_task(kg1_entity, candidate_info, semaphore, limiter, i)
+            for i, kg1_entity, candidate_info in pending
+        ]
+        for task in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="Fusing entities"):
+            await task
     
-    # Deduplicate and get alignment results
-    unique_pairs = deduplicate_output_file(output_file)
-    aligned_pairs = list(unique_pairs) if unique_pairs else []
+    async def run_and_close(coro):
+        """Await coro, then close the client's connection pool inside the same event loop"""
+        try:
+            await coro
+        finally:
+            if hasattr(client, 'close'):
+                await client.close()
+    
+    # Process each KG1 entity
+    print(f"\nStarting multi-scale fusion for {len(multi_scale_pairs)} entities...")
+    try:
+        if batch_mode:
+            asyncio.run(run_and_close(run_batch()))
+        else:
+            asyncio.run(run_and_close(run_fusion_tasks()))
+    finally:
+        checkpoint_f.close()
+        if response_cache is not None:
+            response_cache.close()
+    
+    # Deduplicate in memory and write the sorted results in one pass
+    aligned_pairs = sorted(set(aligned_pairs))
+    with open(output_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as output_f:
+        output_f.writelines(f"{kg1_entity}\t{kg2_id}\n" for kg1_entity, kg2_id in aligned_pairs)
     
     print(f"\n" + "=" * 80)
     print(f"Multi-scale fusion completed!")
@@ -436,34 +871,389 @@ IMPORTANT:
     return aligned_pairs
 
 
-def deduplicate_output_file(file_path):
-    """Deduplicate output file"""
-    if not os.path.exists(file_path):
-        return set()
+class AsyncRateLimiter:
+    """
+    Token bucket limiting how often acquire() returns
     
-    # Read all lines and deduplicate
-    unique_pairs = set()
-    with open(file_path, 'r', encoding='utf-8') as f:
+    Allows bursts of up to max_rate requests, refilled at max_rate per
+    time_period seconds. Must be used from a single event loop.
+    """
+    
+    def __init__(self, max_rate, time_period=60):
+        """
+        Args:
+            max_rate: Requests allowed per time_period
+            time_period: Length of the rate window in seconds
+        """
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._tokens = float(max_rate)
+        self._updated = None
+        self._lock = None
+    
+    async def acquire(self):
+        """Wait until a request may be sent"""
+        loop = asyncio.get_running_loop()
+        # Created lazily inside the running loop (asyncio primitives bind to it on older Pythons)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if self._updated is not None:
+                    refill = (now - self._updated) * self.max_rate / self.time_period
+                    self._tokens = min(self.max_rate, self._tokens + refill)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) * self.time_period / self.max_rate)
+
+
+async def call_with_backoff(request, max_attempts=LLM_MAX_ATTEMPTS, max_backoff=LLM_MAX_BACKOFF):
+    """
+    Await request(), retrying with jittered exponential backoff on rate limit errors
+    
+    Args:
+        request: Coroutine function performing one API call
+        max_attempts: Total number of attempts
+        max_backoff: Upper bound of a single wait in seconds
+        
+    Returns:
+        The result of request()
+    
+    Raises:
+        RateLimitError: If the last attempt is still rate limited
+    """
+    for attempt in range(max_attempts):
+        try:
+            return await request()
+        except RateLimitError:
+            if attempt == max_attempts - 1:
+                raise
+            delay = min(max_backoff, 2 ** attempt) * random.uniform(0.5, 1.5)
+            await asyncio.sleep(delay)
+
+
+def create_http_client(max_connections=HTTP_MAX_CONNECTIONS,
+                       max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                       timeout=HTTP_TIMEOUT):
+    """
+    Create the pooled HTTP client shared by all LLM requests of a fusion run
+    
+    Args:
+        max_connections: Maximum number of open connections
+        max_keepalive_connections: Idle connections kept alive for reuse
+        timeout: Request timeout in seconds
+        
+    Returns:
+        httpx.AsyncClient: Pass as AsyncOpenAI(http_client=...); uses HTTP/2 (many
+        requests multiplexed over one connection) when the h2 package is installed
+    """
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(max_connections=max_connections,
+                            max_keepalive_connections=max_keepalive_connections),
+        timeout=timeout
+    )
+
+
+def create_llm_client():
+    """
+    Create the AsyncOpenAI client of a fusion run from the environment
+    
+    All requests share one pooled HTTP client (see create_http_client); httpx's
+    default pool would otherwise cap the effective concurrency well below max_concurrency.
+    
+    Returns:
+        AsyncOpenAI: Client for OPENAI_API_KEY (and OPENAI_API_BASE if set), or None
+        if OPENAI_API_KEY is not set
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return None
+    return AsyncOpenAI(api_key=api_key, base_url=os.getenv("OPENAI_API_BASE") or None,
+                       http_client=create_http_client())
+
+
+def create_embedding_client():
+    """
+    Create the synchronous OpenAI client for entity name embeddings from the environment
+    
+    Returns:
+        OpenAI: Client for OPENAI_API_KEY (and OPENAI_API_BASE if set), or None
+        if OPENAI_API_KEY is not set
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return None
+    return OpenAI(api_key=api_key, base_url=os.getenv("OPENAI_API_BASE") or None)
+
+
+class LLMResponseCache:
+    """
+    Persistent LLM response cache, keyed by sha256(model + messages)
+    
+    Backed by a single SQLite file. Cache errors are reported once and then
+    ignored, so a broken cache never aborts the fusion run.
+    """
+    
+    def __init__(self, path):
+        """
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        self.conn = None
+        try:
+            self.conn = sqlite3.connect(path)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, answer TEXT NOT NULL)")
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self._disable(e)
+    
+    @staticmethod
+    def key(model, messages):
+        """Cache key of one chat completion request"""
+        payload = model + "|" + json.dumps(messages, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, key):
+        """Cached answer, or None"""
+        if self.conn is None:
+            return None
+        try:
+            row = self.conn.execute("SELECT answer FROM responses WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            self._disable(e)
+            return None
+        return row[0] if row else None
+    
+    def set(self, key, answer):
+        """Store an answer"""
+        if self.conn is None:
+            return
+        try:
+            self.conn.execute("INSERT OR REPLACE INTO responses (key, answer) VALUES (?, ?)", (key, answer))
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self._disable(e)
+    
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+    
+    def _disable(self, error):
+        print(f"Warning: LLM response cache disabled ({self.path}): {error}")
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except sqlite3.Error:
+                pass
+        self.conn = None
+
+
+def multi_scale_inputs_fingerprint(data_dir):
+    """
+    Identify the multi-scale hypergraph files a fusion run was computed from
+    
+    Args:
+        data_dir: Data directory path
+        
+    Returns:
+        dict: {file name: [size, mtime_ns]} (None for missing files)
+    """
+    multi_scale_dir = os.path.join(data_dir, "message_pool", "multi_scale_hypergraph")
+    fingerprint = {}
+    for scale in ('L1', 'L2', 'L3'):
+        name = f"{scale}_hypergraph.txt"
+        try:
+            st = os.stat(os.path.join(multi_scale_dir, name))
+            fingerprint[name] = [st.st_size, st.st_mtime_ns]
+        except FileNotFoundError:
+            fingerprint[name] = None
+    return fingerprint
+
+
+def load_fusion_checkpoint(checkpoint_file, fingerprint):
+    """
+    Load the judgments of a previous (possibly interrupted) fusion run
+    
+    Args:
+        checkpoint_file: Checkpoint JSONL path
+        fingerprint: Current multi_scale_inputs_fingerprint
+        
+    Returns:
+        dict: {kg1_id: kg2_id or None}, empty if there is no checkpoint or
+        it was written for different multi-scale hypergraph files
+    """
+    if not os.path.exists(checkpoint_file):
+        return {}
+    
+    completed = {}
+    with open(checkpoint_file, 'r', encoding='utf-8') as f:
+        header = f.readline()
+        try:
+            if json.loads(header).get('inputs') != fingerprint:
+                print(f"Checkpoint {checkpoint_file} is from different multi-scale inputs, starting over")
+                return {}
+        except (ValueError, AttributeError):
+            return {}
         for line in f:
-            line = line.strip()
-            if not line:
+            try:
+                record = json.loads(line)
+                completed[int(record['kg1'])] = None if record['kg2'] is None else int(record['kg2'])
+            except (ValueError, KeyError, TypeError):
+                # Torn last line of an interrupted run
                 continue
-            parts = line.split('\t')
-            if len(parts) >= 2:
-                try:
-                    e1 = int(parts[0])
-                    e2 = int(parts[1])
-                    unique_pairs.add((e1, e2))
-                except ValueError:
-                    continue
+    return completed
+
+
+def open_fusion_checkpoint(checkpoint_file, fingerprint, append=False):
+    """
+    Open the fusion checkpoint for writing
+    
+    Args:
+        checkpoint_file: Checkpoint JSONL path
+        fingerprint: Current multi_scale_inputs_fingerprint (stored in the header line)
+        append: Continue an existing checkpoint instead of starting a new one
+        
+    Returns:
+        CheckpointWriter: Writer appending records to the checkpoint
+    """
+    if append:
+        f = open(checkpoint_file, 'a', encoding='utf-8')
+        # Make sure a torn last line does not swallow the next record
+        if f.tell() > 0:
+            with open(checkpoint_file, 'rb') as rf:
+                rf.seek(-1, os.SEEK_END)
+                if rf.read(1) != b'\n':
+                    f.write("\n")
+        return CheckpointWriter(f)
+    writer = CheckpointWriter(open(checkpoint_file, 'w', encoding='utf-8'))
+    writer.write({'inputs': fingerprint})
+    writer.sync()
+    return writer
+
+
+class CheckpointWriter:
+    """
+    Append-only JSONL writer of the fusion checkpoint
+    
+    Every record is flushed to the OS right away (a killed process loses
+    nothing); os.fsync, which guards against power loss, runs only every
+    CHECKPOINT_FSYNC_RECORDS records or CHECKPOINT_FSYNC_SECONDS seconds and
+    on close.
+    """
+    
+    def __init__(self, f, fsync_records=CHECKPOINT_FSYNC_RECORDS, fsync_seconds=CHECKPOINT_FSYNC_SECONDS):
+        """
+        Args:
+            f: Text file opened for writing
+            fsync_records: Records between two fsyncs
+            fsync_seconds: Maximum seconds between two fsyncs
+        """
+        self.f = f
+        self.fsync_records = fsync_records
+        self.fsync_seconds = fsync_seconds
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+    
+    def write(self, record):
+        """Append one JSON record"""
+        self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.f.flush()
+        self._unsynced += 1
+        if (self._unsynced >= self.fsync_records
+                or time.monotonic() - self._last_sync >= self.fsync_seconds):
+            self.sync()
     
-    # Rewrite deduplicated results
-    with open(file_path, 'w', encoding='utf-8') as f:
-        for e1, e2 in sorted(unique_pairs):
-            f.write(f"{e1}\t{e2}\n")
+    def sync(self):
+        """Force the records written so far to disk"""
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
     
-    print(f"Deduplicated file {file_path}: {len(unique_pairs)} unique pairs")
-    return unique_pairs
+    def close(self):
+        if self.f.closed:
+            return
+        try:
+            if self._unsynced:
+                self.sync()
+        finally:
+            self.f.close()
+
+
+async def submit_batch(client, prompts, batch_file, poll_interval=BATCH_POLL_INTERVAL):
+    """
+    Run chat completions for many prompts through the OpenAI Batch API
+    
+    Args:
+        client: AsyncOpenAI client
+        prompts: {custom_id: chat messages}
+        batch_file: Path of the JSONL request file to write and upload
+        poll_interval: Seconds between batch status checks
+        
+    Returns:
+        dict: {custom_id: answer} for every request that completed successfully
+    """
+    if not prompts:
+        return {}
+    
+    with open(batch_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+        f.writelines(json.dumps({
+            'custom_id': custom_id,
+            'method': 'POST',
+            'url': '/v1/chat/completions',
+            'body': {'model': LLM_MODEL, 'messages': messages}
+        }, ensure_ascii=False) + "\n" for custom_id, messages in prompts.items())
+    
+    with open(batch_file, 'rb') as f:
+        input_file = await client.files.create(file=f, purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    print(f"Submitted batch {batch.id} with {len(prompts)} requests (input: {batch_file})")
+    
+    while batch.status not in ('completed', 'failed', 'expired', 'cancelled'):
+        await asyncio.sleep(poll_interval)
+        batch = await client.batches.retrieve(batch.id)
+        counts = batch.request_counts
+        if counts is not None:
+            print(f"  Batch {batch.id}: {batch.status} ({counts.completed}/{counts.total} completed, {counts.failed} failed)")
+    
+    if batch.status != 'completed':
+        print(f"Warning: Batch {batch.id} ended with status '{batch.status}'")
+    if not batch.output_file_id:
+        return {}
+    
+    # Expired batches may still carry results for the requests that finished
+    answers = {}
+    output = await client.files.content(batch.output_file_id)
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get('response') or {}
+        if response.get('status_code') != 200:
+            continue
+        body = response.get('body') or {}
+        try:
+            answers[record['custom_id']] = body['choices'][0]['message']['content'].strip()
+        except (KeyError, IndexError, TypeError, AttributeError):
+            continue
+        try:
+            tokens_cal.update_add_var(body['usage']['total_tokens'])
+        except:
+            pass
+    
+    print(f"Batch {batch.id}: {len(answers)}/{len(prompts)} answers received")
+    return answers
 
 
 def add_to_sup_pairs(data_dir, aligned_pairs):
@@ -488,62 +1278,49 @@ def add_to_sup_pairs(data_dir, aligned_pairs):
     
     # Load existing sup_pairs
     sup_pairs = set()
-    kg1_ids = set()
-    kg2_ids = set()
-    
     if os.path.exists(sup_pairs_file):
         with open(sup_pairs_file, 'r', encoding='utf-8') as f:
             for line in f:
-                line = line.strip()
-                if not line:
+                kg1_id, sep, rest = line.partition('\t')
+                if not sep:
                     continue
-                parts = line.split('\t')
-                if len(parts) >= 2:
-                    try:
-                        kg1_id = int(parts[0])
-                        kg2_id = int(parts[1])
-                        sup_pairs.add((kg1_id, kg2_id))
-                        kg1_ids.add(kg1_id)
-                        kg2_ids.add(kg2_id)
-                    except ValueError:
-                        continue
-    
-    # Filter eligible entity pairs
-    new_pairs = []
-    for kg1_id, kg2_id in aligned_pairs:
-        # Check if KG1 entity already exists
-        if kg1_id in kg1_ids:
-            continue
-        # Check if KG2 entity already exists
-        if kg2_id in kg2_ids:
-            continue
-        # Check if completely duplicate
-        if (kg1_id, kg2_id) in sup_pairs:
-            continue
-        # Eligible entity pairs
-        new_pairs.append((kg1_id, kg2_id))
+                try:
+                    sup_pairs.add((int(kg1_id), int(rest.partition('\t')[0])))
+                except ValueError:
+                    continue
+    kg1_ids = {kg1_id for kg1_id, _ in sup_pairs}
+    kg2_ids = {kg2_id for _, kg2_id in sup_pairs}
+    
+    # Eligible entity pairs: neither entity is in sup_pairs yet (which also rules out exact duplicates)
+    new_pairs = [(kg1_id, kg2_id) for kg1_id, kg2_id in aligned_pairs
+                 if kg1_id not in kg1_ids and kg2_id not in kg2_ids]
     
     if not new_pairs:
+        # Leave the file (and its mtime) untouched
         print(f"  No new pairs to add to sup_pairs (all pairs already exist)")
         return 0
     
-    # Merge all entity pairs
-    all_pairs = sup_pairs | set(new_pairs)
+    # Merge all entity pairs, sorted by KG1 entity ID, then by KG2 entity ID
+    sorted_pairs = sorted(sup_pairs.union(new_pairs))
     
-    # Sort by KG1 entity ID, then by KG2 entity ID
-    sorted_pairs = sorted(all_pairs, key=lambda x: (x[0], x[1]))
+    # Write the new file next to the old one, then swap it in atomically
+    tmp_file = sup_pairs_file + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+        f.writelines(f"{kg1_id}\t{kg2_id}\n" for kg1_id, kg2_id in sorted_pairs)
     
-    # Backup original file
+    # Backup original file (a hard link to the old contents; copied where links are unsupported)
     backup_file = sup_pairs_file + ".backup"
     if os.path.exists(sup_pairs_file):
-        import shutil
-        shutil.copy2(sup_pairs_file, backup_file)
+        try:
+            if os.path.lexists(backup_file):
+                os.remove(backup_file)
+            os.link(sup_pairs_file, backup_file)
+        except OSError:
+            import shutil
+            shutil.copy2(sup_pairs_file, backup_file)
         print(f"  Backup created: {backup_file}")
     
-    # Write new file
-    with open(sup_pairs_file, 'w', encoding='utf-8') as f:
-        for kg1_id, kg2_id in sorted_pairs:
-            f.write(f"{kg1_id}\t{kg2_id}\n")
+    os.replace(tmp_file, sup_pairs_file)
     
     print(f"  Added {len(new_pairs)} new pairs to sup_pairs")
     print(f"  Updated sup_pairs: {len(sorted_pairs)} total pairs (original: {len(sup_pairs)}, added: {len(new_pairs)})")
@@ -565,6 +1342,9 @@ Example usage:
   
   # 指定输出文件
   python multi_scale_fusion.py --data_dir /path/to/data/icews_wiki --output custom_output.txt
+  
+  # Use the OpenAI Batch API (offline, lower cost)
+  python multi_scale_fusion.py --data_dir /path/to/data/icews_wiki --batch_mode
         """
     )
     
@@ -580,6 +1360,40 @@ Example usage:
         default=None,
         help="Output file path (optional, default: message_pool/multi_scale_fusion_results.txt)"
     )
+    parser.add_argument(
+        "--batch_mode",
+        action="store_true",
+        help="Submit all prompts as one OpenAI Batch API job (lower cost, completes within 24h)"
+    )
+    parser.add_argument(
+        "--no_resume",
+        action="store_true",
+        help="Ignore the fusion checkpoint and judge every entity again"
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Do not reuse cached LLM answers (data_dir/.llm_cache.sqlite3)"
+    )
+    parser.add_argument(
+        "--max_concurrency",
+        type=int,
+        default=200,
+        help="Maximum number of concurrent LLM requests (default: 200)"
+    )
+    parser.add_argument(
+        "--requests_per_minute",
+        type=int,
+        default=LLM_REQUESTS_PER_MINUTE,
+        help=f"Rate limit for LLM requests (0: no limit, default: {LLM_REQUESTS_PER_MINUTE})"
+    )
+    parser.add_argument(
+        "--top_k",
+        type=int,
+        default=0,
+        help="Candidates per entity sent to the LLM after the embedding pre-filter "
+             "(needs cached entity embeddings or OPENAI_API_KEY; default: 0, all candidates)"
+    )
     
     args = parser.parse_args()
     
@@ -589,7 +1403,10 @@ Example usage:
         sys.exit(1)
     
     # Execute multi-scale fusion
-    aligned_pairs = multi_scale_fusion(args.data_dir, args.output)
+    aligned_pairs = multi_scale_fusion(args.data_dir, args.output, max_concurrency=args.max_concurrency,
+                                       batch_mode=args.batch_mode, resume=not args.no_resume,
+                                       use_cache=not args.no_cache, top_k=args.top_k,
+                                       requests_per_minute=args.requests_per_minute)
     
     if aligned_pairs:
         print(f"✓ Multi-scale fusion completed successfully!")
@@ -16,13 +16,625 @@ References:
 """
 
 import os
-from collections import defaultdict
-from typing import Set, Dict, List, Tuple, Optional
+import csv
+from concurrent.futures import ThreadPoolExecutor
+from typing import Set, Dict, List, Tuple
 import logging
 
+import numpy as np
+from scipy import sparse
+
+# Optional JIT for the time bitmap kernels (falls back to NumPy)
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Bits per bitmap word
+_WORD_BITS = 64
+
+# Entity pairs whose bitmap rows are AND-ed at once in decompose()
+DECOMPOSE_CHUNK_SIZE = 65536
+
+# Buffer size for the saved aspect files, so large outputs need only a few write() calls
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def read_int_columns(path: str, usecols: List[int], skiprows: int = 0) -> np.ndarray:
+    """
+    Strictly parse tab-separated integer columns with the pandas C parser
+    
+    Args:
+        path: File path
+        usecols: Column indices to read
+        skiprows: Leading lines to skip (e.g. a header)
+        
+    Returns:
+        int64[n_rows, len(usecols)] array (no rows for an empty file)
+        
+    Raises:
+        ValueError: If pandas is missing or a row cannot be parsed
+    """
+    try:
+        import pandas as pd
+    except ImportError as e:
+        raise ValueError("pandas is not available") from e
+    
+    try:
+        df = pd.read_csv(path, sep='\t', header=None, usecols=usecols, skiprows=skiprows,
+                         engine='c', dtype=np.int64, quoting=csv.QUOTE_NONE)
+    except pd.errors.EmptyDataError:
+        return np.zeros((0, len(usecols)), dtype=np.int64)
+    except pd.errors.ParserError as e:
+        raise ValueError(str(e)) from e
+    return df[usecols].to_numpy()
+
+
+def load_id_names(path: str) -> np.ndarray:
+    """
+    Load an "id<TAB>name" file into a dense name array indexed by ID
+    
+    Args:
+        path: ent_ids / rel_ids file path
+        
+    Returns:
+        Object array of names, None where an ID has no name
+    """
+    ids, names = None, None
+    # Two-column files are parsed in one pass by the pandas C parser
+    try:
+        import pandas as pd
+        df = pd.read_csv(path, sep='\t', header=None, dtype=str, engine='c',
+                         quoting=csv.QUOTE_NONE, na_filter=False)
+        if df.shape[1] == 2:
+            # Same as stripping each line: the name is the last field
+            names = df[1].str.rstrip()
+            keep = (names != '').to_numpy()
+            ids = df[0].str.strip().astype(np.int64).to_numpy()[keep]
+            names = names.to_numpy(dtype=object)[keep]
+    except Exception:
+        # No pandas, or empty, ragged or non-numeric rows: use the line parser
+        ids, names = None, None
+    
+    if ids is None:
+        id_names = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.strip().split('\t')
+                    if len(parts) >= 2:
+                        id_names[int(parts[0])] = parts[1]
+        ids = np.fromiter(id_names.keys(), dtype=np.int64, count=len(id_names))
+        names = np.array(list(id_names.values()), dtype=object)
+    
+    return id_names_to_array(ids, names)
+
+
+def id_names_to_array(ids: np.ndarray, names: np.ndarray) -> np.ndarray:
+    """Dense object array with names[i] at ids[i] (later duplicates win, negative IDs are dropped)"""
+    valid = ids >= 0
+    ids, names = ids[valid], names[valid]
+    dense = np.full(int(ids.max()) + 1 if len(ids) else 0, None, dtype=object)
+    dense[ids] = names
+    return dense
+
+
+def lookup_names(dense_names: np.ndarray, ids: np.ndarray, fallback_prefix: str) -> List[str]:
+    """
+    Names of many IDs from a dense name array
+    
+    Args:
+        dense_names: Array from load_id_names
+        ids: IDs to look up
+        fallback_prefix: Name of an unknown ID is f"{fallback_prefix}{id}"
+        
+    Returns:
+        List of names
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    names = np.full(len(ids), None, dtype=object)
+    known = (ids >= 0) & (ids < len(dense_names))
+    names[known] = dense_names[ids[known]]
+    for i in np.flatnonzero(np.equal(names, None)).tolist():
+        names[i] = f"{fallback_prefix}{ids[i]}"
+    return names.tolist()
+
+
+class EntityTimeBitmap:
+    """
+    Per-entity time coverage stored as one row of uint64 words per entity
+    
+    Bit (t - time_offset) of row e is set if entity e occurs in a triple whose
+    [time_start, time_end] interval contains time t. Rows of two bitmaps built
+    with the same time_offset and width can be AND-ed directly.
+    """
+    
+    def __init__(self, bits: np.ndarray, time_offset: int):
+        """
+        Args:
+            bits: uint64[n_entities, n_words] bitmap
+            time_offset: Time ID of bit 0
+        """
+        self.bits = bits
+        self.time_offset = time_offset
+        self._empty_row = np.zeros(bits.shape[1], dtype=np.uint64)
+        self._time_counts = None
+    
+    def __len__(self) -> int:
+        """Number of entities with at least one time point"""
+        return int(np.count_nonzero(self.time_counts))
+    
+    @property
+    def time_counts(self) -> np.ndarray:
+        """Number of time points per entity (popcount of each row, computed once)"""
+        if self._time_counts is None:
+            self._time_counts = bitmap_popcount(self.bits)
+        return self._time_counts
+    
+    def has_times(self, entity_ids: np.ndarray, min_times: int = 1) -> np.ndarray:
+        """Whether each entity covers at least min_times time points (False for unknown IDs)"""
+        entity_ids = np.asarray(entity_ids, dtype=np.int64)
+        known = (entity_ids >= 0) & (entity_ids < self.bits.shape[0])
+        counts = self.time_counts[np.where(known, entity_ids, 0)] if self.bits.shape[0] else \
+            np.zeros(len(entity_ids), dtype=np.int64)
+        return known & (counts >= min_times)
+    
+    def row(self, entity_id: int) -> np.ndarray:
+        """Bitmap row of an entity (all zeros for entities without time points)"""
+        if 0 <= entity_id < self.bits.shape[0]:
+            return self.bits[entity_id]
+        return self._empty_row
+    
+    def rows(self, entity_ids: np.ndarray) -> np.ndarray:
+        """Bitmap rows of many entities, shape (len(entity_ids), n_words)"""
+        entity_ids = np.asarray(entity_ids, dtype=np.int64)
+        known = (entity_ids >= 0) & (entity_ids < self.bits.shape[0])
+        rows = self.bits[np.where(known, entity_ids, 0)] if self.bits.shape[0] else \
+            np.zeros((len(entity_ids), self.bits.shape[1]), dtype=np.uint64)
+        rows[~known] = 0
+        return rows
+    
+    def times(self, entity_id: int) -> np.ndarray:
+        """Sorted time IDs covered by an entity"""
+        return bitmap_row_times(self.row(entity_id), self.time_offset)
+
+
+def bitmap_popcount(rows: np.ndarray) -> np.ndarray:
+    """
+    Number of set bits of each bitmap row
+    
+    Args:
+        rows: uint64[n_rows, n_words] bitmap rows
+        
+    Returns:
+        int64[n_rows] set-bit counts
+    """
+    if hasattr(np, 'bitwise_count'):  # NumPy >= 2.0
+        return np.bitwise_count(rows).sum(axis=1, dtype=np.int64)
+    return np.unpackbits(np.ascontiguousarray(rows).view(np.uint8), axis=1).sum(axis=1, dtype=np.int64)
+
+
+def bitmap_row_times(row: np.ndarray, time_offset: int) -> np.ndarray:
+    """
+    Sorted time IDs of the set bits of a bitmap row
+    
+    Args:
+        row: uint64[n_words] bitmap row
+        time_offset: Time ID of bit 0
+        
+    Returns:
+        int64 array of time IDs
+    """
+    bits = (row[:, None] >> np.arange(_WORD_BITS, dtype=np.uint64)) & np.uint64(1)
+    return np.flatnonzero(bits.ravel()) + time_offset
+
+
+def bitmap_row_intervals(row: np.ndarray, time_offset: int) -> List[Tuple[int, int]]:
+    """
+    Maximal runs of set bits of a bitmap row, as time intervals
+    
+    Args:
+        row: uint64[n_words] bitmap row
+        time_offset: Time ID of bit 0
+        
+    Returns:
+        List of inclusive (time_start, time_end) tuples in time order
+    """
+    starts, ends = coalesce_runs(bitmap_row_times(row, time_offset))
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def coalesce_runs(sorted_times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Coalesce sorted time IDs into maximal runs of consecutive times
+    
+    Args:
+        sorted_times: Time IDs in ascending order (repeats are allowed)
+        
+    Returns:
+        (starts, ends) int32 arrays of inclusive intervals
+    """
+    sorted_times = np.ascontiguousarray(sorted_times, dtype=np.int32)
+    if NUMBA_AVAILABLE:
+        return _coalesce_runs_kernel(sorted_times)
+    if sorted_times.size == 0:
+        return sorted_times, sorted_times
+    breaks = np.flatnonzero(np.diff(sorted_times) > 1)
+    return (sorted_times[np.concatenate(([0], breaks + 1))],
+            sorted_times[np.concatenate((breaks, [sorted_times.size - 1]))])
+
+
+def bitmap_rows_intervals(rows: np.ndarray, time_offset: int,
+                          chunk_size: int = 4096) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Maximal runs of set bits of many bitmap rows at once
+    
+    Args:
+        rows: uint64[n_rows, n_words] bitmap rows
+        time_offset: Time ID of bit 0
+        chunk_size: Rows unpacked at a time
+        
+    Returns:
+        (indptr, starts, ends): the inclusive intervals of row i are
+        starts[indptr[i]:indptr[i + 1]] / ends[indptr[i]:indptr[i + 1]] (int32), in time order
+    """
+    if NUMBA_AVAILABLE:
+        rows = np.ascontiguousarray(rows)
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        empty = np.zeros(0, dtype=np.int32)
+        _bitmap_runs_kernel(rows, int(time_offset), indptr, empty, empty, False)
+        np.cumsum(indptr, out=indptr)
+        starts = np.empty(indptr[-1], dtype=np.int32)
+        ends = np.empty(indptr[-1], dtype=np.int32)
+        _bitmap_runs_kernel(rows, int(time_offset), indptr, starts, ends, True)
+        return indptr, starts, ends
+    
+    counts, starts, ends = [], [], []
+    for chunk_start in range(0, len(rows), chunk_size):
+        block = rows[chunk_start:chunk_start + chunk_size]
+        bits = ((block[:, :, None] >> np.arange(_WORD_BITS, dtype=np.uint64)) & np.uint64(1)).astype(np.int8)
+        edges = np.diff(bits.reshape(len(block), -1), axis=1, prepend=np.int8(0), append=np.int8(0))
+        # Row-major nonzero keeps each row's runs together and in time order
+        run_rows, run_starts = np.nonzero(edges == 1)
+        counts.append(np.bincount(run_rows, minlength=len(block)))
+        starts.append(run_starts + time_offset)
+        ends.append(np.nonzero(edges == -1)[1] - 1 + time_offset)
+    
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    if counts:
+        np.cumsum(np.concatenate(counts), out=indptr[1:])
+    empty = np.zeros(0, dtype=np.int32)
+    return (indptr, np.concatenate(starts).astype(np.int32) if starts else empty,
+            np.concatenate(ends).astype(np.int32) if ends else empty)
+
+
+class TemporalAspects:
+    """
+    Common time intervals of all temporal aspects (consecutive aspect IDs from first_id)
+    
+    Stored as flat starts/ends arrays: aspect first_id + i maps to original_ids[i]
+    and owns starts[indptr[i]:indptr[i + 1]] / ends[indptr[i]:indptr[i + 1]].
+    """
+    
+    def __init__(self, first_id: int, original_ids: np.ndarray, indptr: np.ndarray,
+                 starts: np.ndarray, ends: np.ndarray):
+        """
+        Args:
+            first_id: Aspect ID of the first aspect
+            original_ids: Original KG2 entity ID per aspect
+            indptr: int64[n_aspects + 1] offsets into starts/ends
+            starts, ends: int32 inclusive interval bounds, in time order per aspect
+        """
+        self.first_id = first_id
+        self.original_ids = original_ids
+        self.indptr = indptr
+        self.starts = starts
+        self.ends = ends
+    
+    def __len__(self) -> int:
+        return len(self.original_ids)
+
+
+class RelationalAspects:
+    """
+    Common relation + tail entity rows of all relational aspects (consecutive aspect IDs from first_id)
+    
+    Stored as one CSR: aspect first_id + i maps to original_ids[i] and owns
+    data[indptr[i]:indptr[i + 1]], sorted by (rel_id, tail_id).
+    """
+    
+    def __init__(self, first_id: int, original_ids: np.ndarray, indptr: np.ndarray, data: np.ndarray):
+        """
+        Args:
+            first_id: Aspect ID of the first aspect
+            original_ids: Original KG2 entity ID per aspect
+            indptr: int64[n_aspects + 1] row offsets into data
+            data: int32[n_rows, 2] (rel_id, tail_id) rows
+        """
+        self.first_id = first_id
+        self.original_ids = original_ids
+        self.indptr = indptr
+        self.data = data
+    
+    def __len__(self) -> int:
+        return len(self.original_ids)
+
+
+def aspect_mapping_array(first_ids: List[int], original_ids: List[np.ndarray]) -> np.ndarray:
+    """
+    Aspect-to-original mapping rows of consecutive aspect ID ranges
+    
+    Args:
+        first_ids: Aspect ID of the first aspect of each range
+        original_ids: Original KG2 entity ID per aspect of each range
+        
+    Returns:
+        int64[n_aspects, 2] (aspect_id, original_kg2_id) rows, range by range
+    """
+    aspect_ids = [np.arange(len(originals)) + first_id for first_id, originals in zip(first_ids, original_ids)]
+    return np.column_stack([np.concatenate(aspect_ids), np.concatenate(original_ids)]).astype(np.int64)
+
+
+class EntityRelations:
+    """
+    Per-entity (rel_id, tail_id) combinations stored as CSR
+    
+    The combinations of entity e (as head) are rows data[indptr[e]:indptr[e + 1]],
+    unique and sorted by (rel_id, tail_id).
+    """
+    
+    def __init__(self, indptr: np.ndarray, data: np.ndarray):
+        """
+        Args:
+            indptr: int64[n_entities + 1] row offsets into data
+            data: int32[n_combinations, 2] (rel_id, tail_id) rows
+        """
+        self.indptr = indptr
+        self.data = data
+    
+    @staticmethod
+    def key_strides(rels: np.ndarray, tails: np.ndarray) -> Tuple[int, int]:
+        """(rel_stride, tail_stride) packing a triple as (head * rel_stride + rel) * tail_stride + tail"""
+        return (int(rels.max()) + 1 if len(rels) else 1), (int(tails.max()) + 1 if len(tails) else 1)
+    
+    @staticmethod
+    def keys_fit(n_entities: int, rel_stride: int, tail_stride: int) -> bool:
+        """Whether packed triple keys fit in int64"""
+        return n_entities * rel_stride * tail_stride < 2 ** 62
+    
+    @classmethod
+    def from_keys(cls, keys: np.ndarray, n_entities: int, rel_stride: int, tail_stride: int) -> 'EntityRelations':
+        """Build from packed (head, rel, tail) int64 keys (see key_strides; duplicates are dropped)"""
+        # Sorted unique keys are exactly the (head, rel, tail) lexicographic order
+        keys = np.sort(keys)
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))] if len(keys) else keys
+        heads, rest = np.divmod(keys, rel_stride * tail_stride)
+        rels, tails = np.divmod(rest, tail_stride)
+        indptr = np.zeros(n_entities + 1, dtype=np.int64)
+        np.cumsum(np.bincount(heads, minlength=n_entities), out=indptr[1:])
+        return cls(indptr, np.stack([rels, tails], axis=1).astype(np.int32))
+    
+    @classmethod
+    def from_triples(cls, heads: np.ndarray, rels: np.ndarray, tails: np.ndarray) -> 'EntityRelations':
+        """Build from parallel head/relation/tail arrays (duplicates are dropped)"""
+        n_entities = int(heads.max()) + 1 if len(heads) else 0
+        rel_stride, tail_stride = cls.key_strides(rels, tails)
+        if cls.keys_fit(n_entities, rel_stride, tail_stride):
+            keys = (heads.astype(np.int64) * rel_stride + rels) * tail_stride + tails
+            return cls.from_keys(keys, n_entities, rel_stride, tail_stride)
+        
+        order = np.lexsort((tails, rels, heads))
+        heads, rels, tails = heads[order], rels[order], tails[order]
+        keep = np.ones(len(heads), dtype=bool)
+        keep[1:] = (heads[1:] != heads[:-1]) | (rels[1:] != rels[:-1]) | (tails[1:] != tails[:-1])
+        heads = heads[keep]
+        n_entities = int(heads.max()) + 1 if len(heads) else 0
+        indptr = np.zeros(n_entities + 1, dtype=np.int64)
+        np.cumsum(np.bincount(heads, minlength=n_entities), out=indptr[1:])
+        data = np.stack([rels[keep], tails[keep]], axis=1).astype(np.int32)
+        return cls(indptr, data)
+    
+    def __len__(self) -> int:
+        """Number of entities with at least one combination"""
+        return int(np.count_nonzero(np.diff(self.indptr)))
+    
+    def get(self, entity_id: int) -> np.ndarray:
+        """(rel_id, tail_id) rows of an entity (empty if it is never a head)"""
+        if not 0 <= entity_id < len(self.indptr) - 1:
+            return self.data[:0]
+        return self.data[self.indptr[entity_id]:self.indptr[entity_id + 1]]
+    
+    def gather(self, entity_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows of many entities at once
+        
+        Args:
+            entity_ids: Entity IDs (unknown IDs have no rows)
+            
+        Returns:
+            (owners, rows): rows[k] belongs to entity_ids[owners[k]]
+        """
+        entity_ids = np.asarray(entity_ids, dtype=np.int64)
+        known = (entity_ids >= 0) & (entity_ids < len(self.indptr) - 1)
+        starts = np.where(known, self.indptr[np.where(known, entity_ids, 0)], 0)
+        counts = np.where(known, self.indptr[np.where(known, entity_ids, 0) + 1] - starts, 0)
+        owners = np.repeat(np.arange(len(entity_ids)), counts)
+        # Position of each row within its entity's slice, added to the slice start
+        offsets = np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return owners, self.data[np.repeat(starts, counts) + offsets]
+
+
+if NUMBA_AVAILABLE:
+    # Not cache=True: this module runs both as a script and as a package module, and
+    # numba's on-disk cache cannot be shared between the two module names
+    @njit(nogil=True)
+    def _set_bit_range(row, lo, hi):
+        """Set bits lo..hi (inclusive) of a bitmap row"""
+        all_ones = np.uint64(0xFFFFFFFFFFFFFFFF)
+        for w in range(lo >> 6, (hi >> 6) + 1):
+            b0 = max(lo, w << 6) - (w << 6)
+            b1 = min(hi, (w << 6) + 63) - (w << 6)
+            mask = (all_ones >> np.uint64(63 - (b1 - b0))) << np.uint64(b0)
+            row[w] |= mask
+    
+    @njit(nogil=True)
+    def _fill_time_bitmap_kernel(bits, heads, tails, time_starts, time_ends, time_offset):
+        """Set the interval bits of every triple in the rows of its head and tail"""
+        for i in range(heads.shape[0]):
+            lo = time_starts[i] - time_offset
+            hi = time_ends[i] - time_offset
+            if hi < lo:
+                continue
+            _set_bit_range(bits[heads[i]], lo, hi)
+            _set_bit_range(bits[tails[i]], lo, hi)
+    
+    @njit(nogil=True)
+    def _build_indexes_kernel(bits, heads, rels, tails, time_starts, time_ends, time_offset,
+                              rel_stride, tail_stride, keys):
+        """One pass over the triples: set time bits of head and tail, pack (head, rel, tail) into keys"""
+        for i in range(heads.shape[0]):
+            lo = time_starts[i] - time_offset
+            hi = time_ends[i] - time_offset
+            if hi >= lo:
+                _set_bit_range(bits[heads[i]], lo, hi)
+                _set_bit_range(bits[tails[i]], lo, hi)
+            keys[i] = (np.int64(heads[i]) * rel_stride + rels[i]) * tail_stride + tails[i]
+    
+    @njit(nogil=True)
+    def _coalesce_runs_kernel(sorted_times):
+        """Maximal runs of consecutive values of a sorted int32 array, as (starts, ends)"""
+        n = sorted_times.size
+        starts = np.empty(n, dtype=np.int32)
+        ends = np.empty(n, dtype=np.int32)
+        if n == 0:
+            return starts, ends
+        k = 0
+        start = sorted_times[0]
+        end = start
+        for i in range(1, n):
+            t = sorted_times[i]
+            if t <= end + 1:
+                end = max(end, t)
+            else:
+                starts[k] = start
+                ends[k] = end
+                k += 1
+                start = t
+                end = t
+        starts[k] = start
+        ends[k] = end
+        k += 1
+        return starts[:k], ends[:k]
+    
+    @njit(nogil=True)
+    def _bitmap_runs_kernel(rows, time_offset, indptr, starts, ends, fill):
+        """
+        Maximal runs of set bits of every bitmap row
+        
+        With fill=False only counts the runs of row r into indptr[r + 1]; with
+        fill=True writes them to starts/ends from offset indptr[r].
+        """
+        all_ones = np.uint64(0xFFFFFFFFFFFFFFFF)
+        one = np.uint64(1)
+        for r in range(rows.shape[0]):
+            k = indptr[r] if fill else 0
+            in_run = False
+            start = 0
+            for w in range(rows.shape[1]):
+                word = rows[r, w]
+                if word == 0 and not in_run:
+                    continue
+                if word == all_ones and in_run:
+                    continue
+                for b in range(64):
+                    bit = (word >> np.uint64(b)) & one
+                    if bit and not in_run:
+                        start = (w << 6) + b
+                        in_run = True
+                    elif not bit and in_run:
+                        if fill:
+                            starts[k] = start + time_offset
+                            ends[k] = (w << 6) + b - 1 + time_offset
+                        k += 1
+                        in_run = False
+            if in_run:
+                if fill:
+                    starts[k] = start + time_offset
+                    ends[k] = (rows.shape[1] << 6) - 1 + time_offset
+                k += 1
+            if not fill:
+                indptr[r + 1] = k
+
+
+def fill_time_bitmap(bits: np.ndarray, heads: np.ndarray, tails: np.ndarray,
+                     time_starts: np.ndarray, time_ends: np.ndarray, time_offset: int):
+    """
+    Mark the time interval of every triple for its head and tail entity
+    
+    Intervals with time_end < time_start cover no time points (as range() would).
+    
+    Args:
+        bits: uint64[n_entities, n_words] bitmap, updated in place
+        heads, tails: int64 entity ID arrays
+        time_starts, time_ends: int64 interval bound arrays
+        time_offset: Time ID of bit 0
+    """
+    if NUMBA_AVAILABLE:
+        _fill_time_bitmap_kernel(bits, heads, tails, time_starts, time_ends, int(time_offset))
+        return
+    
+    lengths = time_ends - time_starts + 1
+    valid = lengths > 0
+    if not valid.any():
+        return
+    lo = time_starts[valid] - time_offset
+    lengths = lengths[valid]
+    
+    # Expand every interval into its time points once; heads and tails share them
+    first = np.cumsum(lengths) - lengths
+    bit = np.repeat(lo - first, lengths) + np.arange(int(lengths.sum()))
+    words = bit >> 6
+    masks = np.left_shift(np.uint64(1), (bit & (_WORD_BITS - 1)).astype(np.uint64))
+    np.bitwise_or.at(bits, (np.repeat(heads[valid], lengths), words), masks)
+    np.bitwise_or.at(bits, (np.repeat(tails[valid], lengths), words), masks)
+
+
+def build_entity_indexes(heads: np.ndarray, rels: np.ndarray, tails: np.ndarray,
+                         time_starts: np.ndarray, time_ends: np.ndarray,
+                         time_offset: int, n_words: int) -> Tuple[EntityTimeBitmap, EntityRelations]:
+    """
+    Build the time bitmap and the relation CSR of one KG
+    
+    With numba both come from a single pass over the triples (bits and per-head
+    row counts), followed by a scatter of the (rel, tail) rows into their slices.
+    
+    Args:
+        heads, rels, tails: int32 triple column arrays
+        time_starts, time_ends: int32 interval bound arrays
+        time_offset: Time ID of bit 0
+        n_words: Bitmap words per entity
+        
+    Returns:
+        (EntityTimeBitmap, EntityRelations)
+    """
+    n_entities = max(int(heads.max()), int(tails.max())) + 1 if len(heads) else 0
+    bits = np.zeros((n_entities, n_words), dtype=np.uint64)
+    rel_stride, tail_stride = EntityRelations.key_strides(rels, tails)
+    
+    if not NUMBA_AVAILABLE or not EntityRelations.keys_fit(n_entities, rel_stride, tail_stride):
+        fill_time_bitmap(bits, heads, tails, time_starts, time_ends, time_offset)
+        return EntityTimeBitmap(bits, time_offset), EntityRelations.from_triples(heads, rels, tails)
+    
+    keys = np.empty(len(heads), dtype=np.int64)
+    _build_indexes_kernel(bits, heads, rels, tails, time_starts, time_ends, int(time_offset),
+                          rel_stride, tail_stride, keys)
+    relations = EntityRelations.from_keys(keys, n_entities, rel_stride, tail_stride)
+    return EntityTimeBitmap(bits, time_offset), relations
+
 
 class HypergraphDecomposition:
     """
@@ -45,21 +657,38 @@ class HypergraphDecomposition:
         self.output_dir = output_dir or os.path.join(data_dir, "message_pool")
         
         # Data structures
-        self.entity_pairs = []  # [(kg1_id, kg2_id), ...] loaded from top-k file
-        self.kg1_triples = []  # [(head, rel, tail, time_start, time_end), ...]
-        self.kg2_triples = []  # [(head, rel, tail, time_start, time_end), ...]
-        self.kg1_entity_times = defaultdict(set)  # {entity_id: {time_id, ...}}
-        self.kg2_entity_times = defaultdict(set)  # {entity_id: {time_id, ...}}
-        self.kg1_entity_relations = defaultdict(set)  # {entity_id: {(rel_id, tail_id), ...}}
-        self.kg2_entity_relations = defaultdict(set)  # {entity_id: {(rel_id, tail_id), ...}}
+        self.entity_pairs = np.zeros((0, 2), dtype=np.int64)  # int64[n_pairs, 2] (kg1_id, kg2_id) from top-k file
+        # Triples as int32 column arrays (head, rel, tail, time_start, time_end)
+        empty = np.zeros(0, dtype=np.int32)
+        self.kg1_h, self.kg1_r, self.kg1_t, self.kg1_ts, self.kg1_te = (empty,) * 5
+        self.kg2_h, self.kg2_r, self.kg2_t, self.kg2_ts, self.kg2_te = (empty,) * 5
+        self.kg1_entity_times = None  # EntityTimeBitmap, one row per KG1 entity
+        self.kg2_entity_times = None  # EntityTimeBitmap, one row per KG2 entity (same time axis)
+        self.kg1_entity_relations = None  # EntityRelations: entity_id -> (rel_id, tail_id) rows
+        self.kg2_entity_relations = None  # EntityRelations: entity_id -> (rel_id, tail_id) rows
         
         # Relation alignment mapping {kg1_rel_id: {kg2_rel_id, ...}} supports one-to-many
-        self.relation_alignment = defaultdict(set)  # {kg1_rel_id: {kg2_rel_id, ...}}
+        # Frozen after loading into sorted int32 arrays of KG2 relation IDs
+        self.relation_alignment = {}  # {kg1_rel_id: np.array([kg2_rel_id, ...])}
+        self.alignment_matrix = None  # bool csr_matrix [n_kg1_rels, n_kg2_rels], A[r1, r2] = r2 aligned to r1
+        # Aligned KG2 relations of the KG1 entities of the pairs, frozen after loading:
+        # row self._aligned_row[kg1_id] of self._aligned_matrix (bool[n_rows, n_kg2_rels]), -1 if absent
+        self._aligned_row = np.zeros(0, dtype=np.int64)
+        self._aligned_matrix = np.zeros((0, 0), dtype=bool)
         
         # Aspect entity mappings
-        self.temporal_aspects = {}  # {aspect_id: (original_kg2_id, [(time_start, time_end), ...])}
-        self.relational_aspects = {}  # {aspect_id: (original_kg2_id, {(rel_id, tail_id), ...})}
-        self.aspect_to_original = {}  # {aspect_id: original_kg2_id} for linking retrieval results
+        # {aspect_id: (original_kg2_id, [(time_start, time_end), ...])}
+        self.temporal_aspects = TemporalAspects(0, np.zeros(0, dtype=np.int64), np.zeros(1, dtype=np.int64),
+                                                np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32))
+        # {aspect_id: (original_kg2_id, (rel_id, tail_id) rows)}
+        self.relational_aspects = RelationalAspects(0, np.zeros(0, dtype=np.int64), np.zeros(1, dtype=np.int64),
+                                                    np.zeros((0, 2), dtype=np.int32))
+        # (aspect_id, original_kg2_id) rows for linking retrieval results (see aspect_mapping_array)
+        self.temporal_aspect_to_original = np.zeros(0, dtype=np.int32)
+        self.relational_aspect_to_original = np.zeros(0, dtype=np.int32)
+        self.aspect_to_original = np.zeros((0, 2), dtype=np.int64)
+        
+        self._names_cache = {}  # {path: dense name array} for create_aspect_entity_names
         
         # Aspect entity counters
         self.temporal_aspect_counter = 1000000  # Start from large number to avoid conflicts with real entity IDs
@@ -75,19 +704,22 @@ class HypergraphDecomposition:
         # 2. Load triples and temporal information
         self._load_triples()
         
-        # 3. Extract entity temporal information
-        self._extract_entity_temporal_info()
+        # 3. Extract entity temporal and relation information
+        self._extract_entity_info()
         
-        # 4. Extract entity relation information
-        self._extract_entity_relation_info()
-        
-        # 5. Load relation alignment information (if exists)
+        # 4. Load relation alignment information (if exists)
         self._load_relation_alignment()
         
+        # 5. Compile relation alignment into a sparse matrix
+        self._build_alignment_matrix()
+        
+        # 6. Freeze per-entity alignment lookups into arrays
+        self._freeze_indexes()
+        
         logger.info("Data loading completed")
         logger.info(f"  Entity pairs: {len(self.entity_pairs)}")
-        logger.info(f"  KG1 triples: {len(self.kg1_triples)}")
-        logger.info(f"  KG2 triples: {len(self.kg2_triples)}")
+        logger.info(f"  KG1 triples: {len(self.kg1_h)}")
+        logger.info(f"  KG2 triples: {len(self.kg2_h)}")
         logger.info(f"  Relation alignments: {len(self.relation_alignment)}")
         
     def _load_entity_pairs(self):
@@ -98,19 +730,25 @@ class HypergraphDecomposition:
             logger.warning(f"Top-k file not found: {topk_file}")
             return
         
-        with open(topk_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                parts = line.split('\t')
-                if len(parts) >= 2:
-                    try:
-                        kg1_id = int(parts[0].strip())
-                        kg2_id = int(parts[1].strip())
-                        self.entity_pairs.append((kg1_id, kg2_id))
-                    except (ValueError, IndexError):
+        try:
+            self.entity_pairs = read_int_columns(topk_file, [0, 1])
+        except ValueError:
+            # Malformed rows: parse line by line and skip what cannot be parsed
+            entity_pairs = []
+            with open(topk_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
                         continue
+                    parts = line.split('\t')
+                    if len(parts) >= 2:
+                        try:
+                            kg1_id = int(parts[0].strip())
+                            kg2_id = int(parts[1].strip())
+                            entity_pairs.append((kg1_id, kg2_id))
+                        except (ValueError, IndexError):
+                            continue
+            self.entity_pairs = np.array(entity_pairs, dtype=np.int64).reshape(-1, 2)
         
         logger.info(f"Loaded {len(self.entity_pairs)} entity pairs from top-k file")
     
@@ -118,61 +756,88 @@ class HypergraphDecomposition:
         """Load triples data"""
         # Load KG1 triples
         triples_1_path = os.path.join(self.data_dir, "triples_1")
-        if os.path.exists(triples_1_path):
-            with open(triples_1_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    parts = line.strip().split('\t')
-                    if len(parts) >= 3:
-                        head = int(parts[0])
-                        rel = int(parts[1])
-                        tail = int(parts[2])
-                        time_start = int(parts[3]) if len(parts) > 3 else 0
-                        time_end = int(parts[4]) if len(parts) > 4 else time_start
-                        self.kg1_triples.append((head, rel, tail, time_start, time_end))
+        self.kg1_h, self.kg1_r, self.kg1_t, self.kg1_ts, self.kg1_te = self._load_triples_fast(triples_1_path)
         
         # Load KG2 triples
         triples_2_path = os.path.join(self.data_dir, "triples_2")
-        if os.path.exists(triples_2_path):
-            with open(triples_2_path, 'r', encoding='utf-8') as f:
+        self.kg2_h, self.kg2_r, self.kg2_t, self.kg2_ts, self.kg2_te = self._load_triples_fast(triples_2_path)
+        
+        logger.info(f"Loaded KG1 triples: {len(self.kg1_h)}")
+        logger.info(f"Loaded KG2 triples: {len(self.kg2_h)}")
+    
+    @staticmethod
+    def _load_triples_fast(path: str) -> Tuple[np.ndarray, ...]:
+        """
+        Load a triples file as column arrays
+        
+        Lines are head, rel, tail and optionally time_start and time_end (tab separated).
+        A missing time_start defaults to 0 and a missing time_end to time_start.
+        
+        Args:
+            path: Triples file path
+            
+        Returns:
+            (heads, rels, tails, time_starts, time_ends) int32 arrays
+        """
+        if not os.path.exists(path):
+            return tuple(np.zeros(0, dtype=np.int32) for _ in range(5))
+        
+        # Well-formed files are parsed in one pass by the pandas C parser
+        try:
+            import pandas as pd
+            # memory_map: the C parser tokenizes the OS-paged file directly instead of a copy of it
+            df = pd.read_csv(path, sep='\t', header=None, engine='c', dtype=np.int32, memory_map=True)
+            # Per-column views of the parsed block, without a transposed copy of the whole table
+            columns = [df[column].to_numpy() for column in df.columns]
+        except Exception:
+            # No pandas, or empty, ragged or non-numeric rows: use the line parser
+            columns = None
+        
+        if columns is None:
+            rows = []
+            with open(path, 'r', encoding='utf-8') as f:
                 for line in f:
                     parts = line.strip().split('\t')
                     if len(parts) >= 3:
-                        head = int(parts[0])
-                        rel = int(parts[1])
-                        tail = int(parts[2])
                         time_start = int(parts[3]) if len(parts) > 3 else 0
                         time_end = int(parts[4]) if len(parts) > 4 else time_start
-                        self.kg2_triples.append((head, rel, tail, time_start, time_end))
-        
-        logger.info(f"Loaded KG1 triples: {len(self.kg1_triples)}")
-        logger.info(f"Loaded KG2 triples: {len(self.kg2_triples)}")
+                        rows.append((int(parts[0]), int(parts[1]), int(parts[2]), time_start, time_end))
+            columns = np.array(rows, dtype=np.int32).reshape(-1, 5).T
+        elif len(columns) < 3:
+            return tuple(np.zeros(0, dtype=np.int32) for _ in range(5))
+        
+        heads, rels, tails = (np.ascontiguousarray(column) for column in columns[:3])
+        time_starts = np.ascontiguousarray(columns[3]) if len(columns) > 3 else np.zeros(len(heads), dtype=np.int32)
+        time_ends = np.ascontiguousarray(columns[4]) if len(columns) > 4 else time_starts.copy()
+        return heads, rels, tails, time_starts, time_ends
     
-    def _extract_entity_temporal_info(self):
-        """Extract entity temporal information"""
-        # KG1 entity times
-        for head, rel, tail, time_start, time_end in self.kg1_triples:
-            for entity_id in [head, tail]:
-                for time_id in range(time_start, time_end + 1):
-                    self.kg1_entity_times[entity_id].add(time_id)
+    def _extract_entity_info(self):
+        """
+        Extract entity temporal information and relation information (relations +
+        tail entities when entity is head) in one pass per KG
         
-        # KG2 entity times
-        for head, rel, tail, time_start, time_end in self.kg2_triples:
-            for entity_id in [head, tail]:
-                for time_id in range(time_start, time_end + 1):
-                    self.kg2_entity_times[entity_id].add(time_id)
+        Both time bitmaps share the same time axis (offset and width), so the times
+        of a KG1 and a KG2 entity intersect with a row AND.
+        """
+        # Common time axis over all non-empty intervals
+        valid1 = self.kg1_te >= self.kg1_ts
+        valid2 = self.kg2_te >= self.kg2_ts
+        starts = np.concatenate([self.kg1_ts[valid1], self.kg2_ts[valid2]])
+        ends = np.concatenate([self.kg1_te[valid1], self.kg2_te[valid2]])
+        time_offset = int(starts.min()) if starts.size else 0
+        n_words = (int(ends.max()) - time_offset) // _WORD_BITS + 1 if ends.size else 1
+        
+        # The two KGs are independent; the Numba kernels release the GIL (nogil) and so do
+        # the NumPy sorts of the relation CSR, so the two builds overlap
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            kg1_future = executor.submit(build_entity_indexes, self.kg1_h, self.kg1_r, self.kg1_t,
+                                         self.kg1_ts, self.kg1_te, time_offset, n_words)
+            kg2_future = executor.submit(build_entity_indexes, self.kg2_h, self.kg2_r, self.kg2_t,
+                                         self.kg2_ts, self.kg2_te, time_offset, n_words)
+            self.kg1_entity_times, self.kg1_entity_relations = kg1_future.result()
+            self.kg2_entity_times, self.kg2_entity_relations = kg2_future.result()
         
         logger.info(f"Extracted temporal info: KG1={len(self.kg1_entity_times)}, KG2={len(self.kg2_entity_times)}")
-    
-    def _extract_entity_relation_info(self):
-        """Extract entity relation information (relations + tail entities when entity is head)"""
-        # KG1 entity relations
-        for head, rel, tail, time_start, time_end in self.kg1_triples:
-            self.kg1_entity_relations[head].add((rel, tail))
-        
-        # KG2 entity relations
-        for head, rel, tail, time_start, time_end in self.kg2_triples:
-            self.kg2_entity_relations[head].add((rel, tail))
-        
         logger.info(f"Extracted relation info: KG1={len(self.kg1_entity_relations)}, KG2={len(self.kg2_entity_relations)}")
     
     def _get_common_time_intervals(self, kg1_id: int, kg2_id: int) -> List[Tuple[int, int]]:
@@ -186,35 +851,11 @@ class HypergraphDecomposition:
         Returns:
             List of (time_start, time_end) tuples representing common intervals
         """
-        times1 = self.kg1_entity_times.get(kg1_id, set())
-        times2 = self.kg2_entity_times.get(kg2_id, set())
-        
-        common_times = times1 & times2
-        
-        if not common_times:
+        # AND of the two bitmap rows; its runs of set bits are the common intervals
+        common = self.kg1_entity_times.row(kg1_id) & self.kg2_entity_times.row(kg2_id)
+        if not common.any():
             return []
-        
-        # Merge common time points into continuous intervals
-        sorted_times = sorted(common_times)
-        intervals = []
-        
-        if not sorted_times:
-            return intervals
-        
-        start = sorted_times[0]
-        end = sorted_times[0]
-        
-        for time_id in sorted_times[1:]:
-            if time_id == end + 1:
-                end = time_id
-            else:
-                intervals.append((start, end))
-                start = time_id
-                end = time_id
-        
-        intervals.append((start, end))
-        
-        return intervals
+        return bitmap_row_intervals(common, self.kg1_entity_times.time_offset)
     
     def _load_relation_alignment(self):
         """Load relation alignment information"""
@@ -224,25 +865,35 @@ class HypergraphDecomposition:
             logger.warning("Will use exact relation ID matching (no alignment)")
             return
         
-        with open(alignment_file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            if len(lines) <= 1:  # Only header or empty file
-                logger.warning("Relation alignment file is empty")
-                return
-            
+        try:
             # Skip header
-            for line in lines[1:]:
-                line = line.strip()
-                if not line:
-                    continue
-                parts = line.split('\t')
-                if len(parts) >= 3:
-                    try:
-                        kg1_rel_id = int(parts[0])
-                        kg2_rel_id = int(parts[2])
-                        self.relation_alignment[kg1_rel_id].add(kg2_rel_id)
-                    except ValueError:
+            rel_pairs = read_int_columns(alignment_file, [0, 2], skiprows=1)
+        except ValueError:
+            # Malformed rows: parse line by line and skip what cannot be parsed
+            rel_pairs = []
+            with open(alignment_file, 'r', encoding='utf-8') as f:
+                next(f, None)  # Skip header
+                for line in f:
+                    line = line.strip()
+                    if not line:
                         continue
+                    parts = line.split('\t')
+                    if len(parts) >= 3:
+                        try:
+                            rel_pairs.append((int(parts[0]), int(parts[2])))
+                        except ValueError:
+                            continue
+            rel_pairs = np.array(rel_pairs, dtype=np.int64).reshape(-1, 2)
+        
+        if len(rel_pairs) == 0:  # Only header or empty file
+            logger.warning("Relation alignment file is empty")
+            return
+        
+        # Freeze into {kg1_rel_id: sorted unique kg2_rel_ids}
+        rel_pairs = np.unique(rel_pairs, axis=0)
+        kg1_rel_ids, first = np.unique(rel_pairs[:, 0], return_index=True)
+        kg2_rel_ids = rel_pairs[:, 1].astype(np.int32)
+        self.relation_alignment = dict(zip(kg1_rel_ids.tolist(), np.split(kg2_rel_ids, first[1:])))
         
         logger.info(f"Loaded {len(self.relation_alignment)} relation alignments")
         # Count one-to-many cases
@@ -250,7 +901,67 @@ class HypergraphDecomposition:
         if one_to_many > 0:
             logger.info(f"  One-to-many alignments: {one_to_many}")
     
-    def _get_common_relations(self, kg1_id: int, kg2_id: int) -> Set[Tuple[int, int]]:
+    def _build_alignment_matrix(self):
+        """Compile relation_alignment into a binary csr_matrix over all KG1 x KG2 relation IDs"""
+        kg2_rel_ids = list(self.relation_alignment.values())
+        pairs = np.column_stack([
+            np.repeat(np.fromiter(self.relation_alignment.keys(), dtype=np.int64, count=len(kg2_rel_ids)),
+                      [len(ids) for ids in kg2_rel_ids]),
+            np.concatenate(kg2_rel_ids) if kg2_rel_ids else np.zeros(0, dtype=np.int64),
+        ]).astype(np.int64)
+        # Cover every relation ID of the triples as well, so any relation indexes the matrix
+        n_kg1_rels = max(int(pairs[:, 0].max()) + 1 if len(pairs) else 0,
+                         int(self.kg1_entity_relations.data[:, 0].max()) + 1 if len(self.kg1_entity_relations.data) else 0)
+        n_kg2_rels = max(int(pairs[:, 1].max()) + 1 if len(pairs) else 0,
+                         int(self.kg2_entity_relations.data[:, 0].max()) + 1 if len(self.kg2_entity_relations.data) else 0)
+        self.alignment_matrix = sparse.csr_matrix((np.ones(len(pairs), dtype=bool), (pairs[:, 0], pairs[:, 1])),
+                                                  shape=(n_kg1_rels, n_kg2_rels))
+    
+    def _aligned_kg2_relations(self, kg1_id: int) -> np.ndarray:
+        """
+        KG2 relations aligned to any relation of a KG1 entity
+        
+        Args:
+            kg1_id: KG1 entity ID
+            
+        Returns:
+            bool[n_kg2_rels] mask indexed by KG2 relation ID
+        """
+        if 0 <= kg1_id < len(self._aligned_row) and self._aligned_row[kg1_id] >= 0:
+            return self._aligned_matrix[self._aligned_row[kg1_id]]
+        # Not among the frozen entities: compute without storing
+        return self._aligned_kg2_relation_matrix(np.array([kg1_id], dtype=np.int64))[0]
+    
+    def _aligned_kg2_relation_matrix(self, kg1_ids: np.ndarray) -> np.ndarray:
+        """
+        Aligned KG2 relations of many KG1 entities in one sparse product
+        
+        Args:
+            kg1_ids: KG1 entity IDs
+            
+        Returns:
+            bool[len(kg1_ids), n_kg2_rels] aligned KG2 relations of each entity
+        """
+        owners, rows = self.kg1_entity_relations.gather(kg1_ids)
+        # Entity x KG1 relation indicator times alignment matrix counts aligned KG2 relations
+        # (OR-reduces the alignment rows of all KG1 relations, supports one-to-many)
+        indicator = sparse.csr_matrix((np.ones(len(owners), dtype=np.int32), (owners, rows[:, 0])),
+                                      shape=(len(kg1_ids), self.alignment_matrix.shape[0]))
+        return (indicator @ self.alignment_matrix.astype(np.int32)).toarray() > 0
+    
+    def _freeze_indexes(self):
+        """Freeze the aligned KG2 relations of every KG1 entity of the pairs into one dense matrix"""
+        kg1_ids = np.unique(self.entity_pairs[:, 0])
+        kg1_ids = kg1_ids[kg1_ids >= 0]
+        self._aligned_row = np.full(int(kg1_ids.max()) + 1 if len(kg1_ids) else 0, -1, dtype=np.int64)
+        if not self.relation_alignment:
+            # Nothing is aligned: every lookup is the (computed) all-False mask
+            self._aligned_matrix = np.zeros((0, self.alignment_matrix.shape[1]), dtype=bool)
+            return
+        self._aligned_row[kg1_ids] = np.arange(len(kg1_ids))
+        self._aligned_matrix = self._aligned_kg2_relation_matrix(kg1_ids)
+    
+    def _get_common_relations(self, kg1_id: int, kg2_id: int) -> np.ndarray:
         """
         Get common relations + tail entities for entity pair (using relation alignment information)
         
@@ -265,35 +976,19 @@ class HypergraphDecomposition:
             kg2_id: KG2 entity ID
             
         Returns:
-            Set of (kg2_rel_id, kg2_tail_id) tuples (using KG2 relation IDs and tail entity IDs)
+            (kg2_rel_id, kg2_tail_id) rows sorted by relation and tail (using KG2 relation IDs
+            and tail entity IDs)
         """
-        kg1_rels = self.kg1_entity_relations.get(kg1_id, set())  # {(kg1_rel_id, tail_id), ...}
-        kg2_rels = self.kg2_entity_relations.get(kg2_id, set())  # {(kg2_rel_id, tail_id), ...}
-        
-        common_rels = set()
-        
-        if not self.relation_alignment:
-            # If no relation alignment information, return empty set
-            return common_rels
-        
-        # Use relation alignment information
-        # Collect KG2 relation sets corresponding to all relations of KG1 entity
-        kg1_rel_ids = {rel_id for rel_id, _ in kg1_rels}
-        kg2_aligned_rel_ids = set()
+        kg2_rels = self.kg2_entity_relations.get(kg2_id)  # [(kg2_rel_id, tail_id), ...]
         
-        for kg1_rel_id in kg1_rel_ids:
-            # Get KG2 relation set corresponding to KG1 relation (supports one-to-many)
-            aligned_kg2_rels = self.relation_alignment.get(kg1_rel_id, set())
-            kg2_aligned_rel_ids.update(aligned_kg2_rels)
+        # Use relation alignment information (without any, the aligned mask is all False)
+        # KG2 relations corresponding to all relations of KG1 entity
+        aligned = self._aligned_kg2_relations(kg1_id)
         
-        # Check if KG2 entity has these aligned relations, if yes, collect all relation + tail entity combinations
-        for kg2_rel_id, kg2_tail_id in kg2_rels:
-            if kg2_rel_id in kg2_aligned_rel_ids:
-                common_rels.add((kg2_rel_id, kg2_tail_id))
-        
-        return common_rels
+        # Keep the relation + tail entity combinations of the KG2 entity whose relation is aligned
+        return kg2_rels[aligned[kg2_rels[:, 0]]]
     
-    def decompose(self) -> Dict[str, List[Tuple[int, int]]]:
+    def decompose(self, min_common_times: int = 1) -> Dict[str, List[Tuple[int, int]]]:
         """
         Execute hypergraph decomposition
         
@@ -301,39 +996,94 @@ class HypergraphDecomposition:
         - A temporal aspect: containing all common time intervals
         - A relational aspect: containing all common relation + tail entity combinations
         
+        Args:
+            min_common_times: Minimum number of common time points for a temporal aspect
+                (default 1: any overlap)
+            
         Returns:
             Dict containing:
             - 'temporal_aspects': [(kg1_id, temporal_aspect_id), ...]
             - 'relational_aspects': [(kg1_id, relational_aspect_id), ...]
-            - 'aspect_mapping': {aspect_id: original_kg2_id}
+            - 'aspect_mapping': int64[n_aspects, 2] (aspect_id, original_kg2_id) rows,
+              temporal aspects first
         """
         logger.info("Starting hypergraph decomposition...")
         
-        temporal_aspects = []
-        relational_aspects = []
-        
-        for kg1_id, kg2_id in self.entity_pairs:
-            # 1. Temporal projection: Generate a temporal aspect containing all common time intervals
-            common_intervals = self._get_common_time_intervals(kg1_id, kg2_id)
-            if common_intervals:
-                aspect_id = self.temporal_aspect_counter
-                self.temporal_aspect_counter += 1
-                
-                # Store all common time intervals
-                self.temporal_aspects[aspect_id] = (kg2_id, common_intervals)
-                self.aspect_to_original[aspect_id] = kg2_id
-                temporal_aspects.append((kg1_id, aspect_id))
-            
-            # 2. Relational projection: Generate a relational aspect containing all common relation + tail entity combinations
-            common_rels = self._get_common_relations(kg1_id, kg2_id)
-            if common_rels:
-                aspect_id = self.relational_aspect_counter
-                self.relational_aspect_counter += 1
-                
-                # Store all common relation + tail entity combinations
-                self.relational_aspects[aspect_id] = (kg2_id, common_rels)
-                self.aspect_to_original[aspect_id] = kg2_id
-                relational_aspects.append((kg1_id, aspect_id))
+        pairs = np.asarray(self.entity_pairs, dtype=np.int64).reshape(-1, 2)
+        
+        # 1. Temporal projection: a temporal aspect per pair with common times, containing
+        # all common time intervals. Common times are one 2D AND of stacked bitmap rows
+        # (in chunks, to bound memory), whose runs of set bits are the intervals
+        time_offset = self.kg1_entity_times.time_offset
+        temporal_mask = np.zeros(len(pairs), dtype=bool)
+        interval_counts, interval_starts, interval_ends = [], [], []
+        for chunk_start in range(0, len(pairs), DECOMPOSE_CHUNK_SIZE):
+            chunk = pairs[chunk_start:chunk_start + DECOMPOSE_CHUNK_SIZE]
+            # Only pairs where both entities have enough time points can overlap enough
+            candidates = np.flatnonzero(self.kg1_entity_times.has_times(chunk[:, 0], min_common_times) &
+                                        self.kg2_entity_times.has_times(chunk[:, 1], min_common_times))
+            common_rows = (self.kg1_entity_times.rows(chunk[candidates, 0]) &
+                           self.kg2_entity_times.rows(chunk[candidates, 1]))
+            if min_common_times > 1:
+                nonempty = bitmap_popcount(common_rows) >= min_common_times
+            else:
+                nonempty = common_rows.any(axis=1)
+            temporal_mask[chunk_start + candidates[nonempty]] = True
+            # Runs are only extracted for pairs that have common times
+            indptr, starts, ends = bitmap_rows_intervals(common_rows[nonempty], time_offset)
+            interval_counts.append(np.diff(indptr))
+            interval_starts.append(starts)
+            interval_ends.append(ends)
+        
+        temporal_base = self.temporal_aspect_counter
+        self.temporal_aspect_to_original = pairs[temporal_mask, 1].astype(np.int32)
+        aspect_ids = np.arange(len(self.temporal_aspect_to_original)) + temporal_base
+        interval_indptr = np.zeros(len(aspect_ids) + 1, dtype=np.int64)
+        if interval_counts:
+            np.cumsum(np.concatenate(interval_counts), out=interval_indptr[1:])
+        empty = np.zeros(0, dtype=np.int32)
+        self.temporal_aspects = TemporalAspects(
+            temporal_base, self.temporal_aspect_to_original, interval_indptr,
+            np.concatenate(interval_starts) if interval_starts else empty,
+            np.concatenate(interval_ends) if interval_ends else empty)
+        self.temporal_aspect_counter += len(aspect_ids)
+        temporal_aspects = list(zip(pairs[temporal_mask, 0].tolist(), aspect_ids.tolist()))
+        
+        # 2. Relational projection: Generate a relational aspect containing all common relation + tail entity combinations
+        relational_base = self.relational_aspect_counter
+        # Per pair: the KG2 entity's (rel, tail) rows whose relation is aligned to any
+        # relation of the KG1 entity, kept in preallocated per-pair counts plus row chunks
+        common_counts = np.zeros(len(pairs), dtype=np.int64)
+        common_chunks = []
+        # Without relation alignment information there are no relational aspects
+        if self.relation_alignment:
+            kg1_ids = pairs[:, 0]
+            if not np.array_equal(np.unique(kg1_ids), np.flatnonzero(self._aligned_row >= 0)):
+                # Pairs changed since loading
+                self._freeze_indexes()
+            kg1_rows = self._aligned_row[kg1_ids]
+            for chunk_start in range(0, len(pairs), DECOMPOSE_CHUNK_SIZE):
+                chunk = pairs[chunk_start:chunk_start + DECOMPOSE_CHUNK_SIZE]
+                owners, rows = self.kg2_entity_relations.gather(chunk[:, 1])
+                keep = self._aligned_matrix[kg1_rows[chunk_start + owners], rows[:, 0]]
+                common_counts[chunk_start:chunk_start + len(chunk)] = np.bincount(owners[keep], minlength=len(chunk))
+                common_chunks.append(rows[keep])
+        relational_mask = common_counts > 0
+        
+        # Store all common relation + tail entity combinations
+        common_indptr = np.zeros(np.count_nonzero(relational_mask) + 1, dtype=np.int64)
+        np.cumsum(common_counts[relational_mask], out=common_indptr[1:])
+        common_data = np.concatenate(common_chunks) if common_chunks else np.zeros((0, 2), dtype=np.int32)
+        self.relational_aspect_to_original = pairs[relational_mask, 1].astype(np.int32)
+        self.relational_aspects = RelationalAspects(relational_base, self.relational_aspect_to_original,
+                                                    common_indptr, common_data)
+        aspect_ids = np.arange(len(self.relational_aspect_to_original)) + relational_base
+        self.relational_aspect_counter += len(aspect_ids)
+        relational_aspects = list(zip(pairs[relational_mask, 0].tolist(), aspect_ids.tolist()))
+        
+        self.aspect_to_original = aspect_mapping_array([temporal_base, relational_base],
+                                                       [self.temporal_aspect_to_original,
+                                                        self.relational_aspect_to_original])
         
         logger.info(f"Generated temporal aspects: {len(temporal_aspects)}")
         logger.info(f"Generated relational aspects: {len(relational_aspects)}")
@@ -355,41 +1105,41 @@ class HypergraphDecomposition:
         
         # 1. Save temporal aspect entity pairs
         temporal_file = os.path.join(self.output_dir, "temporal_aspect_pairs.txt")
-        with open(temporal_file, 'w', encoding='utf-8') as f:
-            for kg1_id, aspect_id in decomposition_results['temporal_aspects']:
-                f.write(f"{kg1_id}\t{aspect_id}\n")
+        with open(temporal_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            f.writelines(f"{kg1_id}\t{aspect_id}\n" for kg1_id, aspect_id in decomposition_results['temporal_aspects'])
         logger.info(f"Saved temporal aspect pairs: {temporal_file}")
         
         # 2. Save relational aspect entity pairs
         relational_file = os.path.join(self.output_dir, "relational_aspect_pairs.txt")
-        with open(relational_file, 'w', encoding='utf-8') as f:
-            for kg1_id, aspect_id in decomposition_results['relational_aspects']:
-                f.write(f"{kg1_id}\t{aspect_id}\n")
+        with open(relational_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            f.writelines(f"{kg1_id}\t{aspect_id}\n" for kg1_id, aspect_id in decomposition_results['relational_aspects'])
         logger.info(f"Saved relational aspect pairs: {relational_file}")
         
         # 3. Save aspect mapping (for linking retrieval results)
         mapping_file = os.path.join(self.output_dir, "aspect_to_original_mapping.txt")
-        with open(mapping_file, 'w', encoding='utf-8') as f:
-            for aspect_id, original_id in decomposition_results['aspect_mapping'].items():
-                f.write(f"{aspect_id}\t{original_id}\n")
+        np.savetxt(mapping_file, decomposition_results['aspect_mapping'], fmt='%d', delimiter='\t')
         logger.info(f"Saved aspect mapping: {mapping_file}")
         
         # 4. Save temporal aspect detailed information (containing all common time intervals)
         temporal_info_file = os.path.join(self.output_dir, "temporal_aspect_info.txt")
-        with open(temporal_info_file, 'w', encoding='utf-8') as f:
-            for aspect_id, (original_id, intervals) in self.temporal_aspects.items():
-                # Serialize time interval list to string
-                intervals_str = ";".join([f"{start}-{end}" for start, end in intervals])
-                f.write(f"{aspect_id}\t{original_id}\t{intervals_str}\n")
+        temporal = self.temporal_aspects
+        spans = [f"{start}-{end}" for start, end in zip(temporal.starts.tolist(), temporal.ends.tolist())]
+        bounds = temporal.indptr.tolist()
+        with open(temporal_info_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            # Serialize time interval list to string
+            f.writelines(f"{temporal.first_id + i}\t{original_id}\t{';'.join(spans[bounds[i]:bounds[i + 1]])}\n"
+                         for i, original_id in enumerate(temporal.original_ids.tolist()))
         logger.info(f"Saved temporal aspect info: {temporal_info_file}")
         
         # 5. Save relational aspect detailed information (containing all common relation + tail entity combinations)
         relational_info_file = os.path.join(self.output_dir, "relational_aspect_info.txt")
-        with open(relational_info_file, 'w', encoding='utf-8') as f:
-            for aspect_id, (original_id, common_rels) in self.relational_aspects.items():
-                # Serialize relation combination list to string
-                rels_str = ";".join([f"{rel_id},{tail_id}" for rel_id, tail_id in common_rels])
-                f.write(f"{aspect_id}\t{original_id}\t{rels_str}\n")
+        relational = self.relational_aspects
+        combos = [f"{rel_id},{tail_id}" for rel_id, tail_id in relational.data.tolist()]
+        bounds = relational.indptr.tolist()
+        with open(relational_info_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            # Serialize relation combination list to string
+            f.writelines(f"{relational.first_id + i}\t{original_id}\t{';'.join(combos[bounds[i]:bounds[i + 1]])}\n"
+                         for i, original_id in enumerate(relational.original_ids.tolist()))
         logger.info(f"Saved relational aspect info: {relational_info_file}")
     
     def create_aspect_entities_for_retrieval(self, decomposition_results: Dict) -> Set[int]:
@@ -414,6 +1164,12 @@ class HypergraphDecomposition:
         logger.info(f"Total aspect entities for retrieval: {len(all_aspect_ids)}")
         return all_aspect_ids
     
+    def _load_names(self, path: str) -> np.ndarray:
+        """Dense name array of an id/name file (see load_id_names), loaded once per path"""
+        if path not in self._names_cache:
+            self._names_cache[path] = load_id_names(path) if os.path.exists(path) else np.zeros(0, dtype=object)
+        return self._names_cache[path]
+    
     def create_aspect_entity_names(self, aspect_ids: Set[int], ent_ids_2_path: str, 
                                    rel_ids_2_path: str = None, ent_ids_2_dict: Dict[int, str] = None) -> Dict[int, str]:
         """
@@ -428,61 +1184,49 @@ class HypergraphDecomposition:
         Returns:
             Dict: {aspect_id: aspect_entity_name}
         """
-        # Load original entity names
+        # Load original entity names (dense arrays indexed by ID, parsed once per file)
         if ent_ids_2_dict is None:
-            original_entity_names = {}
-            if os.path.exists(ent_ids_2_path):
-                with open(ent_ids_2_path, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        parts = line.strip().split('\t')
-                        if len(parts) >= 2:
-                            entity_id = int(parts[0])
-                            entity_name = parts[1]
-                            original_entity_names[entity_id] = entity_name
+            original_entity_names = self._load_names(ent_ids_2_path)
         else:
-            original_entity_names = ent_ids_2_dict
+            original_entity_names = id_names_to_array(
+                np.fromiter(ent_ids_2_dict.keys(), dtype=np.int64, count=len(ent_ids_2_dict)),
+                np.array(list(ent_ids_2_dict.values()), dtype=object))
         
         # Load relation names (optional)
-        relation_names = {}
-        if rel_ids_2_path and os.path.exists(rel_ids_2_path):
-            with open(rel_ids_2_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    parts = line.strip().split('\t')
-                    if len(parts) >= 2:
-                        rel_id = int(parts[0])
-                        rel_name = parts[1]
-                        relation_names[rel_id] = rel_name
+        relation_names = self._load_names(rel_ids_2_path) if rel_ids_2_path else np.zeros(0, dtype=object)
         
         aspect_names = {}
+        wanted = np.fromiter(aspect_ids, dtype=np.int64, count=len(aspect_ids))
         
         # Temporal aspect names: original name + all common time intervals
-        for aspect_id, (original_id, intervals) in self.temporal_aspects.items():
-            if aspect_id in aspect_ids:
-                original_name = original_entity_names.get(original_id, f"Entity_{original_id}")
-                # Format time interval list
-                time_strs = []
-                for time_start, time_end in intervals:
-                    if time_start == time_end:
-                        time_strs.append(str(time_start))
-                    else:
-                        time_strs.append(f"{time_start}-{time_end}")
-                time_str = ",".join(time_strs)
-                aspect_name = f"{original_name}_[T:{time_str}]"
-                aspect_names[aspect_id] = aspect_name
+        temporal = self.temporal_aspects
+        selected = np.flatnonzero(np.isin(np.arange(len(temporal)) + temporal.first_id, wanted))
+        if len(selected):
+            original_names = lookup_names(original_entity_names, temporal.original_ids[selected], "Entity_")
+            # Format time interval list
+            time_strs = [str(time_start) if time_start == time_end else f"{time_start}-{time_end}"
+                         for time_start, time_end in zip(temporal.starts.tolist(), temporal.ends.tolist())]
+            bounds = temporal.indptr.tolist()
+            for i, original_name in zip(selected.tolist(), original_names):
+                time_str = ",".join(time_strs[bounds[i]:bounds[i + 1]])
+                aspect_names[temporal.first_id + i] = f"{original_name}_[T:{time_str}]"
         
         # Relational aspect names: original name + all common relation + tail entity combinations
-        for aspect_id, (original_id, common_rels) in self.relational_aspects.items():
-            if aspect_id in aspect_ids:
-                original_name = original_entity_names.get(original_id, f"Entity_{original_id}")
-                # Format relation combination list
-                rel_strs = []
-                for rel_id, tail_id in sorted(common_rels):  # Sort for consistency
-                    rel_name = relation_names.get(rel_id, f"R{rel_id}")
-                    tail_name = original_entity_names.get(tail_id, f"E{tail_id}")
-                    rel_strs.append(f"{rel_name}→{tail_name}")
-                rel_str = ",".join(rel_strs)
-                aspect_name = f"{original_name}_[R:{rel_str}]"
-                aspect_names[aspect_id] = aspect_name
+        relational = self.relational_aspects
+        selected = np.flatnonzero(np.isin(np.arange(len(relational)) + relational.first_id, wanted))
+        if len(selected):
+            original_names = lookup_names(original_entity_names, relational.original_ids[selected], "Entity_")
+            # Sort for consistency: one lexsort by (aspect, rel_id, tail_id) over all rows
+            bounds = relational.indptr.tolist()
+            owners = np.repeat(np.arange(len(relational)), np.diff(relational.indptr))
+            rels = relational.data[np.lexsort((relational.data[:, 1], relational.data[:, 0], owners))]
+            # Format relation combination list
+            rel_strs = [f"{rel_name}→{tail_name}" for rel_name, tail_name in
+                        zip(lookup_names(relation_names, rels[:, 0], "R"),
+                            lookup_names(original_entity_names, rels[:, 1], "E"))]
+            for i, original_name in zip(selected.tolist(), original_names):
+                rel_str = ",".join(rel_strs[bounds[i]:bounds[i + 1]])
+                aspect_names[relational.first_id + i] = f"{original_name}_[R:{rel_str}]"
         
         logger.info(f"Created names for {len(aspect_names)} aspect entities")
         return aspect_names
@@ -1,13 +1,98 @@
 import os
+import re
+import asyncio
+import random
+import hashlib
+import pickle
+import shutil
+import sqlite3
+from openai import AsyncOpenAI, RateLimitError
 from langchain_openai import OpenAIEmbeddings
-from langchain_text_splitters import CharacterTextSplitter
-from langchain_community.document_loaders import TextLoader
 from langchain_community.vectorstores import FAISS
 import time
 from tqdm import tqdm
 import multiprocessing as mp
-from functools import partial
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import faiss
+
+# Optional local embedding model (requires langchain-huggingface and sentence-transformers[onnx])
+try:
+    from langchain_huggingface import HuggingFaceEmbeddings
+    LOCAL_EMBEDDINGS_AVAILABLE = True
+except ImportError:
+    LOCAL_EMBEDDINGS_AVAILABLE = False
+
+# INT8 dynamically quantized ONNX graph (VNNI int8 dot products) shipped with the
+# sentence-transformers model repositories
+LOCAL_EMBEDDING_ONNX_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+# Vector encoding of newly built FAISS indexes: "Flat" keeps exact FP32 vectors,
+# "SQ8" stores int8 scalar-quantized vectors (4x smaller, faster scans) and
+# "IVF-PQ" adds an inverted file with product quantization for large corpora
+FAISS_INDEX_TYPE = "SQ8"
+
+# IVF-PQ needs enough vectors to train its coarse and PQ codebooks; smaller
+# corpora fall back to SQ8
+IVF_PQ_MIN_VECTORS = 10000
+IVF_PQ_MAX_LISTS = 4096
+IVF_PQ_NPROBE = 32
+
+# Buffer size for the retriever output file
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Read size used to pull a memory-mapped FAISS index into the page cache at startup
+INDEX_PRELOAD_CHUNK_SIZE = 1 << 20
+
+# Upper bound on batches per worker task, so the searches start before the workers finish
+POOL_MAX_CHUNKSIZE = 16
+
+# File in a FAISS index directory holding the digest of the retriever document it was built from
+INDEX_DOCUMENT_DIGEST_FILE = "document.blake2b"
+
+# Concurrent OpenAI embedding requests of a retrieval run
+EMBEDDING_MAX_CONCURRENCY = 64
+
+# Texts per embedding request when building the FAISS index (API maximum: 2048)
+EMBEDDING_DOCUMENT_BATCH_SIZE = 2048
+
+# Attempts per embedding request when the API answers 429, with exponential backoff (capped)
+EMBEDDING_MAX_ATTEMPTS = 6
+EMBEDDING_MAX_BACKOFF = 30
+
+# Separators ending the core info of an entity text (ASCII and full-width semicolon)
+CORE_INFO_SEPARATOR = re.compile('[;；]')
+
+
+def load_core_info(txt_link_file):
+    """
+    Extract the core info of every entity, i.e. its text before the first ';' or '；'
+    Args:
+        txt_link_file: Path to a txt_link_trans file (entity_id and text_info per line)
+    Returns:
+        core_info_map: Dictionary {entity_id: core_info} of the non-empty core infos
+    """
+    split_core_info = CORE_INFO_SEPARATOR.split
+    core_info_map = {}
+    with open(txt_link_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+
+            entity_id, sep, text_info = line.partition('\t')
+            if not sep:
+                continue
+
+            # One scan splits at whichever semicolon comes first
+            core_info = split_core_info(text_info.partition('\t')[0], 1)[0].strip()
+            if core_info:
+                core_info_map[entity_id] = core_info
+    return core_info_map
+
 
 def preprocess_entity_ids(data_dir, dataset_name):
 
@@ -42,76 +127,36 @@ def preprocess_entity_ids(data_dir, dataset_name):
             continue
 
 
-        core_info_map = {}  # {entity_id: core_info}
-
-        with open(txt_link_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-
-                parts = line.split('\t')
-                if len(parts) < 2:
-                    continue
-
-                entity_id = parts[0]
-                text_info = parts[1] if len(parts) > 1 else ""
-
-
-                if text_info:
-                    pos_en = text_info.find(';')
-                    pos_cn = text_info.find('；')
-
-
-                    if pos_en != -1 and pos_cn != -1:
-                        split_pos = min(pos_en, pos_cn)
-                    elif pos_en != -1:
-                        split_pos = pos_en
-                    elif pos_cn != -1:
-                        split_pos = pos_cn
-                    else:
-                        split_pos = -1
-
-                    if split_pos != -1:
-                        core_info = text_info[:split_pos].strip()
-                    else:
-                        core_info = text_info.strip()
-
-                    if core_info:
-                        core_info_map[entity_id] = core_info
+        core_info_map = load_core_info(txt_link_file)  # {entity_id: core_info}
 
         print(f"  Extracted {len(core_info_map)} non-empty core info entries from txt_link_trans_{source_num}")
 
-        updated_lines = []
+        # Stream the updated lines into a temporary file, then swap it in
         update_count = 0
+        tmp_file = ent_ids_file + '.tmp'
 
-        with open(ent_ids_file, 'r', encoding='utf-8') as f:
-            for line in f:
+        with open(ent_ids_file, 'r', encoding='utf-8') as fin, \
+                open(tmp_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as fout:
+            for line in fin:
                 line = line.strip()
                 if not line:
-                    updated_lines.append(line)
+                    fout.write('\n')
                     continue
 
-                parts = line.split('\t')
-                if len(parts) < 2:
-                    updated_lines.append(line)
+                entity_id, sep, _ = line.partition('\t')
+                if not sep:
+                    fout.write(line + '\n')
                     continue
 
-                entity_id = parts[0]
-
 
                 if entity_id in core_info_map:
-                    updated_line = f"{entity_id}\t{core_info_map[entity_id]}"
-                    updated_lines.append(updated_line)
+                    fout.write(f"{entity_id}\t{core_info_map[entity_id]}\n")
                     update_count += 1
                 else:
 
-                    updated_lines.append(line)
+                    fout.write(line + '\n')
 
-
-        with open(ent_ids_file, 'w', encoding='utf-8') as f:
-            for line in updated_lines:
-                f.write(line + '\n')
+        os.replace(tmp_file, ent_ids_file)
 
         print(f"  Updated {update_count} entries in ent_ids_{source_num}")
         print(f"  ✓ Saved updated file to {ent_ids_file}\n")
@@ -131,8 +176,8 @@ def load_ents(path):
     data = {}
     with open(path, 'r') as f:
         for line in f:
-            line = line.strip().split('\t')
-            data[line[0]] = line[1]
+            ent_id, _, ent_name = line.strip().partition('\t')
+            data[ent_id] = ent_name
     print(f'load {path} {len(data)}')
     return data
 
@@ -147,18 +192,134 @@ def retrieve_top_k_entities(query, retriever, k=10):
     Returns:
         top_k_answers: TOP-K most relevant entities
     """
-    answers = retriever.invoke(query)
-    # print("answers:",answers)
-    answers_all = {}
-    for doc in answers:
-        doc1 = doc.page_content.strip().split('\t')
-        answers_all[doc1[0]] = doc1[1].replace(' ', '')
+    return retrieve_top_k_entities_batch([query], retriever, k=k)[0]
 
-    top_k_answers = sorted(answers_all.items(), key=lambda item: item[1], reverse=True)[:k]
-    return top_k_answers
+
+def retrieve_top_k_entities_batch(queries, retriever, k=10):
+    """
+    Use FAISS to retrieve TOP-K entities for a batch of queries
+    All queries are embedded with one embedding request and searched against the
+    FAISS index as one query matrix
+    Args:
+        queries: List of query entity names
+        retriever: Retriever instance wrapping the FAISS vector store
+        k: Number of candidate entities to return per query
+    Returns:
+        batch_answers: List of TOP-K most relevant entities, one list per query
+    """
+    embeddings = retriever.vectorstore.embeddings
+    vectors = np.asarray(embeddings.embed_documents(list(queries)), dtype=np.float32)
+    return search_top_k_entities(vectors, retriever, k=k)
 
 
-def setup_retriever(api_base, api_key, retriever_document_path, faiss_index_path):
+def search_top_k_entities(vectors, retriever, k=10):
+    """
+    Search the FAISS index with a matrix of query embeddings for the nearest neighbours
+    Args:
+        vectors: Query embeddings, float32 array of shape (n_queries, dim)
+        retriever: Retriever instance wrapping the FAISS vector store
+        k: Number of candidate entities to return per query
+    Returns:
+        batch_answers: List of TOP-K most relevant entities, one list per query
+    """
+    db = retriever.vectorstore
+    search_k = retriever.search_kwargs.get("k", 4)
+
+    if getattr(db, "_normalize_L2", False):
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    _, indices = db.index.search(vectors, min(search_k, k))
+    return [answer_entities(db, row[row != -1]) for row in indices]
+
+
+def answer_entities(db, positions):
+    """
+    Look up the entities stored at FAISS index positions
+    Args:
+        db: FAISS vector store
+        positions: Index positions, best match first
+    Returns:
+        answers: List of (entity id, entity name without spaces) tuples
+    """
+    answers = []
+    for i in positions:
+        doc = db.docstore.search(db.index_to_docstore_id[int(i)])
+        answer_id, _, answer_name = doc.page_content.strip().partition('\t')
+        answers.append((answer_id, answer_name.replace(' ', '')))
+    return answers
+
+
+def create_embeddings(api_base=None, api_key=None, embedding_model=None):
+    """
+    Create the embedding model shared by index building and querying
+    Args:
+        api_base: OpenAI API base URL (optional)
+        api_key: OpenAI API key (optional)
+        embedding_model: Local sentence-transformer model name; when set, queries are
+            embedded on CPU with its INT8 ONNX graph instead of the OpenAI API
+    Returns:
+        embeddings: Embedding model instance
+    """
+    if embedding_model:
+        if not LOCAL_EMBEDDINGS_AVAILABLE:
+            raise ImportError("Local embedding model requires langchain-huggingface and sentence-transformers[onnx]")
+        return HuggingFaceEmbeddings(
+            model_name=embedding_model,
+            model_kwargs={
+                "device": "cpu",
+                "backend": "onnx",
+                "model_kwargs": {"file_name": LOCAL_EMBEDDING_ONNX_FILE},
+            },
+            encode_kwargs={"normalize_embeddings": True},
+        )
+
+    # Configure OpenAI API
+    if api_base and api_key:
+        os.environ["OPENAI_API_BASE"] = api_base
+        os.environ["OPENAI_API_KEY"] = api_key
+
+    # Initialize OpenAI embedding model (reads from environment variables)
+    return OpenAIEmbeddings()
+
+
+def preload_index_pages(index_file):
+    """
+    Read a memory-mapped index file front to back once before it is searched
+    Sequential reads trigger kernel readahead, so the page cache is filled by
+    streaming IO instead of one page fault per random vector access
+    Args:
+        index_file: Path to the .faiss file
+    """
+    buffer = bytearray(INDEX_PRELOAD_CHUNK_SIZE)
+    with open(index_file, 'rb', buffering=0) as fh:
+        while fh.readinto(buffer):
+            pass
+
+
+def load_faiss_index_mmap(index_file):
+    """
+    Load a FAISS index read-only with its vectors memory-mapped from the file
+    The pages live in the OS page cache, shared by every process and run that maps
+    the same index, instead of in a private heap copy
+    Args:
+        index_file: Path to the .faiss file
+    Returns:
+        index: FAISS index (regular read when the index type cannot be mapped)
+    """
+    # IO_FLAG_MMAP_IFC maps flat code arrays (Flat, SQ8), IO_FLAG_MMAP inverted lists
+    for flag_name in ("IO_FLAG_MMAP_IFC", "IO_FLAG_MMAP"):
+        flag = getattr(faiss, flag_name, None)
+        if flag is None:
+            continue
+        try:
+            index = faiss.read_index(index_file, flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            continue
+        preload_index_pages(index_file)
+        return index
+    return faiss.read_index(index_file)
+
+
+def setup_retriever(api_base, api_key, retriever_document_path, faiss_index_path, embedding_model=None):
     """
     Setup and configure the retriever
     Args:
@@ -166,21 +327,22 @@ def setup_retriever(api_base, api_key, retriever_document_path, faiss_index_path
         api_key: OpenAI API key
         retriever_document_path: Path to the retriever document
         faiss_index_path: Path to save/load FAISS index
+        embedding_model: Local embedding model name (optional, default: OpenAI API)
     Returns:
         retriever: Configured retriever instance
     """
-    # Configure OpenAI API
-    os.environ["OPENAI_API_BASE"] = api_base
-    os.environ["OPENAI_API_KEY"] = api_key
-
-    # Initialize OpenAI embedding model (reads from environment variables)
-    embeddings = OpenAIEmbeddings()
-
-    # Load FAISS vector store
-    db = FAISS.load_local(faiss_index_path, embeddings, allow_dangerous_deserialization=True)
+    embeddings = create_embeddings(api_base, api_key, embedding_model)
+
+    # Load FAISS vector store with the vectors served from a memory map; the docstore is
+    # unpickled like FAISS.load_local does, which would also read index.faiss in full
+    index = load_faiss_index_mmap(os.path.join(faiss_index_path, "index.faiss"))
+    with open(os.path.join(faiss_index_path, "index.pkl"), 'rb') as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    db = FAISS(embeddings, index, docstore, index_to_docstore_id)
+    # Only the nearest candidates are used downstream, so no MMR diversity rerank
     retriever = db.as_retriever(
-        search_type="mmr",
-        search_kwargs={"k": 5, "fetch_k": 10}
+        search_type="similarity",
+        search_kwargs={"k": 5}
     )
     # retriever = db.as_retriever(search_type="similarity_score_threshold",
     #                             search_kwargs={"score_threshold": 0.5})
@@ -188,37 +350,363 @@ def setup_retriever(api_base, api_key, retriever_document_path, faiss_index_path
     return retriever
 
 
-def init_process(api_base, api_key, retriever_document_path, faiss_index_path):
+class EmbeddingCache:
+    """
+    Persistent query embedding cache, keyed by sha1(model + text)
+    
+    Backed by a single SQLite file holding float32 vectors; several processes
+    may share it. Cache errors are reported once and then ignored, so a broken
+    cache never aborts the retrieval run.
+    """
+    
+    def __init__(self, path, model):
+        """
+        Args:
+            path: SQLite database file
+            model: Embedding model name, part of every key
+        """
+        self.path = path
+        self.model = model
+        self.conn = None
+        try:
+            self.conn = sqlite3.connect(path, timeout=60)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self._disable(e)
+    
+    def key(self, text):
+        """Cache key of one embedded text"""
+        return hashlib.sha1((self.model + "|" + text).encode('utf-8')).hexdigest()
+    
+    def get_many(self, texts):
+        """Cached vectors {text: vector} of the given texts"""
+        if self.conn is None or not texts:
+            return {}
+        keys = {self.key(text): text for text in texts}
+        key_list = list(keys)
+        found = {}
+        try:
+            # Stay below SQLite's bound parameter limit
+            for start in range(0, len(key_list), 500):
+                chunk = key_list[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, vector in rows:
+                    found[keys[key]] = np.frombuffer(vector, dtype=np.float32)
+        except sqlite3.Error as e:
+            self._disable(e)
+            return {}
+        return found
+    
+    def set_many(self, vectors):
+        """Store {text: vector} embeddings"""
+        if self.conn is None or not vectors:
+            return
+        try:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(self.key(text), np.asarray(vector, dtype=np.float32).tobytes()) for text, vector in vectors.items()]
+            )
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self._disable(e)
+    
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+    
+    def _disable(self, error):
+        print(f"Warning: embedding cache disabled ({self.path}): {error}")
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except sqlite3.Error:
+                pass
+        self.conn = None
+
+
+def split_cached_batch(batch, cache):
+    """
+    Split a batch into cached embeddings and the entities that still need embedding
+    Args:
+        batch: List of (entity_id, entity_name) tuples
+        cache: EmbeddingCache instance, or None
+    Returns:
+        cached: Dictionary {entity_name: vector} of the cache hits
+        missing: (entity_id, entity_name) tuples to embed, one per distinct name
+    """
+    cached = cache.get_many([ent_name for _, ent_name in batch]) if cache is not None else {}
+    missing = []
+    seen = set(cached)
+    for ent_id, ent_name in batch:
+        if ent_name not in seen:
+            seen.add(ent_name)
+            missing.append((ent_id, ent_name))
+    return cached, missing
+
+
+def merge_cached_batch(batch, cached, missing, embedded_batch, cache):
+    """
+    Store newly computed embeddings and assemble the embeddings of a whole batch
+    Args:
+        batch: List of (entity_id, entity_name) tuples
+        cached: Cache hits returned by split_cached_batch
+        missing: Entities that were sent to the embedding model
+        embedded_batch: (entity_ids, vectors) computed for the missing entities
+        cache: EmbeddingCache instance, or None
+    Returns:
+        embedded_batch: (entity_ids, vectors) for every entity of the batch with an embedding
     """
-    Initialize process with a retriever
+    names = dict(missing)
+    computed = {names[ent_id]: vector for ent_id, vector in zip(*embedded_batch)}
+    if cache is not None:
+        cache.set_many(computed)
+    computed.update(cached)
+
+    ent_ids = [ent_id for ent_id, ent_name in batch if ent_name in computed]
+    if len(ent_ids) == 0:
+        return ent_ids, np.empty((0, 0), dtype=np.float32)
+    vectors = np.stack([computed[ent_name] for _, ent_name in batch if ent_name in computed]).astype(np.float32, copy=False)
+    return ent_ids, vectors
+
+
+def init_process(api_base, api_key, embedding_model=None, cache_path=None):
+    """
+    Initialize process with an embedding model and the shared embedding cache
     This function will be called once per worker process
     """
-    global process_retriever
-    process_retriever = setup_retriever(api_base, api_key, retriever_document_path, faiss_index_path)
+    global process_embeddings, process_embedding_cache
+    process_embeddings = create_embeddings(api_base, api_key, embedding_model)
+    process_embedding_cache = EmbeddingCache(cache_path, embedding_model) if cache_path else None
 
 
-def process_entity_batch(batch, top_k=5):
+def embed_entity_batch(batch):
+    """
+    Embed a batch of entities using the process-local embedding model
+    (first stage of the retrieval pipeline)
+    Args:
+        batch: List of (entity_id, entity_name) tuples
+    Returns:
+        embedded_batch: (entity_ids, vectors) for the entities that were embedded, with
+            the ids as one fixed-width string array so the result pickles as two buffers
     """
-    Process a batch of entities using the process-local retriever
+    global process_embeddings, process_embedding_cache
+    cached, missing = split_cached_batch(batch, process_embedding_cache)
+    ent_ids = [ent_id for ent_id, _ in missing]
+    ent_names = [ent_name for _, ent_name in missing]
+    if len(ent_names) == 0:
+        ent_ids, vectors = merge_cached_batch(batch, cached, missing, ([], []), process_embedding_cache)
+        return np.array(ent_ids, dtype=str), vectors
+
+    # One embedding request for all names missing from the cache
+    try:
+        vectors = process_embeddings.embed_documents(ent_names)
+    except Exception as e:
+        print(f"Error with batch of {len(ent_names)} entities, retrying one by one: {str(e)}")
+        kept_ids, vectors = [], []
+        for ent_id, ent_name in zip(ent_ids, ent_names):
+            try:
+                vectors.append(process_embeddings.embed_documents([ent_name])[0])
+                kept_ids.append(ent_id)
+            except Exception as e:
+                print(f"Error with entity {ent_name}: {str(e)}")
+        ent_ids = kept_ids
+    ent_ids, vectors = merge_cached_batch(batch, cached, missing, (ent_ids, vectors), process_embedding_cache)
+    return np.array(ent_ids, dtype=str), vectors
+
+
+async def embed_entity_batch_async(client, model, batch, semaphore, cache=None):
+    """
+    Embed a batch of entities with one request to the OpenAI embeddings API
+    (first stage of the retrieval pipeline for API embeddings)
     Args:
+        client: AsyncOpenAI client
+        model: Embedding model name, same as the one used to build the index
         batch: List of (entity_id, entity_name) tuples
+        semaphore: asyncio.Semaphore bounding the number of concurrent requests
+        cache: EmbeddingCache instance (optional)
+    Returns:
+        embedded_batch: (entity_ids, vectors) for the entities that were embedded
+    """
+    async def embed(texts):
+        async with semaphore:
+            for attempt in range(EMBEDDING_MAX_ATTEMPTS):
+                try:
+                    response = await client.embeddings.create(model=model, input=texts)
+                    return [item.embedding for item in response.data]
+                except RateLimitError:
+                    if attempt == EMBEDDING_MAX_ATTEMPTS - 1:
+                        raise
+                    await asyncio.sleep(min(EMBEDDING_MAX_BACKOFF, 2 ** attempt) * random.uniform(0.5, 1.5))
+
+    cached, missing = split_cached_batch(batch, cache)
+    ent_ids = [ent_id for ent_id, _ in missing]
+    ent_names = [ent_name for _, ent_name in missing]
+    if len(ent_names) == 0:
+        return merge_cached_batch(batch, cached, missing, ([], []), cache)
+
+    try:
+        vectors = await embed(ent_names)
+    except Exception as e:
+        print(f"Error with batch of {len(ent_names)} entities, retrying one by one: {str(e)}")
+        kept_ids, vectors = [], []
+        for ent_id, ent_name in zip(ent_ids, ent_names):
+            try:
+                vectors.append((await embed([ent_name]))[0])
+                kept_ids.append(ent_id)
+            except Exception as e:
+                print(f"Error with entity {ent_name}: {str(e)}")
+        ent_ids = kept_ids
+    return merge_cached_batch(batch, cached, missing, (ent_ids, vectors), cache)
+
+
+async def embed_corpus_async(texts, model, api_base=None, api_key=None, cache_path=None,
+                             batch_size=EMBEDDING_DOCUMENT_BATCH_SIZE, max_concurrency=EMBEDDING_MAX_CONCURRENCY):
+    """
+    Embed the retrieval corpus with concurrent large-batch requests to the OpenAI embeddings API
+    Args:
+        texts: Document texts
+        model: Embedding model name
+        api_base: OpenAI API base URL (optional)
+        api_key: OpenAI API key (optional)
+        cache_path: EmbeddingCache file (optional)
+        batch_size: Texts per request
+        max_concurrency: Concurrent requests
+    Returns:
+        positions: Positions in texts of the embedded texts
+        vectors: float32 array of shape (len(positions), dim)
+    """
+    client = AsyncOpenAI(base_url=api_base or None, api_key=api_key or None)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    cache = EmbeddingCache(cache_path, model) if cache_path else None
+    items = list(enumerate(texts))
+    try:
+        results = await asyncio.gather(*(
+            embed_entity_batch_async(client, model, items[start:start + batch_size], semaphore, cache)
+            for start in range(0, len(items), batch_size)
+        ))
+    finally:
+        await client.close()
+        if cache is not None:
+            cache.close()
+
+    positions = [position for batch_positions, _ in results for position in batch_positions]
+    vectors = [batch_vectors for batch_positions, batch_vectors in results if len(batch_positions)]
+    return positions, np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+
+
+def process_entity_batch(embedded_batch, retriever, top_k=5):
+    """
+    Search the FAISS index for a batch of embedded entities
+    (second stage of the retrieval pipeline)
+    Args:
+        embedded_batch: (entity_ids, vectors) returned by embed_entity_batch
+        retriever: Retriever instance wrapping the FAISS vector store
         top_k: Number of top entities to retrieve
     Returns:
-        outputs: List of retrieval results
+        pairs: (source ids, retrieved ids) string arrays, one entry per result line
     """
-    global process_retriever
-    outputs = []
-    for ent_id, ent_name in batch:
-        try:
-            top_k_answers = retrieve_top_k_entities(ent_name, process_retriever, k=top_k)
-            for idx, (top_answer_id, top_answer_name) in enumerate(top_k_answers):
-                outputs.append(f"{ent_id}\t{top_answer_id}\n")
-        except Exception as e:
-            print(f"Error with entity {ent_name}: {str(e)}")
-    return outputs
+    ent_ids, vectors = embedded_batch
+    if len(ent_ids) == 0:
+        return np.array([], dtype=str), np.array([], dtype=str)
+
+    try:
+        batch_answers = search_top_k_entities(vectors, retriever, k=top_k)
+    except Exception as e:
+        print(f"Error searching batch of {len(ent_ids)} entities: {str(e)}")
+        return np.array([], dtype=str), np.array([], dtype=str)
+
+    source_ids = np.repeat(np.asarray(ent_ids, dtype=str), [len(top_k_answers) for top_k_answers in batch_answers])
+    answer_ids = np.array([top_answer_id for top_k_answers in batch_answers
+                           for top_answer_id, top_answer_name in top_k_answers], dtype=str)
+    return source_ids, answer_ids
+
+
+def start_result_writer(file, pbar):
+    """
+    Start the thread that owns the output file (last stage of the retrieval pipeline)
+    Args:
+        file: Retriever output file opened in binary mode
+        pbar: Progress bar advanced once per written batch
+    Returns:
+        results: Queue of (source ids, retrieved ids) batch results, in completion order;
+            put None to stop the writer
+        writer: The started writer thread
+    """
+    results = queue.Queue()
+
+    def write():
+        while True:
+            pairs = results.get()
+            if pairs is None:
+                break
+            # One "{ent_id}\t{top_answer_id}\n" line per pair, as a single write per batch
+            source_ids, answer_ids = pairs
+            lines = "".join(f"{ent_id}\t{answer_id}\n" for ent_id, answer_id in zip(source_ids.tolist(), answer_ids.tolist()))
+            file.write(lines.encode('utf-8'))
+            pbar.update(1)
 
+    writer = threading.Thread(target=write, name="retriever-output-writer", daemon=True)
+    writer.start()
+    return results, writer
 
-def prepare_faiss_index(retriever_document_path, faiss_index_path, api_base=None, api_key=None, force_rebuild=False):
+
+def quantize_faiss_index(index, index_type=FAISS_INDEX_TYPE):
+    """
+    Re-encode a flat FP32 FAISS index with a compressed vector encoding
+    Vectors keep their positions, so the docstore mapping stays valid
+    Args:
+        index: Flat FAISS index holding the corpus vectors
+        index_type: "Flat", "SQ8" or "IVF-PQ" (see FAISS_INDEX_TYPE)
+    Returns:
+        quantized: Index with the same vectors in the requested encoding
+    """
+    if index_type == "Flat" or index.ntotal == 0:
+        return index
+    if index_type not in ("SQ8", "IVF-PQ"):
+        raise ValueError(f"Unknown FAISS index type: {index_type}")
+
+    d = index.d
+    xb = index.reconstruct_n(0, index.ntotal)
+    if index_type == "IVF-PQ" and index.ntotal < IVF_PQ_MIN_VECTORS:
+        print(f"  Only {index.ntotal} vectors, too few to train IVF-PQ; using SQ8")
+        index_type = "SQ8"
+
+    if index_type == "IVF-PQ":
+        nlist = min(IVF_PQ_MAX_LISTS, index.ntotal // 39)
+        m = max(m for m in range(1, 65) if d % m == 0)
+        quantized = faiss.index_factory(d, f"IVF{nlist},PQ{m}x8", index.metric_type)
+        quantized.train(xb)
+        quantized.add(xb)
+        quantized.nprobe = min(nlist, IVF_PQ_NPROBE)
+    else:
+        quantized = faiss.index_factory(d, "SQ8", index.metric_type)
+        quantized.train(xb)
+        quantized.add(xb)
+    return quantized
+
+
+def document_digest(retriever_document_path):
+    """
+    Content digest of a retriever document
+    Args:
+        retriever_document_path: Path to the retriever document
+    Returns:
+        digest: Hex blake2b digest (16 bytes) of the file content
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(retriever_document_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(INDEX_PRELOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def prepare_faiss_index(retriever_document_path, faiss_index_path, api_base=None, api_key=None, force_rebuild=False,
+                        embedding_model=None, index_type=FAISS_INDEX_TYPE, embedding_cache=None):
     """
     Prepare FAISS index if it doesn't exist
     
@@ -227,34 +715,64 @@ def prepare_faiss_index(retriever_document_path, faiss_index_path, api_base=None
         faiss_index_path: Path to save/load FAISS index
         api_base: OpenAI API base URL (optional)
         api_key: OpenAI API key (optional)
-        force_rebuild: Ignored - if index exists, it will be skipped (for backward compatibility)
+        force_rebuild: Rebuild an existing index, unless the retriever document is unchanged
+            since it was built (otherwise an existing index is always kept)
+        embedding_model: Local embedding model name (optional, default: OpenAI API)
+        index_type: Vector encoding of the index (see FAISS_INDEX_TYPE)
+        embedding_cache: EmbeddingCache file for the OpenAI document embeddings (optional)
     """
-    # Skip if index already exists
+    digest_file = os.path.join(faiss_index_path, INDEX_DOCUMENT_DIGEST_FILE)
+
+    # Skip if index already exists (and, when forced, was built from the same document)
     if os.path.exists(faiss_index_path):
-        print(f"  FAISS index already exists at {faiss_index_path}, skipping creation.")
-        return
-    
-    # Create index only if it doesn't exist
-    print(f"  Creating FAISS index at {faiss_index_path}...")
+        if not force_rebuild:
+            print(f"  FAISS index already exists at {faiss_index_path}, skipping creation.")
+            return
+        digest = document_digest(retriever_document_path)
+        try:
+            with open(digest_file, 'r') as f:
+                built_from = f.read().strip()
+        except FileNotFoundError:
+            built_from = None
+        if built_from == digest:
+            print(f"  Retriever document unchanged since the FAISS index at {faiss_index_path} was built, skipping rebuild.")
+            return
+        print(f"  Retriever document changed, rebuilding FAISS index at {faiss_index_path}...")
+    else:
+        print(f"  Creating FAISS index at {faiss_index_path}...")
+        digest = document_digest(retriever_document_path)
     os.makedirs(os.path.dirname(faiss_index_path), exist_ok=True)
     
-    # Load documents
-    loader = TextLoader(retriever_document_path)
-    raw_documents = loader.load()
-
-    # Initialize OpenAI embedding model with API config
-    if api_base and api_key:
-        os.environ["OPENAI_API_BASE"] = api_base
-        os.environ["OPENAI_API_KEY"] = api_key
-    embeddings = OpenAIEmbeddings()
+    # Load documents: one entity per line, so every non-empty line is a document
+    with open(retriever_document_path, 'r') as f:
+        texts = [line.strip() for line in f.read().split('\n')]
+    texts = [text for text in texts if text]
+
+    # Initialize the embedding model (OpenAI API or local INT8 model)
+    embeddings = create_embeddings(api_base, api_key, embedding_model)
+
+    # Embed the whole corpus up front: local models batch internally, API requests
+    # carry EMBEDDING_DOCUMENT_BATCH_SIZE texts each and run concurrently
+    if embedding_model:
+        vectors = embeddings.embed_documents(texts)
+    else:
+        positions, vectors = asyncio.run(embed_corpus_async(texts, embeddings.model, api_base, api_key,
+                                                            cache_path=embedding_cache))
+        if len(positions) < len(texts):
+            print(f"  Warning: {len(texts) - len(positions)} documents could not be embedded and are left out")
+        texts = [texts[position] for position in positions]
 
     # Create FAISS index
-    text_splitter = CharacterTextSplitter(separator="\n", chunk_size=1, chunk_overlap=0)
-    documents = text_splitter.split_documents(raw_documents)
-    # print("documents",documents)
-    db = FAISS.from_documents(documents, embeddings)
+    metadatas = [{"source": retriever_document_path}] * len(texts)
+    db = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, metadatas=metadatas)
+    db.index = quantize_faiss_index(db.index, index_type)
+    # A new directory instead of overwriting index.faiss, which may still be memory-mapped
+    if os.path.exists(faiss_index_path):
+        shutil.rmtree(faiss_index_path)
     db.save_local(faiss_index_path)
-    print(f"  FAISS index created successfully.")
+    with open(digest_file, 'w') as f:
+        f.write(digest)
+    print(f"  FAISS index created successfully ({index_type}, {db.index.ntotal} vectors).")
 
 
 def process_entities_parallel(config):
@@ -269,51 +787,103 @@ def process_entities_parallel(config):
     # Prepare FAISS index if needed (or force rebuild if requested)
     force_rebuild = config.get('force_rebuild_index', False)
     prepare_faiss_index(config['retriever_document_path'], config['faiss_index'], 
-                       config['api_base'], config['api_key'], force_rebuild=force_rebuild)
+                       config['api_base'], config['api_key'], force_rebuild=force_rebuild,
+                       embedding_model=config.get('embedding_model'),
+                       index_type=config.get('faiss_index_type', FAISS_INDEX_TYPE),
+                       embedding_cache=config.get('embedding_cache'))
 
-    # Load entities
+    # Load entities (KG2 entities are only searched through the FAISS index)
     ents_1 = load_ents(config['ents_path_1'])
-    name2idx_1 = {v: k for k, v in ents_1.items()}
-    ents_2 = load_ents(config['ents_path_2'])
-    name2idx_2 = {v: k for k, v in ents_2.items()}
 
     # Create batches
     entity_items = list(ents_1.items())
-    num_batches = (len(entity_items) + config['batch_size'] - 1) // config['batch_size']
-    batches = np.array_split(entity_items, num_batches)
-
-    # Set up multiprocessing
-    if config['num_processes'] is None:
-        # Limit to reasonable number of processes to avoid resource exhaustion
-        # and API rate limiting (max 16 processes)
-        config['num_processes'] = min(mp.cpu_count() - 1, 16)
-
-    # Initialize pool with retriever setup
-    pool = mp.Pool(
-        processes=config['num_processes'],
-        initializer=init_process,
-        initargs=(
-            config['api_base'],
-            config['api_key'],
-            config['retriever_document_path'],
-            config['faiss_index']
+    batch_size = config['batch_size']
+    batches = [entity_items[start:start + batch_size] for start in range(0, len(entity_items), batch_size)]
+
+    # Retrieval runs as a pipeline: entity names are embedded (API requests on an
+    # event loop, or worker processes for a local model), a thread pool searches the
+    # single FAISS index loaded here, and a writer thread appends results as they finish
+    retriever = setup_retriever(config['api_base'], config['api_key'], config['retriever_document_path'],
+                                config['faiss_index'], embedding_model=config.get('embedding_model'))
+    num_search_threads = config.get('num_search_threads', 2)
+    max_pending = 2 * num_search_threads
+
+    # FAISS runs every batch search as one BLAS/OpenMP job; the cores are split
+    # between the search threads (OpenMP thread counts are per calling thread)
+    omp_threads = config.get('faiss_omp_threads') or max(1, (os.cpu_count() or 1) // num_search_threads)
+    search_executor = ThreadPoolExecutor(max_workers=num_search_threads,
+                                         initializer=faiss.omp_set_num_threads, initargs=(omp_threads,))
+
+    def search(embedded_batch, results):
+        future = search_executor.submit(process_entity_batch, embedded_batch, retriever, config['top_k'])
+        future.add_done_callback(lambda done: results.put(done.result()))
+        return future
+
+    async def run_api_pipeline(results):
+        """Embed all batches through the OpenAI API with bounded concurrency in one process"""
+        client = AsyncOpenAI(base_url=config['api_base'] or None, api_key=config['api_key'] or None)
+        model = getattr(retriever.vectorstore.embeddings, 'model', 'text-embedding-ada-002')
+        semaphore = asyncio.Semaphore(config.get('max_concurrent_requests', EMBEDDING_MAX_CONCURRENCY))
+        cache = EmbeddingCache(config['embedding_cache'], model) if config.get('embedding_cache') else None
+        try:
+            tasks = [asyncio.ensure_future(embed_entity_batch_async(client, model, batch, semaphore, cache))
+                     for batch in batches]
+            pending = deque()
+            for task in asyncio.as_completed(tasks):
+                pending.append(search(await task, results))
+                if len(pending) > max_pending:
+                    await asyncio.wrap_future(pending.popleft())
+            for future in pending:
+                await asyncio.wrap_future(future)
+        finally:
+            await client.close()
+            if cache is not None:
+                cache.close()
+
+    def run_pool_pipeline(results):
+        """Embed all batches with the local model in worker processes"""
+        if config['num_processes'] is None:
+            # Limit to reasonable number of processes to avoid resource exhaustion (max 16 processes)
+            config['num_processes'] = max(1, min(mp.cpu_count() - 1, 16))
+
+        # Initialize pool with embedding model setup
+        pool = mp.Pool(
+            processes=config['num_processes'],
+            initializer=init_process,
+            initargs=(
+                config['api_base'],
+                config['api_key'],
+                config.get('embedding_model'),
+                config.get('embedding_cache')
+            )
         )
-    )
-
-    process_batch_partial = partial(process_entity_batch, top_k=config['top_k'])
-
-    # Process batches in parallel with progress bar
-    outputs = []
-    with tqdm(total=len(batches), desc="Processing batches") as pbar:
-        for batch_results in pool.imap(process_batch_partial, batches):
-            outputs.extend(batch_results)
-            # Write batch results to file immediately
-            with open(config['retriever_output_file'], 'a+') as file:
-                file.writelines(batch_results)
-            pbar.update(1)
-
-    pool.close()
-    pool.join()
+        # Batches are handed to the workers in chunks (one pickle + pipe write each),
+        # about four chunks per worker, and searched in the order the workers finish them
+        chunksize = max(1, min(len(batches) // (4 * config['num_processes']), POOL_MAX_CHUNKSIZE))
+        pending = deque()
+        for embedded_batch in pool.imap_unordered(embed_entity_batch, batches, chunksize=chunksize):
+            pending.append(search(embedded_batch, results))
+            if len(pending) > max_pending:
+                pending.popleft().result()
+        for future in pending:
+            future.result()
+        pool.close()
+        pool.join()
+
+    # Process batches with progress bar; each batch is one write on a file kept open for the whole run
+    with tqdm(total=len(batches), desc="Processing batches") as pbar, \
+            open(config['retriever_output_file'], 'ab', buffering=WRITE_BUFFER_SIZE) as file:
+        results, writer = start_result_writer(file, pbar)
+        try:
+            if config.get('embedding_model'):
+                run_pool_pipeline(results)
+            else:
+                asyncio.run(run_api_pipeline(results))
+        finally:
+            # Searches finish (and queue their results) before the writer is stopped
+            search_executor.shutdown()
+            results.put(None)
+            writer.join()
 
     end_time = time.time()
     print(f"Parallel Retriever Execution time: {end_time - start_time:.2f} seconds")
@@ -337,20 +907,32 @@ def neural_retrieval(data_dir, force_rebuild_index=False):
     }
     config_top_k = 5
 
+    # Optional local INT8 embedding model, e.g. "sentence-transformers/all-MiniLM-L6-v2";
+    # its vectors are not comparable with OpenAI ones, so it gets its own index
+    embedding_model = os.getenv("LOCAL_EMBEDDING_MODEL", "")
+    faiss_index_name = "faiss_index_local" if embedding_model else "faiss_index"
+
     # API credentials should be configured via environment variables or config file
     # Example: api_base = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
     #          api_key = os.getenv("OPENAI_API_KEY")
     config = {
         'api_base': os.getenv("OPENAI_API_BASE", ""),  # TODO: Configure API base URL
         'api_key': os.getenv("OPENAI_API_KEY", ""),  # TODO: Configure API key
+        'embedding_model': embedding_model,  # Empty: OpenAI API embeddings
+        'embedding_cache': os.path.join(data_dir, ".embedding_cache.sqlite3"),  # None disables the cache
         'retriever_document_path': data_dir + "/inrag_ent_ids_2_pre_embeding.txt",
-        'faiss_index': data_dir + "/index/faiss_index",
+        'faiss_index': data_dir + "/index/" + faiss_index_name,
+        'faiss_index_type': FAISS_INDEX_TYPE,  # "Flat", "SQ8" or "IVF-PQ" for newly built indexes
+        'force_rebuild_index': force_rebuild_index,  # Rebuilt only if the retriever document changed
         'retriever_output_file': S1_PRIVATE_MESSAGE_POOL['top_k_candidate_entities'],
         'ents_path_1': data_dir + '/ent_ids_1',
         'ents_path_2': data_dir + '/ent_ids_2',
         'top_k': config_top_k,
-        'batch_size': 10,  # Number of entities to process in each batch
-        'num_processes': None  # Will use (CPU count - 1) by default
+        'batch_size': 256,  # Number of entities embedded and searched together in each batch
+        'max_concurrent_requests': EMBEDDING_MAX_CONCURRENCY,  # In-flight OpenAI embedding requests
+        'num_processes': None,  # Local model embedding processes, (CPU count - 1) by default
+        'num_search_threads': 2,  # Threads running FAISS searches on embedded batches
+        'faiss_omp_threads': None  # OpenMP threads per search, (CPU count / search threads) by default
     }
 
     # Clear output file if it exists
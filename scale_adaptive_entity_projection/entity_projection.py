@@ -20,7 +20,11 @@ Output:
 
 import os
 import sys
-from collections import defaultdict
+import shutil
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
 
 # Add project path
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -31,35 +35,50 @@ from multi_scale_hypergraph_retrieval.neural_retrieval import neural_retrieval
 from multi_scale_hypergraph_retrieval.hypergraph_decomposition import run_hypergraph_decomposition
 from scale_adaptive_entity_projection.run_relation_alignment import run_relation_alignment_stage
 
+logger = logging.getLogger(__name__)
+
+# Multi-scale hypergraph scales
+_SCALES = ('L1', 'L2', 'L3')
+
+# Buffer size for the entity and retrieval files written and read here
+_IO_BUFFER_SIZE = 1 << 20
+
+
+@lru_cache(maxsize=8)
+def _parse_entity_ids(entity_file_path, mtime_ns, size):
+    """Parse an entity file, memoized on its path and (mtime, size) version"""
+    # One read() for the whole file, then a single comprehension over its lines
+    with open(entity_file_path, 'r', encoding='utf-8') as f:
+        lines = f.read().split('\n')
+    entity_dict = {
+        parts[0].strip(): parts[1].strip()
+        for parts in (line.strip().split('\t', 2) for line in lines)
+        if len(parts) >= 2
+    }
+    
+    print(f"Loaded {len(entity_dict)} entities from {entity_file_path}")
+    return MappingProxyType(entity_dict)
+
 
 def load_entity_ids(entity_file_path):
     """
     Load entity ID to entity name mapping
     
+    The parsed file is cached until its mtime or size changes, so repeated
+    calls (e.g. once per pipeline iteration) do not parse it again.
+    
     Args:
         entity_file_path: Entity file path (ent_ids_1 or ent_ids_2)
         
     Returns:
-        dict: {entity_id: entity_name}
+        Mapping: read-only {entity_id: entity_name}
     """
-    entity_dict = {}
     if not os.path.exists(entity_file_path):
         print(f"Warning: Entity file not found: {entity_file_path}")
-        return entity_dict
+        return MappingProxyType({})
     
-    with open(entity_file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split('\t')
-            if len(parts) >= 2:
-                entity_id = parts[0].strip()
-                entity_name = parts[1].strip()
-                entity_dict[entity_id] = entity_name
-    
-    print(f"Loaded {len(entity_dict)} entities from {entity_file_path}")
-    return entity_dict
+    stat = os.stat(entity_file_path)
+    return _parse_entity_ids(entity_file_path, stat.st_mtime_ns, stat.st_size)
 
 
 def extract_entities_from_topk(topk_file_path):
@@ -80,16 +99,11 @@ def extract_entities_from_topk(topk_file_path):
         return kg1_entity_ids, kg2_entity_ids
     
     with open(topk_file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split('\t')
-            if len(parts) >= 2:
-                kg1_id = parts[0].strip()
-                kg2_id = parts[1].strip()
-                kg1_entity_ids.add(kg1_id)
-                kg2_entity_ids.add(kg2_id)
+        lines = f.read().split('\n')
+    for parts in (line.strip().split('\t', 2) for line in lines):
+        if len(parts) >= 2:
+            kg1_entity_ids.add(parts[0].strip())
+            kg2_entity_ids.add(parts[1].strip())
     
     print(f"Extracted {len(kg1_entity_ids)} unique KG1 entities from top-k file")
     print(f"Extracted {len(kg2_entity_ids)} unique KG2 entities from top-k file")
@@ -106,11 +120,42 @@ def extract_kg2_entities_from_topk(topk_file_path):
     Returns:
         set: KG2 entity ID set
     """
-    _, kg2_entity_ids = extract_entities_from_topk(topk_file_path)
+    kg2_entity_ids = set()
+    
+    if not os.path.exists(topk_file_path):
+        print(f"Warning: Top-k file not found: {topk_file_path}")
+        return kg2_entity_ids
+    
+    with open(topk_file_path, 'r', encoding='utf-8') as f:
+        lines = f.read().split('\n')
+    # Only the second column is needed, so locate it with find() instead of splitting rows
+    for line in lines:
+        line = line.strip()
+        start = line.find('\t') + 1
+        if start:
+            end = line.find('\t', start)
+            kg2_entity_ids.add(line[start:end if end >= 0 else len(line)].strip())
+    
+    print(f"Extracted {len(kg2_entity_ids)} unique KG2 entities from top-k file")
     return kg2_entity_ids
 
 
-def create_retrieval_document(data_dir, kg2_entity_ids, ent_ids_2_path, output_file_path):
+def _warn_missing_ids(missing_ids, entity_file_name):
+    """
+    Log one summary warning for entity IDs missing from an entity file
+    
+    The message is only built when warnings are enabled for this logger.
+    
+    Args:
+        missing_ids: Set of IDs that were not found
+        entity_file_name: Name of the entity file (for the message)
+    """
+    if missing_ids and logger.isEnabledFor(logging.WARNING):
+        logger.warning("%d entity IDs not found in %s (first 5: %s)",
+                       len(missing_ids), entity_file_name, ', '.join(sorted(missing_ids)[:5]))
+
+
+def create_retrieval_document(data_dir, kg2_entity_ids, ent_ids_2_path, output_file_path, entities=None):
     """
     Create retrieval document file (inrag_ent_ids_2_pre_embeding.txt)
     
@@ -119,32 +164,31 @@ def create_retrieval_document(data_dir, kg2_entity_ids, ent_ids_2_path, output_f
         kg2_entity_ids: KG2 entity ID set
         ent_ids_2_path: KG2 entity file path
         output_file_path: Output file path
+        entities: Preloaded {entity_id: entity_name} of ent_ids_2 (loaded from ent_ids_2_path if None)
         
     Returns:
         int: Number of successfully written entities
     """
-    # Load all KG2 entities
-    all_kg2_entities = load_entity_ids(ent_ids_2_path)
+    # Load all KG2 entities (unless preloaded)
+    all_kg2_entities = entities if entities is not None else load_entity_ids(ent_ids_2_path)
     
     # Create output directory
     os.makedirs(os.path.dirname(output_file_path) if os.path.dirname(output_file_path) else '.', exist_ok=True)
     
-    # Write retrieval document
-    written_count = 0
-    with open(output_file_path, 'w', encoding='utf-8') as f:
-        for entity_id in kg2_entity_ids:
-            if entity_id in all_kg2_entities:
-                entity_name = all_kg2_entities[entity_id]
-                f.write(f"{entity_id}\t{entity_name}\n")
-                written_count += 1
-            else:
-                print(f"Warning: Entity ID {entity_id} not found in ent_ids_2")
+    # Assemble the retrieval document, then write it in one call
+    # One set intersection instead of a membership test per ID
+    ids_present = kg2_entity_ids & all_kg2_entities.keys()
+    _warn_missing_ids(kg2_entity_ids - ids_present, "ent_ids_2")
+    lines = [f"{entity_id}\t{all_kg2_entities[entity_id]}\n" for entity_id in ids_present]
+    with open(output_file_path, 'w', encoding='utf-8', buffering=_IO_BUFFER_SIZE) as f:
+        f.write(''.join(lines))
+    written_count = len(lines)
     
     print(f"Created retrieval document with {written_count} entities: {output_file_path}")
     return written_count
 
 
-def create_retrieval_document_with_aspects(data_dir, kg2_entity_ids, aspect_ids, aspect_names, ent_ids_2_path, output_file_path):
+def create_retrieval_document_with_aspects(data_dir, kg2_entity_ids, aspect_ids, aspect_names, ent_ids_2_path, output_file_path, entities=None):
     """
     Create retrieval document file (including original KG2 entities and aspect entities)
     
@@ -155,38 +199,40 @@ def create_retrieval_document_with_aspects(data_dir, kg2_entity_ids, aspect_ids,
         aspect_names: Aspect entity name dictionary {aspect_id: aspect_name}
         ent_ids_2_path: KG2 entity file path
         output_file_path: Output file path
+        entities: Preloaded {entity_id: entity_name} of ent_ids_2 (loaded from ent_ids_2_path if None)
         
     Returns:
         int: Number of successfully written entities
     """
-    # Load all KG2 entities
-    all_kg2_entities = load_entity_ids(ent_ids_2_path)
+    # Load all KG2 entities (unless preloaded)
+    all_kg2_entities = entities if entities is not None else load_entity_ids(ent_ids_2_path)
     
     # Create output directory
     os.makedirs(os.path.dirname(output_file_path) if os.path.dirname(output_file_path) else '.', exist_ok=True)
     
-    written_count = 0
+    # Assemble original KG2 entities and aspect entities, then write them in one call
+    # 1. Original KG2 entities: when the top-k IDs cover a good part of ent_ids_2, walking
+    # its items with one set lookup each beats intersecting and then indexing every ID
+    if len(kg2_entity_ids) > len(all_kg2_entities) * 0.3:
+        lines = [f"{entity_id}\t{entity_name}\n"
+                 for entity_id, entity_name in all_kg2_entities.items() if entity_id in kg2_entity_ids]
+    else:
+        lines = [f"{entity_id}\t{all_kg2_entities[entity_id]}\n"
+                 for entity_id in kg2_entity_ids & all_kg2_entities.keys()]
+    
+    # 2. Aspect entities (the fallback name is only formatted for aspects without one)
+    lines.extend([f"{aspect_id}\t{aspect_names[aspect_id] if aspect_id in aspect_names else f'Aspect_{aspect_id}'}\n"
+                  for aspect_id in aspect_ids])
     
-    # Write original KG2 entities and aspect entities
-    with open(output_file_path, 'w', encoding='utf-8') as f:
-        # 1. Write original KG2 entities
-        for entity_id in kg2_entity_ids:
-            if entity_id in all_kg2_entities:
-                entity_name = all_kg2_entities[entity_id]
-                f.write(f"{entity_id}\t{entity_name}\n")
-                written_count += 1
-        
-        # 2. Write aspect entities
-        for aspect_id in aspect_ids:
-            aspect_name = aspect_names.get(aspect_id, f"Aspect_{aspect_id}")
-            f.write(f"{aspect_id}\t{aspect_name}\n")
-            written_count += 1
+    with open(output_file_path, 'w', encoding='utf-8', buffering=_IO_BUFFER_SIZE) as f:
+        f.write(''.join(lines))
+    written_count = len(lines)
     
     print(f"Created retrieval document with {written_count} entities (original: {len(kg2_entity_ids)}, aspects: {len(aspect_ids)}): {output_file_path}")
     return written_count
 
 
-def create_query_entities_file(data_dir, kg1_entity_ids, ent_ids_1_path, output_file_path):
+def create_query_entities_file(data_dir, kg1_entity_ids, ent_ids_1_path, output_file_path, entities=None):
     """
     Create query entities file (only contains KG1 entities from top-k results)
     
@@ -195,26 +241,25 @@ def create_query_entities_file(data_dir, kg1_entity_ids, ent_ids_1_path, output_
         kg1_entity_ids: KG1 entity ID set
         ent_ids_1_path: Original KG1 entity file path
         output_file_path: Output file path (temporary file)
+        entities: Preloaded {entity_id: entity_name} of ent_ids_1 (loaded from ent_ids_1_path if None)
         
     Returns:
         int: Number of successfully written entities
     """
-    # Load all KG1 entities
-    all_kg1_entities = load_entity_ids(ent_ids_1_path)
+    # Load all KG1 entities (unless preloaded)
+    all_kg1_entities = entities if entities is not None else load_entity_ids(ent_ids_1_path)
     
     # Create output directory
     os.makedirs(os.path.dirname(output_file_path) if os.path.dirname(output_file_path) else '.', exist_ok=True)
     
-    # Write query entities file
-    written_count = 0
-    with open(output_file_path, 'w', encoding='utf-8') as f:
-        for entity_id in kg1_entity_ids:
-            if entity_id in all_kg1_entities:
-                entity_name = all_kg1_entities[entity_id]
-                f.write(f"{entity_id}\t{entity_name}\n")
-                written_count += 1
-            else:
-                print(f"Warning: Entity ID {entity_id} not found in ent_ids_1")
+    # Assemble the query entities file, then write it in one call
+    # One set intersection instead of a membership test per ID
+    ids_present = kg1_entity_ids & all_kg1_entities.keys()
+    _warn_missing_ids(kg1_entity_ids - ids_present, "ent_ids_1")
+    lines = [f"{entity_id}\t{all_kg1_entities[entity_id]}\n" for entity_id in ids_present]
+    with open(output_file_path, 'w', encoding='utf-8', buffering=_IO_BUFFER_SIZE) as f:
+        f.write(''.join(lines))
+    written_count = len(lines)
     
     print(f"Created query entities file with {written_count} entities: {output_file_path}")
     return written_count
@@ -233,7 +278,8 @@ def s4_to_retrieval(data_dir, dataset_name=None, iteration=1, force_update=False
         data_dir: Data directory path (e.g., /path/to/data/icews_wiki)
         dataset_name: Dataset name (optional, extracted from data_dir path if not provided)
         iteration: Current iteration number (default: 1)
-        force_update: Whether to force update projection coverage file and FAISS index (default: False, automatically set to True for iterations after the first)
+        force_update: Whether to force update projection coverage file and FAISS index (default: False;
+            HyDRA_main passes True for iterations after the first)
     """
     print("\n" + "=" * 80)
     print("S4 to Retrieval: Connect Simple-HHEA output and Neural Retrieval")
@@ -243,10 +289,14 @@ def s4_to_retrieval(data_dir, dataset_name=None, iteration=1, force_update=False
     if dataset_name is None:
         dataset_name = os.path.basename(data_dir.rstrip('/'))
     
-    # File paths
-    topk_file_path = os.path.join(data_dir, "message_pool", "integration_top_pair.txt")
+    # File paths (computed once and reused by every step)
+    message_pool_dir = os.path.join(data_dir, "message_pool")
+    topk_file_path = os.path.join(message_pool_dir, "integration_top_pair.txt")
+    query_file = os.path.join(message_pool_dir, "query_ent_ids_1.txt")
+    retrieval_output_file = os.path.join(message_pool_dir, "retriever_outputs.txt")
     ent_ids_1_path = os.path.join(data_dir, "ent_ids_1")
     ent_ids_2_path = os.path.join(data_dir, "ent_ids_2")
+    original_ent_ids_1_backup = os.path.join(data_dir, "ent_ids_1.backup")
     retrieval_doc_path = os.path.join(data_dir, "inrag_ent_ids_2_pre_embeding.txt")
     
     # Step 1: Check if top-k file exists
@@ -257,6 +307,14 @@ def s4_to_retrieval(data_dir, dataset_name=None, iteration=1, force_update=False
     
     print(f"Step 1: Reading top-k results from: {topk_file_path}")
     
+    # Steps 3-5 only need the top-k pairs and the two entity files; read them in
+    # background threads while relation alignment and decomposition run
+    reader = ThreadPoolExecutor(max_workers=3)
+    topk_future = reader.submit(extract_entities_from_topk, topk_file_path)
+    kg1_entities_future = reader.submit(load_entity_ids, ent_ids_1_path)
+    kg2_entities_future = reader.submit(load_entity_ids, ent_ids_2_path)
+    reader.shutdown(wait=False)
+    
     # Step 1.5: Relation alignment (run before hypergraph decomposition)
     print(f"\nStep 1.5: Relation Alignment (before hypergraph decomposition)...")
     alignment_file = run_relation_alignment_stage(
@@ -273,7 +331,7 @@ def s4_to_retrieval(data_dir, dataset_name=None, iteration=1, force_update=False
     # Step 2: Hypergraph decomposition (decompose entity pairs into multiple aspects of KG2 entities)
     print(f"\nStep 2: Hypergraph Decomposition (creating aspect entities)...")
     try:
-        decomposition_result = run_hypergraph_decomposition(data_dir, os.path.join(data_dir, "message_pool"))
+        decomposition_result = run_hypergraph_decomposition(data_dir, message_pool_dir)
         
         if not decomposition_result:
             print("Error: Hypergraph decomposition failed.")
@@ -296,7 +354,7 @@ def s4_to_retrieval(data_dir, dataset_name=None, iteration=1, force_update=False
     
     # Step 3: Extract original KG1 and KG2 entity IDs (for query and original entity retrieval)
     print(f"\nStep 3: Extracting original entities from top-k results...")
-    kg1_entity_ids, kg2_entity_ids = extract_entities_from_topk(topk_file_path)
+    kg1_entity_ids, kg2_entity_ids = topk_future.result()
     
     if len(kg1_entity_ids) == 0:
         print("Error: No KG1 entities found in top-k file.")
@@ -316,7 +374,8 @@ def s4_to_retrieval(data_dir, dataset_name=None, iteration=1, force_update=False
         aspect_ids,
         aspect_names,
         ent_ids_2_path,
-        retrieval_doc_path
+        retrieval_doc_path,
+        entities=kg2_entities_future.result()
     )
     
     if written_count == 0:
@@ -325,12 +384,12 @@ def s4_to_retrieval(data_dir, dataset_name=None, iteration=1, force_update=False
     
     # Step 5: Create query entities file (KG1 entities, only those in top-k)
     print(f"\nStep 5: Creating query entities file (KG1 entities from top-k)...")
-    query_file = os.path.join(data_dir, "message_pool", "query_ent_ids_1.txt")
     query_count = create_query_entities_file(
         data_dir,
         kg1_entity_ids,
         ent_ids_1_path,
-        query_file
+        query_file,
+        entities=kg1_entities_future.result()
     )
     
     if query_count == 0:
@@ -340,17 +399,15 @@ def s4_to_retrieval(data_dir, dataset_name=None, iteration=1, force_update=False
     print(f"  Query entities file saved: {query_file}")
     
     # Step 6: Backup original ent_ids_1 file and replace with query file
-    original_ent_ids_1_backup = os.path.join(data_dir, "ent_ids_1.backup")
     use_temp_file = False
     
     try:
-        # Backup original file
+        # Move the original file aside and put the query file in its place
+        # (renames and a hard link, so no file data is copied)
         if os.path.exists(ent_ids_1_path):
-            import shutil
-            shutil.copy2(ent_ids_1_path, original_ent_ids_1_backup)
-            # Replace with query file
-            shutil.copy2(query_file, ent_ids_1_path)
+            os.replace(ent_ids_1_path, original_ent_ids_1_backup)
             use_temp_file = True
+            _link_or_copy(query_file, ent_ids_1_path)
             print(f"  Temporarily replaced ent_ids_1 with query entities from top-k")
         
         # Step 7: Call neural_retrieval
@@ -360,36 +417,20 @@ def s4_to_retrieval(data_dir, dataset_name=None, iteration=1, force_update=False
         print(f"    * Aspect entities: {len(aspect_ids)}")
         print(f"  - Query entities: {ent_ids_1_path} ({query_count} entities from top-k)")
         print(f"  - Query file saved: {query_file}")
-        print(f"  - Output: {os.path.join(data_dir, 'message_pool', 'retriever_outputs.txt')}")
+        print(f"  - Output: {retrieval_output_file}")
         if force_update:
-            print(f"  - Force update: FAISS index will be regenerated\n")
+            print(f"  - Force update: FAISS index will be regenerated if the retrieval document changed\n")
         else:
             print()
         
         neural_retrieval(data_dir, force_rebuild_index=force_update)
         print("\n✓ Neural retrieval completed successfully!")
         
-        # Step 8: Link retrieval results to original entities
-        linked_output_file = os.path.join(data_dir, 'message_pool', 'retriever_outputs_linked.txt')
-        if aspect_mapping:
-            print(f"\nStep 8: Linking retrieval results to original entities...")
-            link_retrieval_results_to_original(
-                data_dir,
-                aspect_mapping,
-                os.path.join(data_dir, 'message_pool', 'retriever_outputs.txt'),
-                linked_output_file
-            )
-        else:
-            # If no aspect entities, directly copy retriever_outputs.txt as linked file
-            import shutil
-            retrieval_output_file = os.path.join(data_dir, 'message_pool', 'retriever_outputs.txt')
-            if os.path.exists(retrieval_output_file):
-                shutil.copy2(retrieval_output_file, linked_output_file)
-                print(f"  No aspect entities, copied retriever_outputs.txt to retriever_outputs_linked.txt")
-        
-        # Step 9: Create multi-scale hypergraph representation folder
-        print(f"\nStep 9: Creating multi-scale hypergraph representation folder...")
-        create_multi_scale_hypergraph_representation(data_dir)
+        # Step 8 + 9: Link retrieval results to original entities (L3) and create
+        # the multi-scale hypergraph representation folder; the L3 scale does the linking
+        print(f"\nStep 8: Linking retrieval results to original entities...")
+        print(f"Step 9: Creating multi-scale hypergraph representation folder...")
+        create_multi_scale_hypergraph_representation(data_dir, aspect_mapping=aspect_mapping)
         
         return True
         
@@ -402,59 +443,156 @@ def s4_to_retrieval(data_dir, dataset_name=None, iteration=1, force_update=False
     finally:
         # Restore original file
         if use_temp_file and os.path.exists(original_ent_ids_1_backup):
-            import shutil
-            shutil.move(original_ent_ids_1_backup, ent_ids_1_path)
+            os.replace(original_ent_ids_1_backup, ent_ids_1_path)
+            _fsync_directory(os.path.dirname(ent_ids_1_path))
             print(f"  Restored original ent_ids_1 file")
         
         # Query file saved to message_pool/query_ent_ids_1.txt, do not delete
         print(f"  Query entities file saved for future use: {query_file}")
 
 
-def create_multi_scale_hypergraph_representation(data_dir):
+def _link_or_copy(source_file, target_file):
     """
-    Create multi-scale hypergraph representation folder
+    Make target_file a hard link to source_file (no data is copied)
     
-    Create multi-scale hypergraph representation folder under message_pool directory, containing:
-    - L1 scale hypergraph: Simple-HHEA top-k results (integration_top_pair.txt)
-    - L2 scale hypergraph: Retrieval results (retriever_outputs.txt)
-    - L3 scale hypergraph: Linked retrieval results (retriever_outputs_linked.txt)
+    Falls back to a copy when hard links are not possible (e.g. across
+    filesystems). An existing target is removed first, so a file linked by an
+    earlier run is replaced instead of being overwritten in place.
+    
+    The copy uses shutil.copyfile (os.sendfile on Linux) and only carries over
+    the timestamps, which _is_up_to_date compares, instead of copy2's full stat copy.
     
     Args:
+        source_file: Existing file path
+        target_file: Link (or copy) path
+    """
+    if os.path.lexists(target_file):
+        os.remove(target_file)
+    try:
+        os.link(source_file, target_file)
+    except OSError:
+        shutil.copyfile(source_file, target_file)
+        source_stat = os.stat(source_file)
+        os.utime(target_file, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+
+
+def _fsync_directory(directory):
+    """
+    Flush a directory entry, so a rename inside it survives a crash
+    
+    Best effort: platforms that cannot open directories (e.g. Windows) skip it.
+    
+    Args:
+        directory: Directory path
+    """
+    try:
+        fd = os.open(directory or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _is_up_to_date(source_file, target_file):
+    """
+    Check whether target_file already holds the current source_file
+    
+    True if the target is a hard link to the source, or a copy with the same
+    mtime and size (_link_or_copy keeps the mtime of copies).
+    
+    Args:
+        source_file: Existing file path
+        target_file: Link (or copy) path
+        
+    Returns:
+        bool: Whether the target can be kept as is
+    """
+    try:
+        source_stat = os.stat(source_file)
+        target_stat = os.stat(target_file)
+    except FileNotFoundError:
+        return False
+    return ((source_stat.st_dev, source_stat.st_ino) == (target_stat.st_dev, target_stat.st_ino)
+            or (source_stat.st_mtime_ns, source_stat.st_size) == (target_stat.st_mtime_ns, target_stat.st_size))
+
+
+def _build_scale_hypergraph(scale, data_dir, aspect_mapping=None):
+    """
+    Build one scale of the multi-scale hypergraph representation
+    
+    Args:
+        scale: 'L1', 'L2' or 'L3'
         data_dir: Data directory path
+        aspect_mapping: For L3 only - if given, retriever_outputs_linked.txt is first
+            rebuilt from retriever_outputs.txt using this {aspect_id: original_kg2_id} mapping
+        
+    Returns:
+        tuple or None: (scale, target_file) if created, None if the source file is missing
     """
     message_pool_dir = os.path.join(data_dir, "message_pool")
     multi_scale_dir = os.path.join(message_pool_dir, "multi_scale_hypergraph")
     
-    # Create multi-scale hypergraph representation folder
-    os.makedirs(multi_scale_dir, exist_ok=True)
-    
     # Source file paths
     source_files = {
         'L1': os.path.join(message_pool_dir, "integration_top_pair.txt"),
         'L2': os.path.join(message_pool_dir, "retriever_outputs.txt"),
         'L3': os.path.join(message_pool_dir, "retriever_outputs_linked.txt")
     }
+    source_file = source_files[scale]
+    
+    # Target file path (renamed)
+    target_file = os.path.join(multi_scale_dir, f"{scale}_hypergraph.txt")
+    
+    if scale == 'L3' and aspect_mapping is not None:
+        retrieval_output_file = source_files['L2']
+        if len(aspect_mapping):
+            link_retrieval_results_to_original(data_dir, aspect_mapping, retrieval_output_file, source_file)
+        elif os.path.exists(retrieval_output_file):
+            # If no aspect entities, directly link retriever_outputs.txt as linked file
+            _link_or_copy(retrieval_output_file, source_file)
+            print(f"  No aspect entities, linked retriever_outputs.txt to retriever_outputs_linked.txt")
+    
+    if not os.path.exists(source_file):
+        print(f"  Warning: Source file not found for {scale} scale: {source_file}")
+        return None
+    
+    if _is_up_to_date(source_file, target_file):
+        print(f"  {scale} scale hypergraph is up to date: {target_file}")
+        return (scale, target_file)
+    
+    _link_or_copy(source_file, target_file)
+    print(f"  Created {scale} scale hypergraph: {target_file}")
+    return (scale, target_file)
+
+
+def create_multi_scale_hypergraph_representation(data_dir, aspect_mapping=None):
+    """
+    Create multi-scale hypergraph representation folder
     
-    # Target file paths (renamed)
-    target_files = {
-        'L1': os.path.join(multi_scale_dir, "L1_hypergraph.txt"),
-        'L2': os.path.join(multi_scale_dir, "L2_hypergraph.txt"),
-        'L3': os.path.join(multi_scale_dir, "L3_hypergraph.txt")
-    }
+    Create multi-scale hypergraph representation folder under message_pool directory, containing:
+    - L1 scale hypergraph: Simple-HHEA top-k results (integration_top_pair.txt)
+    - L2 scale hypergraph: Retrieval results (retriever_outputs.txt)
+    - L3 scale hypergraph: Linked retrieval results (retriever_outputs_linked.txt)
     
-    created_files = []
+    Args:
+        data_dir: Data directory path
+        aspect_mapping: If given, also (re)build retriever_outputs_linked.txt as part of
+            the L3 scale (see link_retrieval_results_to_original)
+    """
+    multi_scale_dir = os.path.join(data_dir, "message_pool", "multi_scale_hypergraph")
     
-    for scale in ['L1', 'L2', 'L3']:
-        source_file = source_files[scale]
-        target_file = target_files[scale]
-        
-        if os.path.exists(source_file):
-            import shutil
-            shutil.copy2(source_file, target_file)
-            created_files.append((scale, target_file))
-            print(f"  Created {scale} scale hypergraph: {target_file}")
-        else:
-            print(f"  Warning: Source file not found for {scale} scale: {source_file}")
+    # Create multi-scale hypergraph representation folder
+    os.makedirs(multi_scale_dir, exist_ok=True)
+    
+    # Each scale is a hard link (or copy); only L3 may first rebuild its linked file
+    results = [_build_scale_hypergraph(scale, data_dir, aspect_mapping if scale == 'L3' else None)
+               for scale in _SCALES]
+    
+    created_files = [result for result in results if result is not None]
     
     if created_files:
         print(f"  Multi-scale hypergraph representation created: {len(created_files)} scales")
@@ -465,13 +603,34 @@ def create_multi_scale_hypergraph_representation(data_dir):
     return created_files
 
 
+def _string_keyed_aspect_mapping(aspect_mapping):
+    """
+    Convert an {aspect_id: original_kg2_id} mapping to a {str: str} dict
+    
+    Args:
+        aspect_mapping: dict with integer IDs, (aspect_id, original_kg2_id) rows as from
+            hypergraph decomposition, or an already string-keyed dict (returned as is)
+        
+    Returns:
+        dict: {str(aspect_id): str(original_kg2_id)}
+    """
+    if isinstance(aspect_mapping, dict) and isinstance(next(iter(aspect_mapping), None), str):
+        return aspect_mapping
+    if not isinstance(aspect_mapping, dict):
+        # Mapping rows: convert both ID columns at once
+        rows = aspect_mapping.astype(str)
+        return dict(zip(rows[:, 0].tolist(), rows[:, 1].tolist()))
+    return {str(aspect_id): str(original_id) for aspect_id, original_id in aspect_mapping.items()}
+
+
 def link_retrieval_results_to_original(data_dir, aspect_mapping, retrieval_output_file, linked_output_file):
     """
     Link aspect entities in retrieval results back to original entities
     
     Args:
         data_dir: Data directory
-        aspect_mapping: Mapping from aspect to original entity {aspect_id: original_kg2_id}
+        aspect_mapping: Mapping from aspect to original entity, as (aspect_id, original_kg2_id)
+            rows, {aspect_id: original_kg2_id} with integer IDs, or already as {str: str}
         retrieval_output_file: Retrieval output file path
         linked_output_file: Linked output file path
     """
@@ -479,33 +638,35 @@ def link_retrieval_results_to_original(data_dir, aspect_mapping, retrieval_outpu
         print(f"Warning: Retrieval output file not found: {retrieval_output_file}")
         return
     
-    linked_count = 0
-    aspect_count = 0
+    # Match the ID column as text, so no int() per row
+    aspect_mapping_str = _string_keyed_aspect_mapping(aspect_mapping)
     
-    with open(retrieval_output_file, 'r', encoding='utf-8') as f_in, \
-         open(linked_output_file, 'w', encoding='utf-8') as f_out:
+    with open(retrieval_output_file, 'r', encoding='utf-8', buffering=_IO_BUFFER_SIZE) as f_in:
+        lines = f_in.read().split('\n')
+    
+    out_lines = []
+    aspect_count = 0
+    for parts in (line.strip().split('\t', 2) for line in lines):
+        if len(parts) < 2:
+            continue
+        kg1_id, retrieved_id = parts[0], parts[1].strip()
         
-        for line in f_in:
-            line = line.strip()
-            if not line:
-                continue
-            
-            parts = line.split('\t')
-            if len(parts) >= 2:
-                kg1_id = parts[0]
-                retrieved_id = int(parts[1])
-                
-                # Check if it's an aspect entity
-                if retrieved_id in aspect_mapping:
-                    # Link to original entity
-                    original_id = aspect_mapping[retrieved_id]
-                    f_out.write(f"{kg1_id}\t{original_id}\t{retrieved_id}\n")  # kg1_id, original_kg2_id, aspect_id
-                    aspect_count += 1
-                else:
-                    # Original entity, output directly
-                    f_out.write(f"{kg1_id}\t{retrieved_id}\n")
-                
-                linked_count += 1
+        # Check if it's an aspect entity
+        original_id = aspect_mapping_str.get(retrieved_id)
+        if original_id is not None:
+            # Link to original entity: kg1_id, original_kg2_id, aspect_id
+            out_lines.append(f"{kg1_id}\t{original_id}\t{retrieved_id}\n")
+            aspect_count += 1
+        else:
+            # Original entity, output directly
+            out_lines.append(f"{kg1_id}\t{retrieved_id}\n")
+    linked_count = len(out_lines)
+    
+    # The linked file may be a hard link left by a run without aspect entities
+    if os.path.lexists(linked_output_file):
+        os.remove(linked_output_file)
+    with open(linked_output_file, 'w', encoding='utf-8', buffering=_IO_BUFFER_SIZE) as f_out:
+        f_out.write(''.join(out_lines))
     
     print(f"  Linked {linked_count} retrieval results:")
     print(f"    - Original entities: {linked_count - aspect_count}")
@@ -21,30 +21,39 @@ Output:
 
 import os
 import sys
-from collections import defaultdict
+import csv
+import itertools
+from concurrent.futures import ProcessPoolExecutor
 from difflib import SequenceMatcher
+from functools import lru_cache
+from types import MappingProxyType
 import argparse
 
+import numpy as np
+from scipy import sparse
+
+# Optional C++ edit-distance kernels to prune the text similarity phase (falls back to scoring every pair)
+try:
+    from rapidfuzz import fuzz, process
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
 # Add project path
 project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(project_root)
 
+# Stop words ignored by the word overlap part of the text similarity
+STOPWORDS = frozenset({'a', 'an', 'the', 'of', 'in', 'on', 'at', 'to', 'for', 'with', 'by', 'or', 'and'})
 
-def load_relations(rel_file_path):
-    """
-    Load relation ID to relation name mapping
-    
-    Args:
-        rel_file_path: Relation file path
-        
-    Returns:
-        dict: {rel_id: rel_name}
-    """
+# Candidate name pairs from which SequenceMatcher ratios are computed in worker processes
+PARALLEL_TEXT_MIN_PAIRS = 200000
+
+
+@lru_cache(maxsize=8)
+def _parse_relations(rel_file_path, mtime_ns, size):
+    """Parse a relation file, memoized on its path and (mtime, size) version"""
     relations = {}
-    if not os.path.exists(rel_file_path):
-        print(f"Warning: Relation file not found: {rel_file_path}")
-        return relations
-    
     with open(rel_file_path, 'r', encoding='utf-8') as f:
         for line in f:
             line = line.strip()
@@ -57,7 +66,56 @@ def load_relations(rel_file_path):
                 relations[rel_id] = rel_name
     
     print(f"Loaded {len(relations)} relations from {rel_file_path}")
-    return relations
+    return MappingProxyType(relations)
+
+
+def load_relations(rel_file_path):
+    """
+    Load relation ID to relation name mapping
+    
+    The parsed file is cached until its mtime or size changes, so the name lookups
+    for the output (after find_relation_alignments loaded the same files) do not
+    parse it again.
+    
+    Args:
+        rel_file_path: Relation file path
+        
+    Returns:
+        Mapping: read-only {rel_id: rel_name}
+    """
+    if not os.path.exists(rel_file_path):
+        print(f"Warning: Relation file not found: {rel_file_path}")
+        return MappingProxyType({})
+    
+    stat = os.stat(rel_file_path)
+    return _parse_relations(rel_file_path, stat.st_mtime_ns, stat.st_size)
+
+
+def read_int_table(path, usecols=None):
+    """
+    Parse a tab-separated integer table with the pandas C parser
+    
+    Args:
+        path: File path
+        usecols: Column indices to read (all columns if None)
+        
+    Returns:
+        int64 array [n_rows, n_columns] (no rows for an empty file), or None if pandas
+        is missing or the file has ragged or non-integer rows
+    """
+    try:
+        import pandas as pd
+    except ImportError:
+        return None
+    
+    try:
+        df = pd.read_csv(path, sep='\t', header=None, usecols=usecols, engine='c',
+                         dtype=np.int64, quoting=csv.QUOTE_NONE, memory_map=True)
+    except pd.errors.EmptyDataError:
+        return np.zeros((0, len(usecols) if usecols else 0), dtype=np.int64)
+    except (ValueError, pd.errors.ParserError):
+        return None
+    return df.to_numpy()
 
 
 def load_triples(triples_file_path):
@@ -68,26 +126,38 @@ def load_triples(triples_file_path):
         triples_file_path: Triples file path
         
     Returns:
-        list: [(head, rel, tail, time_start, time_end), ...]
+        int64 array [n_triples, 5]: rows (head, rel, tail, time_start, time_end)
     """
-    triples = []
     if not os.path.exists(triples_file_path):
         print(f"Warning: Triples file not found: {triples_file_path}")
-        return triples
-    
-    with open(triples_file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split('\t')
-            if len(parts) >= 3:
-                head = int(parts[0])
-                rel = int(parts[1])
-                tail = int(parts[2])
-                time_start = int(parts[3]) if len(parts) > 3 else 0
-                time_end = int(parts[4]) if len(parts) > 4 else time_start
-                triples.append((head, rel, tail, time_start, time_end))
+        return np.zeros((0, 5), dtype=np.int64)
+    
+    # Well-formed files are parsed in one pass by the pandas C parser
+    table = read_int_table(triples_file_path)
+    if table is None:
+        # No pandas, or ragged or non-integer rows: use the line parser
+        triples = []
+        with open(triples_file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                parts = line.split('\t')
+                if len(parts) >= 3:
+                    head = int(parts[0])
+                    rel = int(parts[1])
+                    tail = int(parts[2])
+                    time_start = int(parts[3]) if len(parts) > 3 else 0
+                    time_end = int(parts[4]) if len(parts) > 4 else time_start
+                    triples.append((head, rel, tail, time_start, time_end))
+        triples = np.array(triples, dtype=np.int64).reshape(-1, 5)
+    elif table.shape[1] < 3:
+        triples = np.zeros((0, 5), dtype=np.int64)
+    else:
+        # A missing time_start defaults to 0 and a missing time_end to time_start
+        time_starts = table[:, 3] if table.shape[1] > 3 else np.zeros(len(table), dtype=np.int64)
+        time_ends = table[:, 4] if table.shape[1] > 4 else time_starts
+        triples = np.column_stack((table[:, :3], time_starts, time_ends))
     
     print(f"Loaded {len(triples)} triples from {triples_file_path}")
     return triples
@@ -101,23 +171,27 @@ def load_entity_pairs(pairs_file_path):
         pairs_file_path: Entity pairs file path
         
     Returns:
-        list: [(kg1_id, kg2_id), ...]
+        int64 array [n_pairs, 2]: rows (kg1_id, kg2_id)
     """
-    pairs = []
     if not os.path.exists(pairs_file_path):
         print(f"Warning: Entity pairs file not found: {pairs_file_path}")
-        return pairs
-    
-    with open(pairs_file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split('\t')
-            if len(parts) >= 2:
-                kg1_id = int(parts[0])
-                kg2_id = int(parts[1])
-                pairs.append((kg1_id, kg2_id))
+        return np.zeros((0, 2), dtype=np.int64)
+    
+    pairs = read_int_table(pairs_file_path, usecols=[0, 1])
+    if pairs is None:
+        # No pandas, or ragged or non-integer rows: use the line parser
+        pairs = []
+        with open(pairs_file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                parts = line.split('\t')
+                if len(parts) >= 2:
+                    kg1_id = int(parts[0])
+                    kg2_id = int(parts[1])
+                    pairs.append((kg1_id, kg2_id))
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
     
     print(f"Loaded {len(pairs)} entity pairs from {pairs_file_path}")
     return pairs
@@ -145,14 +219,9 @@ def text_similarity(name1, name2):
     # Calculate similarity using SequenceMatcher
     similarity = SequenceMatcher(None, name1_lower, name2_lower).ratio()
     
-    # Check keyword matching
-    words1 = set(name1_lower.split())
-    words2 = set(name2_lower.split())
-    
-    # Remove common stop words
-    stopwords = {'a', 'an', 'the', 'of', 'in', 'on', 'at', 'to', 'for', 'with', 'by', 'or', 'and'}
-    words1 = words1 - stopwords
-    words2 = words2 - stopwords
+    # Check keyword matching, without common stop words
+    words1 = set(name1_lower.split()) - STOPWORDS
+    words2 = set(name2_lower.split()) - STOPWORDS
     
     if words1 and words2:
         # Jaccard similarity
@@ -163,59 +232,319 @@ def text_similarity(name1, name2):
     return similarity
 
 
+def find_text_alignments(kg1_relations, kg2_relations, text_sim_threshold):
+    """
+    Find relation pairs whose text similarity reaches the threshold
+    
+    Scores are those of text_similarity(), computed as KG1 x KG2 matrices. The
+    SequenceMatcher ratio is only computed for pairs that can reach the threshold:
+    rapidfuzz's Indel ratio (2 * LCS length / total length, all pairs in C++) is an
+    upper bound on it, since the matched blocks form a common subsequence. Without
+    rapidfuzz the looser quick_ratio() bound (shared character counts) is used.
+    
+    Args:
+        kg1_relations: KG1 relations dictionary {rel_id: rel_name}
+        kg2_relations: KG2 relations dictionary {rel_id: rel_name}
+        text_sim_threshold: Text similarity threshold
+        
+    Returns:
+        list: [(kg1_rel_id, kg2_rel_id, similarity, "text_similarity"), ...] in KG1, KG2 order
+    """
+    kg1_rel_ids = list(kg1_relations)
+    kg2_rel_ids = list(kg2_relations)
+    names1 = [name.lower() for name in kg1_relations.values()]
+    names2 = [name.lower() for name in kg2_relations.values()]
+    shape = (len(names1), len(names2))
+    
+    # Word overlap (Jaccard), blended in where both names keep words after stop word removal:
+    # intersections from one product of name x word incidence matrices, |A | B| = |A| + |B| - |A & B|
+    words1 = [set(name.split()) - STOPWORDS for name in names1]
+    words2 = [set(name.split()) - STOPWORDS for name in names2]
+    incidence1, incidence2 = _word_incidence(words1, words2)
+    word_counts1 = np.diff(incidence1.indptr)
+    word_counts2 = np.diff(incidence2.indptr)
+    has_words = (word_counts1 > 0)[:, None] & (word_counts2 > 0)[None, :]
+    common_words = (incidence1 @ incidence2.T).toarray()
+    union_words = word_counts1[:, None] + word_counts2[None, :] - common_words
+    word_overlap = np.divide(common_words, union_words, out=np.zeros(shape), where=has_words)
+    
+    # Pairs that may reach the threshold (the Indel bound gets a little slack for float32 rounding)
+    if RAPIDFUZZ_AVAILABLE:
+        ratio_bound = process.cdist(names1, names2, scorer=fuzz.ratio, workers=-1) / 100.0 + 1e-6
+    else:
+        ratio_bound = _shared_character_ratio(names1, names2)
+    candidates = np.where(has_words, 0.6 * ratio_bound + 0.4 * word_overlap, ratio_bound) >= text_sim_threshold
+    
+    # One task per KG2 name and its candidate KG1 names; large workloads are split
+    # across processes (KG2 names are independent)
+    columns = np.flatnonzero(candidates.any(axis=0)).tolist()
+    column_rows = [np.flatnonzero(candidates[:, j]) for j in columns]
+    tasks = [(names2[j], [names1[i] for i in rows.tolist()]) for j, rows in zip(columns, column_rows)]
+    num_workers = min(os.cpu_count() or 1, len(tasks))
+    if num_workers > 1 and int(candidates.sum()) >= PARALLEL_TEXT_MIN_PAIRS and os.environ.get("HYDRA_DISABLE_MP") != "1":
+        chunk_size = -(-len(tasks) // num_workers)
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            chunks = executor.map(_sequence_ratios, [tasks[k:k + chunk_size] for k in range(0, len(tasks), chunk_size)])
+            column_ratios = [ratios for chunk in chunks for ratios in chunk]
+    else:
+        column_ratios = _sequence_ratios(tasks)
+    
+    ratio = np.zeros(shape)
+    for j, rows, ratios in zip(columns, column_rows, column_ratios):
+        ratio[rows, j] = ratios
+    
+    similarity = np.where(has_words, 0.6 * ratio + 0.4 * word_overlap, ratio)
+    similarity[np.array(names1, dtype=object)[:, None] == np.array(names2, dtype=object)[None, :]] = 1.0
+    
+    rows, cols = np.nonzero(similarity >= text_sim_threshold)
+    return [(kg1_rel_ids[i], kg2_rel_ids[j], score, "text_similarity")
+            for i, j, score in zip(rows.tolist(), cols.tolist(), similarity[rows, cols].tolist())]
+
+
+def _sequence_ratios(tasks):
+    """
+    SequenceMatcher ratios of one name against a list of names, for several names
+    
+    SequenceMatcher caches its analysis of the second sequence, so each task's name
+    stays there while the other names are set as the first sequence.
+    
+    Args:
+        tasks: [(kg2_name, [kg1_name, ...]), ...]
+        
+    Returns:
+        list: Ratio lists, one per task
+    """
+    matcher = SequenceMatcher(None)
+    results = []
+    for name2, names1 in tasks:
+        matcher.set_seq2(name2)
+        ratios = []
+        for name1 in names1:
+            matcher.set_seq1(name1)
+            ratios.append(matcher.ratio())
+        results.append(ratios)
+    return results
+
+
+def _shared_character_ratio(names1, names2, block_size=64):
+    """
+    SequenceMatcher.quick_ratio() of every name pair: 2 * shared character count / total length
+    
+    Args:
+        names1: KG1 relation names
+        names2: KG2 relation names
+        block_size: KG1 names whose character counts are compared with all KG2 names at once
+        
+    Returns:
+        float64 array [len(names1), len(names2)]
+    """
+    alphabet = {}
+    counts = []
+    for names in (names1, names2):
+        columns = [alphabet.setdefault(char, len(alphabet)) for name in names for char in name]
+        rows = np.repeat(np.arange(len(names)), [len(name) for name in names])
+        counts.append((rows, np.array(columns, dtype=np.int64)))
+    counts1, counts2 = (np.zeros((len(names), len(alphabet)), dtype=np.int32) for names in (names1, names2))
+    np.add.at(counts1, counts[0], 1)
+    np.add.at(counts2, counts[1], 1)
+    
+    shared = np.empty((len(names1), len(names2)))
+    for start in range(0, len(names1), block_size):
+        shared[start:start + block_size] = np.minimum(counts1[start:start + block_size, None, :],
+                                                      counts2[None, :, :]).sum(axis=2)
+    total_lengths = counts1.sum(axis=1)[:, None] + counts2.sum(axis=1)[None, :]
+    return 2.0 * shared / np.maximum(total_lengths, 1)
+
+
+def _word_incidence(words1, words2):
+    """
+    Encode word sets as binary name x word CSR matrices over their shared vocabulary
+    
+    Args:
+        words1: Word sets of the KG1 relation names
+        words2: Word sets of the KG2 relation names
+        
+    Returns:
+        tuple: (csr_matrix[len(words1), V], csr_matrix[len(words2), V]) int32
+    """
+    vocabulary = {}
+    matrices = []
+    for word_sets in (words1, words2):
+        columns = [vocabulary.setdefault(word, len(vocabulary)) for words in word_sets for word in words]
+        indptr = np.zeros(len(word_sets) + 1, dtype=np.int64)
+        np.cumsum([len(words) for words in word_sets], out=indptr[1:])
+        matrices.append((np.ones(len(columns), dtype=np.int32), np.array(columns, dtype=np.int64), indptr))
+    return tuple(sparse.csr_matrix(matrix, shape=(len(matrix[2]) - 1, len(vocabulary))) for matrix in matrices)
+
+
+def _distinct_sorted_triples(heads, rels, tails):
+    """
+    Sort (head, rel, tail) rows and drop repeated ones (e.g. the same fact at other times)
+    
+    Args:
+        heads: int64 head column
+        rels: int64 relation column
+        tails: int64 tail column
+        
+    Returns:
+        tuple: (heads, rels, tails) of the distinct rows, ordered by head, rel, tail
+    """
+    order = np.lexsort((tails, rels, heads))
+    heads, rels, tails = heads[order], rels[order], tails[order]
+    distinct = np.ones(len(heads), dtype=bool)
+    distinct[1:] = (heads[1:] != heads[:-1]) | (rels[1:] != rels[:-1]) | (tails[1:] != tails[:-1])
+    return heads[distinct], rels[distinct], tails[distinct]
+
+
+def _rows_of_heads(sorted_heads, query_heads):
+    """
+    Gather the rows of every query head entity from a sorted head column
+    
+    Args:
+        sorted_heads: Sorted int64 head entity column of a triple table
+        query_heads: int64 head entities to look up (one group of rows each)
+        
+    Returns:
+        tuple: (query index of each gathered row, row indices into sorted_heads)
+    """
+    starts = np.searchsorted(sorted_heads, query_heads, side='left')
+    counts = np.searchsorted(sorted_heads, query_heads, side='right') - starts
+    query_index = np.repeat(np.arange(len(query_heads)), counts)
+    # Position of each gathered row within its group, offset by the group's start
+    within = np.arange(len(query_index)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return query_index, np.repeat(starts, counts) + within
+
+
 def compute_cooccurrence_patterns(kg1_triples, kg2_triples, entity_pairs):
     """
     Calculate co-occurrence patterns of relations in entity pairs
     
     Args:
-        kg1_triples: KG1 triples list
-        kg2_triples: KG2 triples list
-        entity_pairs: Entity alignment pairs list
+        kg1_triples: KG1 triples, rows (head, rel, tail, ...) as an int64 array or list
+        kg2_triples: KG2 triples, rows (head, rel, tail, ...) as an int64 array or list
+        entity_pairs: Entity alignment pairs, rows (kg1_id, kg2_id) as an int64 array or list
         
     Returns:
         dict: {(kg1_rel_id, kg2_rel_id): cooccurrence_count}
     """
-    # Build entity pair mapping
-    kg1_to_kg2 = {kg1_id: kg2_id for kg1_id, kg2_id in entity_pairs}
-    kg2_to_kg1 = {kg2_id: kg1_id for kg1_id, kg2_id in entity_pairs}
+    kg1_rel_ids, kg2_rel_ids, counts = cooccurrence_counts(kg1_triples, kg2_triples, entity_pairs)
+    return dict(zip(zip(kg1_rel_ids.tolist(), kg2_rel_ids.tolist()), counts.tolist()))
+
+
+def cooccurrence_counts(kg1_triples, kg2_triples, entity_pairs):
+    """
+    Count co-occurring relation pairs as parallel arrays
     
-    # Build KG1 entity-relation mapping {kg1_entity_id: {rel_id: set(tail_ids)}}
-    kg1_entity_rels = defaultdict(lambda: defaultdict(set))
-    for head, rel, tail, _, _ in kg1_triples:
-        kg1_entity_rels[head][rel].add(tail)
+    A KG1 relation and a KG2 relation co-occur in an entity pair when the KG1 entity
+    reaches, through the first, a tail aligned (under the entity pairs) to a tail
+    the KG2 entity reaches through the second. Counts are computed with sparse
+    products: per distinct pair, (pair, kg1_rel) x (pair, aligned tail) times
+    (pair, tail) x kg2_rel, made binary, then summed over pairs with their multiplicity.
     
-    # Build KG2 entity-relation mapping {kg2_entity_id: {rel_id: set(tail_ids)}}
-    kg2_entity_rels = defaultdict(lambda: defaultdict(set))
-    for head, rel, tail, _, _ in kg2_triples:
-        kg2_entity_rels[head][rel].add(tail)
+    Args:
+        kg1_triples: KG1 triples, rows (head, rel, tail, ...) as an int64 array or list
+        kg2_triples: KG2 triples, rows (head, rel, tail, ...) as an int64 array or list
+        entity_pairs: Entity alignment pairs, rows (kg1_id, kg2_id) as an int64 array or list
+        
+    Returns:
+        tuple: (kg1_rel_ids, kg2_rel_ids, counts) int64 arrays, ordered by KG1 then KG2 relation
+    """
+    no_counts = tuple(np.zeros(0, dtype=np.int64) for _ in range(3))
+    if not len(entity_pairs) or not len(kg1_triples) or not len(kg2_triples):
+        return no_counts
+    pairs = np.asarray(entity_pairs, dtype=np.int64).reshape(-1, 2)
+    kg1_columns = np.asarray(kg1_triples, dtype=np.int64)
+    kg2_columns = np.asarray(kg2_triples, dtype=np.int64)
+    
+    # Entity pair mapping as sorted arrays (a KG1 entity listed twice keeps its last KG2 entity)
+    reversed_pairs = pairs[::-1]
+    mapped_kg1, last = np.unique(reversed_pairs[:, 0], return_index=True)
+    mapped_kg2 = reversed_pairs[last, 1]
+    
+    # KG1 triples whose tail is aligned, with that tail replaced by its KG2 entity;
+    # KG2 triples whose tail is such an entity
+    t1 = kg1_columns[:, 2]
+    position = np.minimum(np.searchsorted(mapped_kg1, t1), len(mapped_kg1) - 1)
+    aligned = mapped_kg1[position] == t1
+    h1, r1, t1 = _distinct_sorted_triples(kg1_columns[aligned, 0], kg1_columns[aligned, 1],
+                                          mapped_kg2[position[aligned]])
+    aligned = np.isin(kg2_columns[:, 2], mapped_kg2)
+    h2, r2, t2 = _distinct_sorted_triples(kg2_columns[aligned, 0], kg2_columns[aligned, 1],
+                                          kg2_columns[aligned, 2])
+    
+    # Distinct entity pairs and how often each is listed
+    unique_pairs, multiplicity = np.unique(pairs, axis=0, return_counts=True)
+    
+    # Rows of each pair's KG1 entity and KG2 entity
+    pair1, rows1 = _rows_of_heads(h1, unique_pairs[:, 0])
+    pair2, rows2 = _rows_of_heads(h2, unique_pairs[:, 1])
+    if not len(rows1) or not len(rows2):
+        return no_counts
+    kg1_rel_ids, rel1 = np.unique(r1[rows1], return_inverse=True)
+    kg2_rel_ids, rel2 = np.unique(r2[rows2], return_inverse=True)
+    
+    # Shared inner dimension: (pair, KG2 tail) keys reached from the KG1 side
+    tail_base = int(max(t1.max(), t2.max())) + 1
+    tail_keys, tail1 = np.unique(pair1 * tail_base + t1[rows1], return_inverse=True)
+    keys2 = pair2 * tail_base + t2[rows2]
+    tail2 = np.minimum(np.searchsorted(tail_keys, keys2), len(tail_keys) - 1)
+    shared = tail_keys[tail2] == keys2
+    
+    # (pair, kg1_rel) rows; gathered rows are already ordered by pair, then relation
+    row_keys = pair1 * len(kg1_rel_ids) + rel1
+    new_row = np.ones(len(row_keys), dtype=bool)
+    new_row[1:] = row_keys[1:] != row_keys[:-1]
+    row1 = np.cumsum(new_row) - 1
+    row_keys = row_keys[new_row]
+    left = sparse.csr_matrix((np.ones(len(row1), dtype=np.int32), (row1, tail1)),
+                             shape=(len(row_keys), len(tail_keys)))
+    right = sparse.csr_matrix((np.ones(int(shared.sum()), dtype=np.int32), (tail2[shared], rel2[shared])),
+                              shape=(len(tail_keys), len(kg2_rel_ids)))
+    
+    # Whether each (pair, kg1_rel) reaches each kg2_rel through an aligned tail
+    reached = left @ right
+    reached.data = np.ones_like(reached.data)
+    
+    # Sum over pairs, weighted by how often the pair is listed
+    by_relation = sparse.csr_matrix((multiplicity[row_keys // len(kg1_rel_ids)],
+                                     (row_keys % len(kg1_rel_ids), np.arange(len(row_keys)))),
+                                    shape=(len(kg1_rel_ids), len(row_keys)))
+    counts = (by_relation @ reached).tocoo()
+    
+    return kg1_rel_ids[counts.row], kg2_rel_ids[counts.col], counts.data.astype(np.int64)
+
+
+def merge_alignments(alignments):
+    """
+    Keep the highest-scored alignment of each relation pair, sorted by score
     
-    # Calculate co-occurrence
-    cooccurrence = defaultdict(int)
+    Of equal scores for the same pair the first one is kept; pairs with equal
+    scores stay in the order their first alignment was found.
     
-    for kg1_id, kg2_id in entity_pairs:
-        kg1_rels = kg1_entity_rels.get(kg1_id, {})
-        kg2_rels = kg2_entity_rels.get(kg2_id, {})
+    Args:
+        alignments: [(kg1_rel_id, kg2_rel_id, score, method), ...]
         
-        # For each KG1 relation, find possible corresponding relations in KG2
-        for kg1_rel, kg1_tails in kg1_rels.items():
-            for kg2_rel, kg2_tails in kg2_rels.items():
-                # If two relations have the same tail entity (through entity alignment mapping), they co-occur
-                kg1_tail_set = set(kg1_tails)
-                kg2_tail_set = set(kg2_tails)
-                
-                # Check if there are aligned tail entities
-                aligned_tails = False
-                for kg1_tail in kg1_tail_set:
-                    if kg1_tail in kg1_to_kg2:
-                        kg2_aligned_tail = kg1_to_kg2[kg1_tail]
-                        if kg2_aligned_tail in kg2_tail_set:
-                            aligned_tails = True
-                            break
-                
-                if aligned_tails:
-                    cooccurrence[(kg1_rel, kg2_rel)] += 1
-    
-    return cooccurrence
+    Returns:
+        list: [(kg1_rel_id, kg2_rel_id, score, method), ...] one per relation pair
+    """
+    if not alignments:
+        return []
+    count = len(alignments)
+    kg1_rel_ids = np.fromiter((alignment[0] for alignment in alignments), dtype=np.int64, count=count)
+    kg2_rel_ids = np.fromiter((alignment[1] for alignment in alignments), dtype=np.int64, count=count)
+    scores = np.fromiter((alignment[2] for alignment in alignments), dtype=np.float64, count=count)
+    
+    # Group by relation pair; within a group the highest score comes first, then the earliest alignment
+    order = np.lexsort((np.arange(count), -scores, kg2_rel_ids, kg1_rel_ids))
+    group_start = np.ones(count, dtype=bool)
+    group_start[1:] = ((kg1_rel_ids[order[1:]] != kg1_rel_ids[order[:-1]])
+                       | (kg2_rel_ids[order[1:]] != kg2_rel_ids[order[:-1]]))
+    starts = np.flatnonzero(group_start)
+    best = order[starts]
+    first_found = np.minimum.reduceat(order, starts)
+    
+    ranked = best[np.lexsort((first_found, -scores[best]))]
+    return [alignments[i] for i in ranked.tolist()]
 
 
 def find_relation_alignments(data_dir, use_cooccurrence=True, text_sim_threshold=0.3):
@@ -249,12 +578,7 @@ def find_relation_alignments(data_dir, use_cooccurrence=True, text_sim_threshold
     
     # Method 1: Text similarity
     print("Method 1: Text Similarity Analysis...")
-    text_alignments = []
-    for kg1_rel_id, kg1_rel_name in kg1_relations.items():
-        for kg2_rel_id, kg2_rel_name in kg2_relations.items():
-            similarity = text_similarity(kg1_rel_name, kg2_rel_name)
-            if similarity >= text_sim_threshold:
-                text_alignments.append((kg1_rel_id, kg2_rel_id, similarity, "text_similarity"))
+    text_alignments = find_text_alignments(kg1_relations, kg2_relations, text_sim_threshold)
     
     # Sort by similarity
     text_alignments.sort(key=lambda x: x[2], reverse=True)
@@ -267,7 +591,7 @@ def find_relation_alignments(data_dir, use_cooccurrence=True, text_sim_threshold
         pairs_file = os.path.join(data_dir, "message_pool", "integration_top_pair.txt")
         entity_pairs = load_entity_pairs(pairs_file)
         
-        if entity_pairs:
+        if len(entity_pairs):
             # Load triples
             triples_1_path = os.path.join(data_dir, "triples_1")
             triples_2_path = os.path.join(data_dir, "triples_2")
@@ -275,34 +599,20 @@ def find_relation_alignments(data_dir, use_cooccurrence=True, text_sim_threshold
             kg1_triples = load_triples(triples_1_path)
             kg2_triples = load_triples(triples_2_path)
             
-            if kg1_triples and kg2_triples:
-                cooccurrence = compute_cooccurrence_patterns(kg1_triples, kg2_triples, entity_pairs)
+            if len(kg1_triples) and len(kg2_triples):
+                kg1_rel_ids, kg2_rel_ids, counts = cooccurrence_counts(kg1_triples, kg2_triples, entity_pairs)
                 
-                # Normalize co-occurrence scores (using logarithmic scaling)
-                max_cooccur = max(cooccurrence.values()) if cooccurrence else 1
-                for (kg1_rel_id, kg2_rel_id), count in cooccurrence.items():
-                    # Normalize to 0-1 range
-                    normalized_score = min(1.0, count / max_cooccur) if max_cooccur > 0 else 0.0
-                    alignments.append((kg1_rel_id, kg2_rel_id, normalized_score, "cooccurrence"))
+                # Normalize co-occurrence counts to the 0-1 range by the largest one, in one divide
+                normalized_scores = np.minimum(1.0, counts / counts.max()) if len(counts) else counts
+                alignments.extend(zip(kg1_rel_ids.tolist(), kg2_rel_ids.tolist(), normalized_scores.tolist(),
+                                      itertools.repeat("cooccurrence")))
                 
-                print(f"  Found {len(cooccurrence)} co-occurrence alignments")
+                print(f"  Found {len(counts)} co-occurrence alignments")
         else:
             print("  Skipped: No entity pairs found for co-occurrence analysis")
     
-    # Deduplicate and merge identical relation pairs
-    alignment_dict = {}
-    for kg1_rel_id, kg2_rel_id, score, method in alignments:
-        key = (kg1_rel_id, kg2_rel_id)
-        if key not in alignment_dict:
-            alignment_dict[key] = (kg1_rel_id, kg2_rel_id, score, method)
-        else:
-            # If already exists, take the higher score
-            old_score = alignment_dict[key][2]
-            if score > old_score:
-                alignment_dict[key] = (kg1_rel_id, kg2_rel_id, score, method)
-    
-    # Sort by score
-    final_alignments = sorted(alignment_dict.values(), key=lambda x: x[2], reverse=True)
+    # Deduplicate and merge identical relation pairs, then sort by score
+    final_alignments = merge_alignments(alignments)
     
     print(f"\nTotal unique alignments: {len(final_alignments)}")
     
@@ -321,12 +631,15 @@ def save_relation_alignments(alignments, kg1_relations, kg2_relations, output_fi
     """
     os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else '.', exist_ok=True)
     
+    # Format all rows first, then write the file in one call (the fallback name is only
+    # formatted for relations without one)
+    lines = ["KG1_Rel_ID\tKG1_Rel_Name\tKG2_Rel_ID\tKG2_Rel_Name\tScore\tMethod\n"]
+    lines.extend([f"{kg1_rel_id}\t{kg1_relations[kg1_rel_id] if kg1_rel_id in kg1_relations else f'Unknown_{kg1_rel_id}'}\t"
+                  f"{kg2_rel_id}\t{kg2_relations[kg2_rel_id] if kg2_rel_id in kg2_relations else f'Unknown_{kg2_rel_id}'}\t"
+                  f"{score:.4f}\t{method}\n"
+                  for kg1_rel_id, kg2_rel_id, score, method in alignments])
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("KG1_Rel_ID\tKG1_Rel_Name\tKG2_Rel_ID\tKG2_Rel_Name\tScore\tMethod\n")
-        for kg1_rel_id, kg2_rel_id, score, method in alignments:
-            kg1_name = kg1_relations.get(kg1_rel_id, f"Unknown_{kg1_rel_id}")
-            kg2_name = kg2_relations.get(kg2_rel_id, f"Unknown_{kg2_rel_id}")
-            f.write(f"{kg1_rel_id}\t{kg1_name}\t{kg2_rel_id}\t{kg2_name}\t{score:.4f}\t{method}\n")
+        f.write(''.join(lines))
     
     print(f"\nSaved relation alignments to: {output_file}")
 
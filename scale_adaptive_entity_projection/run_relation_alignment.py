@@ -14,6 +14,8 @@ import os
 import sys
 import argparse
 
+import numpy as np
+
 # Add project path
 project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(project_root)
@@ -21,6 +23,26 @@ sys.path.append(project_root)
 from relation_alignment import find_relation_alignments, load_relations, save_relation_alignments
 
 
+def count_alignments_per_relation(rel_ids, top_n=3):
+    """
+    Count alignments per relation ID
+    
+    Args:
+        rel_ids: Relation ID of each alignment (one side)
+        top_n: Number of most-aligned relations to return
+        
+    Returns:
+        tuple: (number of distinct relations, number with more than one alignment,
+                [(rel_id, alignment_count), ...] top_n most-aligned of those, ties in order of
+                first alignment)
+    """
+    unique_ids, first_index, counts = np.unique(rel_ids, return_index=True, return_counts=True)
+    multiple = counts > 1
+    top = np.lexsort((first_index, -counts))[:top_n]
+    top = top[multiple[top]]
+    return len(unique_ids), int(multiple.sum()), list(zip(unique_ids[top].tolist(), counts[top].tolist()))
+
+
 def run_relation_alignment_stage(data_dir, text_threshold=0.4, use_cooccurrence=True):
     """
     Run relation alignment stage
@@ -79,37 +101,28 @@ def run_relation_alignment_stage(data_dir, text_threshold=0.4, use_cooccurrence=
     print("=" * 80)
     
     # Statistics for one-to-many/many-to-one
-    kg1_to_kg2 = {}
-    kg2_to_kg1 = {}
-    for kg1_rel_id, kg2_rel_id, score, method in alignments:
-        if kg1_rel_id not in kg1_to_kg2:
-            kg1_to_kg2[kg1_rel_id] = []
-        kg1_to_kg2[kg1_rel_id].append((kg2_rel_id, score))
-        
-        if kg2_rel_id not in kg2_to_kg1:
-            kg2_to_kg1[kg2_rel_id] = []
-        kg2_to_kg1[kg2_rel_id].append((kg1_rel_id, score))
-    
-    one_to_many = {k: v for k, v in kg1_to_kg2.items() if len(v) > 1}
-    many_to_one = {k: v for k, v in kg2_to_kg1.items() if len(v) > 1}
+    kg1_count, one_to_many, top_one_to_many = count_alignments_per_relation(
+        np.fromiter((alignment[0] for alignment in alignments), dtype=np.int64, count=len(alignments)))
+    kg2_count, many_to_one, top_many_to_one = count_alignments_per_relation(
+        np.fromiter((alignment[1] for alignment in alignments), dtype=np.int64, count=len(alignments)))
     
     print(f"Total alignments: {len(alignments)}")
-    print(f"Unique KG1 relations with alignments: {len(kg1_to_kg2)}")
-    print(f"Unique KG2 relations with alignments: {len(kg2_to_kg1)}")
-    print(f"One-to-many alignments (KG1 -> multiple KG2): {len(one_to_many)}")
-    print(f"Many-to-one alignments (multiple KG1 -> KG2): {len(many_to_one)}")
+    print(f"Unique KG1 relations with alignments: {kg1_count}")
+    print(f"Unique KG2 relations with alignments: {kg2_count}")
+    print(f"One-to-many alignments (KG1 -> multiple KG2): {one_to_many}")
+    print(f"Many-to-one alignments (multiple KG1 -> KG2): {many_to_one}")
     
-    if one_to_many:
+    if top_one_to_many:
         print(f"\nTop 3 one-to-many examples (KG1 -> multiple KG2):")
-        for i, (kg1_rel_id, kg2_list) in enumerate(sorted(one_to_many.items(), key=lambda x: len(x[1]), reverse=True)[:3], 1):
+        for i, (kg1_rel_id, alignment_count) in enumerate(top_one_to_many, 1):
             kg1_name = kg1_relations.get(kg1_rel_id, f"Unknown_{kg1_rel_id}")
-            print(f"  {i}. KG1[{kg1_rel_id}] '{kg1_name}' -> {len(kg2_list)} KG2 relations")
+            print(f"  {i}. KG1[{kg1_rel_id}] '{kg1_name}' -> {alignment_count} KG2 relations")
     
-    if many_to_one:
+    if top_many_to_one:
         print(f"\nTop 3 many-to-one examples (multiple KG1 -> KG2):")
-        for i, (kg2_rel_id, kg1_list) in enumerate(sorted(many_to_one.items(), key=lambda x: len(x[1]), reverse=True)[:3], 1):
+        for i, (kg2_rel_id, alignment_count) in enumerate(top_many_to_one, 1):
             kg2_name = kg2_relations.get(kg2_rel_id, f"Unknown_{kg2_rel_id}")
-            print(f"  {i}. {len(kg1_list)} KG1 relations -> KG2[{kg2_rel_id}] '{kg2_name}'")
+            print(f"  {i}. {alignment_count} KG1 relations -> KG2[{kg2_rel_id}] '{kg2_name}'")
     
     print("\n" + "=" * 80)
     print(f"Relation alignment file saved: {output_file}")